@@ -0,0 +1,115 @@
+"""Timing, reporting and baseline comparison shared by the benchmarks."""
+
+import json
+import platform
+import socket
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+
+def free_port() -> int:
+    """A TCP port on 127.0.0.1 that was free a moment ago."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@dataclass
+class Result:
+    name: str
+    iterations: int
+    items_per_op: int
+    ops_per_s: float
+    items_per_s: float
+    p50_ms: float
+    p99_ms: float
+
+
+def measure(
+    name: str,
+    fn: Callable[[], Any],
+    iterations: int,
+    warmup: int = 1,
+    items_per_op: int = 1,
+    setup: Callable[[], Any] | None = None,
+) -> Result:
+    """Time ``iterations`` calls of ``fn``; ``setup`` runs untimed before each."""
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        fn()
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - start
+    total = float(samples.sum()) or 1e-12
+    return Result(
+        name=name,
+        iterations=iterations,
+        items_per_op=items_per_op,
+        ops_per_s=round(iterations / total, 3),
+        items_per_s=round(iterations * items_per_op / total, 3),
+        p50_ms=round(float(np.percentile(samples, 50)) * 1000, 4),
+        p99_ms=round(float(np.percentile(samples, 99)) * 1000, 4),
+    )
+
+
+def print_table(results: list[Result]) -> None:
+    width = max((len(r.name) for r in results), default=10)
+    print(f"{'benchmark':<{width}} {'ops/s':>12} {'items/s':>14} {'p50 ms':>10} {'p99 ms':>10}")
+    for r in results:
+        print(
+            f"{r.name:<{width}} {r.ops_per_s:>12.1f} {r.items_per_s:>14.1f} "
+            f"{r.p50_ms:>10.3f} {r.p99_ms:>10.3f}"
+        )
+
+
+def write_results(path: Path, results: list[Result], params: dict[str, Any]) -> None:
+    data = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "params": params,
+        },
+        "results": {r.name: asdict(r) for r in results},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def compare(
+    results: list[Result], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    """Describe every benchmark that regressed by more than ``threshold``.
+
+    A benchmark regresses when its p50 latency grows, or its throughput
+    drops, by more than that fraction of the baseline. Benchmarks missing
+    from either side are ignored.
+    """
+    regressions = []
+    stored = baseline.get("results", {})
+    for r in results:
+        base = stored.get(r.name)
+        if base is None:
+            continue
+        if r.p50_ms > base["p50_ms"] * (1 + threshold):
+            regressions.append(
+                f"{r.name}: p50 {r.p50_ms:.3f} ms vs baseline {base['p50_ms']:.3f} ms"
+            )
+        elif r.ops_per_s < base["ops_per_s"] * (1 - threshold):
+            regressions.append(
+                f"{r.name}: {r.ops_per_s:.1f} ops/s vs baseline {base['ops_per_s']:.1f}"
+            )
+    return regressions
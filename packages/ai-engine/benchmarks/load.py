@@ -0,0 +1,362 @@
+"""
+Replay an orchestrator-like request mix against the FastAPI app.
+
+Runs ``create_app`` in-process and drives it either through httpx's ASGI
+transport (no sockets, measures the app alone) or through a local uvicorn
+server (adds HTTP parsing and the TCP loopback). Requests are issued open
+loop at ``--rate`` per second with a weighted mix of routes, so bulk
+indexing, interactive queries and RL logging contend the way they do when
+several agents run at once.
+
+    python -m benchmarks.load --duration 30 --rate 200 \\
+        --mix upsert=2,query=5,log_action=4,feedback=2 --transport uvicorn
+
+Latency is measured from when a request was *scheduled*, not from when it
+was sent, so a saturated app shows up as growing latency rather than as a
+silently lower request rate. The stub embedding model is used unless
+``--model real`` is given.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any
+
+import httpx
+import numpy as np
+import uvicorn
+
+from src.config import get_settings
+from src.main import create_app
+from src.services.embedding_service import EmbeddingService
+from src.services.rl_service import RLService
+from src.services.vector_store import VectorStore
+
+from .harness import free_port
+from .stubs import stub_embedding_service
+
+ROUTES = {
+    "upsert": ("POST", "/embeddings/upsert"),
+    "query": ("POST", "/embeddings/query"),
+    "log_action": ("POST", "/rl/log-action"),
+    "feedback": ("POST", "/rl/feedback"),
+}
+DEFAULT_MIX = "upsert=2,query=5,log_action=4,feedback=2"
+
+_WORDS = (
+    "parse config request handler retry token cache index vector query "
+    "session socket buffer frame stream schema model router service"
+).split()
+_ACTIONS = ("edit_file", "shell", "search", "read_file", "run_tests")
+_TASK_TYPES = ("bugfix", "feature", "refactor")
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    """``"upsert=2,query=5"`` to route weights; unknown routes are errors."""
+    mix = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise ValueError(f"unknown route {name!r}; expected one of {', '.join(ROUTES)}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("the mix needs at least one route with a positive weight")
+    return mix
+
+
+class Workload:
+    """Generates request bodies and remembers ids that later requests need."""
+
+    def __init__(self, documents: int, seed: int = 0) -> None:
+        self.random = random.Random(seed)
+        self.documents = documents
+        self.next_document = documents
+        # feedback refers to recently logged actions, like the orchestrator's
+        self.action_ids: deque[str] = deque(maxlen=1000)
+
+    def _text(self, words: int) -> str:
+        return " ".join(self.random.choices(_WORDS, k=words))
+
+    def body(self, route: str) -> tuple[str, dict[str, Any]]:
+        """The route actually sent and its JSON body."""
+        if route == "feedback" and not self.action_ids:
+            route = "log_action"
+        if route == "upsert":
+            if self.random.random() < 0.5 and self.documents:
+                doc_id = f"doc{self.random.randrange(self.documents)}"
+            else:
+                doc_id = f"doc{self.next_document}"
+                self.next_document += 1
+            return route, {
+                "id": doc_id,
+                "text": self._text(64),
+                "metadata": {"path": f"src/{doc_id}.py"},
+            }
+        if route == "query":
+            return route, {"text": self._text(8), "top_k": 10}
+        if route == "log_action":
+            return route, {
+                "action": self.random.choice(_ACTIONS),
+                "context": {"task_type": self.random.choice(_TASK_TYPES)},
+                "result": {"test_pass_rate": self.random.random()},
+            }
+        return route, {
+            "action_id": self.random.choice(self.action_ids),
+            "accepted": self.random.random() < 0.7,
+        }
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def add(self, route: str, latency: float, ok: bool) -> None:
+        self.latencies[route].append(latency)
+        if not ok:
+            self.errors[route] += 1
+
+    def summary(self, elapsed: float) -> dict[str, dict[str, float]]:
+        report = {}
+        for route in ROUTES:
+            samples = self.latencies.get(route)
+            if not samples:
+                continue
+            values = np.array(samples) * 1000
+            report[route] = {
+                "requests": len(samples),
+                "errors": self.errors[route],
+                "req_per_s": round(len(samples) / elapsed, 1),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p90_ms": round(float(np.percentile(values, 90)), 3),
+                "p99_ms": round(float(np.percentile(values, 99)), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        return report
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(app: Any) -> AsyncIterator[None]:
+    """Run the app's startup and shutdown handlers; the ASGI transport does not."""
+    receive: asyncio.Queue = asyncio.Queue()
+    sent: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(app({"type": "lifespan"}, receive.get, sent.put))
+    await receive.put({"type": "lifespan.startup"})
+    message = await sent.get()
+    if message["type"] != "lifespan.startup.complete":
+        raise RuntimeError(message.get("message", "startup failed"))
+    try:
+        yield
+    finally:
+        await receive.put({"type": "lifespan.shutdown"})
+        await sent.get()
+        await task
+
+
+@contextlib.asynccontextmanager
+async def _client(app: Any, transport: str) -> AsyncIterator[httpx.AsyncClient]:
+    if transport == "asgi":
+        async with _lifespan(app):
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://load"
+            ) as client:
+                yield client
+        return
+
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        await asyncio.sleep(0.05)
+    limits = httpx.Limits(max_connections=256, max_keepalive_connections=256)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits
+        ) as client:
+            yield client
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    mix: dict[str, float],
+    rate: float,
+    duration: float,
+    max_inflight: int,
+    poisson: bool = False,
+) -> tuple[Recorder, float, int]:
+    """Issue requests open loop; returns the recorder, elapsed time and drops.
+
+    Requests that would exceed ``max_inflight`` are counted as dropped
+    instead of queued, so a stalled app cannot grow the client unboundedly.
+    """
+    recorder = Recorder()
+    routes = list(mix)
+    weights = list(mix.values())
+    inflight: set[asyncio.Task] = set()
+    dropped = 0
+
+    async def send(route: str, body: dict[str, Any], scheduled: float) -> None:
+        verb, path = ROUTES[route]
+        try:
+            response = await client.request(verb, path, json=body)
+            ok = response.status_code < 400
+            if ok and route == "log_action":
+                workload.action_ids.append(response.json()["action_id"])
+        except httpx.HTTPError:
+            ok = False
+        recorder.add(route, time.perf_counter() - scheduled, ok)
+
+    start = time.perf_counter()
+    scheduled = start
+    while scheduled - start < duration:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route, body = workload.body(workload.random.choices(routes, weights)[0])
+        if len(inflight) >= max_inflight:
+            dropped += 1
+        else:
+            task = asyncio.create_task(send(route, body, scheduled))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+        scheduled += workload.random.expovariate(rate) if poisson else 1 / rate
+    if inflight:
+        await asyncio.gather(*inflight)
+    return recorder, time.perf_counter() - start, dropped
+
+
+def _services(
+    data_dir: Path, model: str, documents: int
+) -> tuple[EmbeddingService, VectorStore, RLService]:
+    settings = get_settings()
+    if model == "stub":
+        embedding_service = stub_embedding_service(settings.vector_dimensions)
+    else:
+        embedding_service = EmbeddingService(settings.embedding_model)
+    store = VectorStore(settings.vector_dimensions, str(data_dir / "index"))
+    store.initialize()
+    if documents:
+        texts = [f"document {i} " + " ".join(_WORDS[i % 7 :]) for i in range(documents)]
+        for start in range(0, documents, 256):
+            batch = texts[start : start + 256]
+            for offset, vector in enumerate(embedding_service.encode(batch)):
+                store.upsert(f"doc{start + offset}", vector, {"n": start + offset})
+    store.save()
+    return embedding_service, store, RLService(str(data_dir / "rl"))
+
+
+def print_report(report: dict[str, dict[str, float]]) -> None:
+    print(
+        f"{'route':<12} {'requests':>9} {'errors':>7} {'req/s':>9} "
+        f"{'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    )
+    for route, r in report.items():
+        print(
+            f"{route:<12} {r['requests']:>9} {r['errors']:>7} {r['req_per_s']:>9} "
+            f"{r['p50_ms']:>9} {r['p90_ms']:>9} {r['p99_ms']:>9} {r['max_ms']:>9}"
+        )
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    mix = parse_mix(args.mix)
+    data_dir = Path(tempfile.mkdtemp(prefix="kado-load-"))
+    print(f"seeding {args.documents} documents in {data_dir}...", file=sys.stderr)
+    embedding_service, store, rl_service = _services(data_dir, args.model, args.documents)
+    app = create_app(embedding_service, store, rl_service)
+    workload = Workload(args.documents, args.seed)
+
+    try:
+        async with _client(app, args.transport) as client:
+            if args.warmup:
+                await drive(client, workload, mix, args.rate, args.warmup, args.max_inflight)
+            recorder, elapsed, dropped = await drive(
+                client, workload, mix, args.rate, args.duration, args.max_inflight, args.poisson
+            )
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = recorder.summary(elapsed)
+    total = sum(r["requests"] for r in report.values())
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "transport": args.transport,
+                "model": args.model,
+                "rate": args.rate,
+                "duration": args.duration,
+                "mix": mix,
+                "documents": args.documents,
+                "poisson": args.poisson,
+            },
+        },
+        "total": {
+            "requests": total,
+            "req_per_s": round(total / elapsed, 1),
+            "dropped": dropped,
+        },
+        "routes": report,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--transport", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--model", choices=("stub", "real"), default="stub")
+    parser.add_argument("--rate", type=float, default=100, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--warmup", type=float, default=1, help="seconds, not reported")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight,...")
+    parser.add_argument("--documents", type=int, default=1000, help="preloaded index size")
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--poisson", action="store_true", help="exponential arrivals")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args(argv)
+    try:
+        parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    # configured first so the app's own basicConfig call does not log requests
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run(args))
+    print_report(result["routes"])
+    total = result["total"]
+    print(
+        f"total: {total['requests']} requests, {total['req_per_s']} req/s, "
+        f"{total['dropped']} dropped"
+    )
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Microbenchmarks for the ai-engine hot paths, on synthetic data.
+
+Covers ``EmbeddingService.encode`` (stub model), ``VectorStore`` operations
+at each ``--sizes`` index size, ``RLService`` logging, stats and
+optimisation over logs of the same sizes, and TOON compression and
+framing on large payloads. Nothing is downloaded and nothing outside a
+temporary directory is touched.
+
+    python -m benchmarks.micro --sizes 10000,100000 --output results.json
+    python -m benchmarks.micro --baseline baseline.json --threshold 0.25
+
+With ``--baseline`` the run exits non-zero if any benchmark's p50 latency
+grows, or its throughput drops, by more than ``--threshold``.
+"""
+
+import argparse
+import base64
+import json
+import shutil
+import sys
+import tempfile
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+from src.services.log_writer import BufferedLogWriter
+from src.services.rl_service import RLService
+from src.services.vector_store import VectorStore
+from src.toon.compression import compress, decompress
+from src.toon.protocol import MessageType, decode, encode
+from src.toon.stream import StreamDecoder
+from src.toon.writer import encode_many
+
+from .harness import Result, compare, measure, print_table, write_results
+from .stubs import stub_embedding_service
+
+DIMENSIONS = 384
+GROUPS = ("embedding", "vector_store", "rl", "toon")
+
+
+def _scaled(size: int, small: int, large: int) -> int:
+    """Fewer iterations for slow operations on big inputs."""
+    return small if size <= 10_000 else large
+
+
+def bench_embedding(results: list[Result]) -> None:
+    service = stub_embedding_service(DIMENSIONS)
+    texts = [f"def function_{i}(x):\n    return x * {i}\n" for i in range(32)]
+    results.append(
+        measure("embedding.encode[32]", lambda: service.encode(texts), 200, items_per_op=32)
+    )
+
+
+def bench_vector_store(results: list[Result], size: int, workdir: Path) -> None:
+    rng = np.random.default_rng(size)
+    vectors = rng.random((size, DIMENSIONS), dtype=np.float32)
+    store = VectorStore(DIMENSIONS, str(workdir / f"index-{size}"))
+
+    def build() -> None:
+        store.initialize()
+        for i in range(size):
+            store.upsert(f"doc{i}", vectors[i], {"n": i})
+
+    results.append(measure(f"vector_store.build[{size}]", build, 1, 0, size))
+
+    query = rng.random(DIMENSIONS, dtype=np.float32)
+    iterations = _scaled(size, 200, 20)
+    results.append(
+        measure(f"vector_store.query[{size}]", lambda: store.query(query, 10), iterations)
+    )
+
+    fresh = iter(range(size, size + 10 * iterations))
+    results.append(
+        measure(
+            f"vector_store.upsert_new[{size}]",
+            lambda: store.upsert(f"doc{next(fresh)}", query, {}),
+            iterations,
+        )
+    )
+    existing = iter(range(10 * iterations))
+    results.append(
+        measure(
+            f"vector_store.upsert_existing[{size}]",
+            lambda: store.upsert(f"doc{next(existing)}", query, {}),
+            iterations,
+        )
+    )
+    doomed = iter(range(size - 1, -1, -1))
+    results.append(
+        measure(
+            f"vector_store.delete[{size}]",
+            lambda: store.delete(f"doc{next(doomed)}"),
+            iterations,
+        )
+    )
+    results.append(measure(f"vector_store.save[{size}]", store.save, 3))
+    results.append(measure(f"vector_store.load[{size}]", store.load, 3))
+    shutil.rmtree(workdir / f"index-{size}", ignore_errors=True)
+
+
+def bench_rl(results: list[Result], size: int, workdir: Path) -> None:
+    data_dir = workdir / f"rl-{size}"
+    service = RLService(str(data_dir), writer=BufferedLogWriter())
+    actions = ("edit_file", "shell", "search", "read_file", "run_tests")
+    task_types = ("bugfix", "feature", "refactor")
+    rng = np.random.default_rng(size)
+    for i in range(size):
+        action_id = service.log_action(
+            actions[i % len(actions)],
+            {"task_type": task_types[i % len(task_types)]},
+            {"test_pass_rate": float(rng.random()), "lint_score": float(rng.random())},
+        )
+        if i % 2:
+            service.record_feedback(action_id, bool(i % 3))
+    service.flush()
+    service.get_stats()
+
+    results.append(
+        measure(
+            f"rl.log_action[{size}]",
+            lambda: service.log_action("edit_file", {"task_type": "bugfix"}, {}),
+            2000,
+        )
+    )
+    service.flush()
+    results.append(measure(f"rl.get_stats[{size}]", service.get_stats, 200))
+
+    def reset_optimize() -> None:
+        service.last_optimize_file.unlink(missing_ok=True)
+
+    results.append(
+        measure(
+            f"rl.optimize_full[{size}]",
+            service.optimize,
+            _scaled(size, 10, 3),
+            setup=reset_optimize,
+            items_per_op=size,
+        )
+    )
+    results.append(
+        measure(
+            f"rl.recommend[{size}]", lambda: service.recommend("bugfix"), 2000
+        )
+    )
+    service.close()
+
+    def restart() -> None:
+        RLService(str(data_dir)).close()
+
+    results.append(measure(f"rl.restart[{size}]", restart, 5))
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def _context_payload(total_bytes: int) -> dict:
+    """Source-code-like chunks, the typical large CONTEXT_RESPONSE body."""
+    rng = np.random.default_rng(0)
+    chunks = []
+    size = 0
+    i = 0
+    while size < total_bytes:
+        noise = base64.b64encode(rng.bytes(24)).decode()
+        content = (
+            f"def handler_{i}(request):\n"
+            f"    token = '{noise}'\n"
+            f"    return process(request, token, retries={i % 7})\n"
+        ) * 8
+        chunks.append({"path": f"src/module_{i}.py", "content": content, "score": 0.5})
+        size += len(content) + 40
+        i += 1
+    return {"chunks": chunks}
+
+
+def bench_toon(results: list[Result]) -> None:
+    payload = _context_payload(1024 * 1024)
+    raw = json.dumps(payload).encode("utf-8")
+    megabyte_ops = len(raw) // 1024
+    for codec in ("rle", "zlib"):
+        compressed = compress(raw, codec)
+        results.append(
+            measure(f"toon.compress_{codec}[1MB]", lambda c=codec: compress(raw, c), 20,
+                    items_per_op=megabyte_ops)
+        )
+        results.append(
+            measure(f"toon.decompress_{codec}[1MB]", lambda c=compressed: decompress(c), 20,
+                    items_per_op=megabyte_ops)
+        )
+
+    frame = encode(MessageType.CONTEXT_RESPONSE, payload, 1)
+    results.append(
+        measure("toon.encode[1MB]", lambda: encode(MessageType.CONTEXT_RESPONSE, payload, 1), 20)
+    )
+    results.append(measure("toon.decode[1MB]", lambda: decode(frame), 20))
+
+    messages = [
+        (MessageType.TOOL_RESULT, {"success": True, "data": chunk}, i)
+        for i, chunk in enumerate(payload["chunks"][:200])
+    ]
+    results.append(
+        measure("toon.encode_many[200]", lambda: encode_many(messages), 50, items_per_op=200)
+    )
+    stream = bytes(encode_many(messages))
+
+    def stream_decode() -> None:
+        decoder = StreamDecoder()
+        for start in range(0, len(stream), 64 * 1024):
+            decoder.feed(stream[start : start + 64 * 1024])
+            for _ in decoder.frames():
+                pass
+
+    results.append(measure("toon.stream_frames[200]", stream_decode, 50, items_per_op=200))
+
+
+def run(sizes: list[int], groups: set[str]) -> list[Result]:
+    results: list[Result] = []
+    workdir = Path(tempfile.mkdtemp(prefix="kado-bench-"))
+    steps: list[tuple[str, Callable[[], None]]] = [
+        ("embedding", lambda: bench_embedding(results)),
+        *(("vector_store", lambda s=s: bench_vector_store(results, s, workdir)) for s in sizes),
+        *(("rl", lambda s=s: bench_rl(results, s, workdir)) for s in sizes),
+        ("toon", lambda: bench_toon(results)),
+    ]
+    try:
+        for group, step in steps:
+            if group in groups:
+                print(f"running {group}...", file=sys.stderr)
+                step()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("--sizes", default="10000", help="comma-separated index/log sizes")
+    parser.add_argument("--only", default=",".join(GROUPS), help="comma-separated groups")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="fail on regressions against this file")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    groups = {g for g in args.only.split(",") if g}
+    unknown = groups - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+
+    results = run(sizes, groups)
+    print_table(results)
+    if args.output:
+        write_results(
+            args.output, results, {"sizes": sizes, "groups": sorted(groups)}
+        )
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
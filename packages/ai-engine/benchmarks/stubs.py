@@ -0,0 +1,33 @@
+"""Offline stand-ins for the sentence-transformers model."""
+
+import zlib
+
+import numpy as np
+
+from src.services.embedding_service import EmbeddingService
+
+
+class StubSentenceTransformer:
+    """Deterministic pseudo-embeddings with the shape of a real model's output.
+
+    Each text is hashed into a seed, so equal texts get equal vectors, in
+    every process and run, and the cost per call grows with the batch size
+    like a real encoder's would.
+    """
+
+    def __init__(self, dimensions: int = 384) -> None:
+        self.dimensions = dimensions
+
+    def encode(self, texts: list[str], convert_to_numpy: bool = True) -> np.ndarray:
+        out = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        for i, text in enumerate(texts):
+            rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+            out[i] = rng.random(self.dimensions, dtype=np.float32)
+        return out
+
+
+def stub_embedding_service(dimensions: int = 384) -> EmbeddingService:
+    """An ``EmbeddingService`` whose model is already loaded with the stub."""
+    service = EmbeddingService("stub")
+    service._model = StubSentenceTransformer(dimensions)
+    return service
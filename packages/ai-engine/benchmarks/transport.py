@@ -0,0 +1,146 @@
+"""
+Compare request latency and throughput of the HTTP routes and the TOON socket.
+
+Both transports serve the app's stub embedding service, default collection,
+RL service and admission scheduler from one process, so the difference is
+transport overhead: HTTP parsing and routing versus TOON framing, and
+per-request round trips versus pipelining over a single connection.
+
+    python -m benchmarks.transport --requests 2000 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+import uvicorn
+
+from src.main import create_app
+from src.services.rl_service import RLService
+from src.services.vector_store import VectorStore
+from src.toon.client import TOONClient
+from src.toon.server import TOONServer
+
+from .harness import free_port
+
+DIMENSIONS = 384
+
+# (TOON method, HTTP method, HTTP path, params)
+OPERATIONS = {
+    "query": ("query", "POST", "/embeddings/query", {"text": "find me", "top_k": 10}),
+    "encode": ("encode", "POST", "/embeddings/encode", {"texts": ["hello world"]}),
+    "recommend": ("rl.recommend", "POST", "/rl/recommend", {"context": "refactor"}),
+}
+
+
+class StubEmbeddingService:
+    """Returns a fixed vector so the benchmark measures transport, not the model."""
+
+    def __init__(self) -> None:
+        self._vector = np.random.default_rng(0).random(DIMENSIONS, dtype=np.float32)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        return np.tile(self._vector, (len(texts), 1))
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    values = np.array(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+async def _drive(call, requests: int, concurrency: int) -> dict[str, float]:
+    latencies: list[float] = []
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        for _ in remaining:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"req_per_s": round(requests / elapsed, 1), **_percentiles(latencies)}
+
+
+async def run(requests: int, concurrency: int, documents: int) -> None:
+    data_dir = Path(tempfile.mkdtemp(prefix="kado-transport-bench-"))
+    embedding_service = StubEmbeddingService()
+    store = VectorStore(DIMENSIONS, str(data_dir / "index"))
+    store.initialize()
+    vectors = np.random.default_rng(1).random((documents, DIMENSIONS), dtype=np.float32)
+    for i, vector in enumerate(vectors):
+        store.upsert(f"doc{i}", vector, {"n": i})
+    store.save()
+    rl_service = RLService(str(data_dir / "rl"))
+
+    port = free_port()
+    app = create_app(embedding_service, store, rl_service)
+    http_server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=http_server.run, daemon=True)
+    thread.start()
+    while not http_server.started:
+        await asyncio.sleep(0.05)
+    # the app initializes in the background; TOON serves what it built
+    while not app.state.startup.done():
+        await asyncio.sleep(0.05)
+    app.state.startup.result()
+
+    socket_path = str(data_dir / "toon.sock")
+    toon_server = TOONServer(
+        app.state.embedding_service,
+        app.state.vector_store,
+        app.state.rl_service,
+        scheduler=app.state.scheduler,
+    )
+    await toon_server.start_unix(socket_path)
+
+    print(f"{'operation':<10} {'transport':<10} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as http:
+        toon = await TOONClient.connect_unix(socket_path)
+        for name, (method, verb, path, params) in OPERATIONS.items():
+            results = {
+                "http": await _drive(
+                    lambda: http.request(verb, path, json=params), requests, concurrency
+                ),
+                "toon": await _drive(
+                    lambda: toon.request(method, **params), requests, concurrency
+                ),
+            }
+            for transport, result in results.items():
+                print(
+                    f"{name:<10} {transport:<10} {result['req_per_s']:>10} "
+                    f"{result['p50_ms']:>9} {result['p99_ms']:>9}"
+                )
+        await toon.close()
+
+    await toon_server.close()
+    http_server.should_exit = True
+    thread.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--documents", type=int, default=10_000)
+    args = parser.parse_args()
+    # configured first so the app's own basicConfig call does not log requests
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args.requests, args.concurrency, args.documents))
+
+
+if __name__ == "__main__":
+    main()
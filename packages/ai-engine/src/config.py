@@ -1,5 +1,6 @@
 from functools import lru_cache
 
+from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,11 +13,37 @@ class Settings(BaseSettings):
 
     host: str = "0.0.0.0"
     port: int = 8100
+    # uvicorn reads its --workers default from the same variables
+    workers: int = Field(
+        1, validation_alias=AliasChoices("workers", "uvicorn_workers", "web_concurrency")
+    )
     debug: bool = False
     embedding_model: str = "all-MiniLM-L6-v2"
     vector_dimensions: int = 384
     faiss_index_path: str = "./data/faiss_index"
+    vector_index_mode: str = "local"
     log_level: str = "INFO"
+    rl_data_dir: str = "./data/rl"
+    rl_flush_batch_size: int = 256
+    rl_flush_interval_ms: int = 50
+    rl_fsync: bool = False
+    rl_segment_max_bytes: int = 64 * 1024 * 1024
+    rl_retention_bytes: int = 0
+    rl_policy: str = "epsilon_greedy"
+    rl_epsilon: float = 0.1
+    toon_socket_path: str = ""
+    toon_host: str = "127.0.0.1"
+    toon_port: int = 0
+    toon_max_frame_bytes: int = 16 * 1024 * 1024
+    toon_codec: str = "zlib"
+    toon_codec_level: int = 6
+    toon_compression_threshold: int = 1024
+    profile_sample_rate: float = 0.0
+    profile_dir: str = "./data/profiles"
+    profile_max_artifacts: int = 50
+    admission_interactive_queue_size: int = 64
+    admission_bulk_queue_size: int = 256
+    admission_batch_size: int = 32
 
 
 @lru_cache
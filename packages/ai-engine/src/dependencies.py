@@ -1,20 +1,80 @@
+import asyncio
+from collections.abc import Callable
 from typing import TYPE_CHECKING
 
-from fastapi import Request
+from fastapi import FastAPI, HTTPException, Request
+
+from .services.scheduler import PRIORITIES, PRIORITY_HEADER
 
 if TYPE_CHECKING:
     from .services.embedding_service import EmbeddingService
+    from .services.profiler import RequestProfiler
+    from .services.scheduler import AdmissionScheduler
+    from .services.vector_collections import CollectionManager
     from .services.vector_store import VectorStore
     from .services.rl_service import RLService
 
 
-def get_embedding_service(request: Request) -> "EmbeddingService":
+def is_ready(app: FastAPI) -> bool:
+    startup = getattr(app.state, "startup", None)
+    return (
+        startup is not None
+        and startup.done()
+        and not startup.cancelled()
+        and startup.exception() is None
+    )
+
+
+async def wait_until_ready(app: FastAPI) -> None:
+    """Block until startup has loaded every service; 503 if it failed."""
+    startup = getattr(app.state, "startup", None)
+    if startup is None:
+        raise HTTPException(status_code=503, detail="AI engine is not started")
+    try:
+        # shielded so a client disconnect does not cancel initialization
+        await asyncio.shield(startup)
+    except Exception as exc:
+        raise HTTPException(status_code=503, detail="AI engine failed to start") from exc
+
+
+async def get_embedding_service(request: Request) -> "EmbeddingService":
+    await wait_until_ready(request.app)
     return request.app.state.embedding_service
 
 
-def get_vector_store(request: Request) -> "VectorStore":
+async def get_vector_store(request: Request) -> "VectorStore":
+    await wait_until_ready(request.app)
     return request.app.state.vector_store
 
 
-def get_rl_service(request: Request) -> "RLService":
+async def get_collections(request: Request) -> "CollectionManager":
+    await wait_until_ready(request.app)
+    return request.app.state.collections
+
+
+async def get_rl_service(request: Request) -> "RLService":
+    await wait_until_ready(request.app)
     return request.app.state.rl_service
+
+
+def get_scheduler(request: Request) -> "AdmissionScheduler":
+    return request.app.state.scheduler
+
+
+def request_priority(default: str) -> Callable[[Request], str]:
+    """Dependency: the ``X-Kado-Priority`` header, or ``default`` for the route."""
+
+    def resolve(request: Request) -> str:
+        priority = request.headers.get(PRIORITY_HEADER, default).lower()
+        if priority not in PRIORITIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{PRIORITY_HEADER} must be one of: {', '.join(PRIORITIES)}",
+            )
+        return priority
+
+    return resolve
+
+
+def get_profiler(request: Request) -> "RequestProfiler":
+    return request.app.state.profiler
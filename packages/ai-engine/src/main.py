@@ -1,14 +1,195 @@
+import asyncio
+import contextlib
 import logging
 import time
+from typing import Any
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from .config import get_settings
+from .config import Settings, get_settings
 from .routes import router
-from .services.embedding_service import EmbeddingService
-from .services.vector_store import VectorStore
-from .services.rl_service import RLService
+from .routes.debug import router as debug_router
+from .services.profiler import PROFILE_ID_HEADER, RequestProfiler
+from .services.scheduler import BULK, INTERACTIVE, AdmissionScheduler, QueueFullError
+from .services.metrics import (
+    QUEUE_DEPTH,
+    REQUEST_SECONDS,
+    STARTUP_SECONDS,
+    monitor_event_loop_lag,
+)
+
+# faiss, numpy, sentence-transformers and the TOON transport are imported
+# inside the startup phases below, so importing this module stays cheap and
+# the server can answer /health while they load
+
+logger = logging.getLogger(__name__)
+
+
+def _route_template(request: Request) -> str:
+    """The matched route's path template, so ids do not become label values.
+
+    Routes inside included routers may only know their template relative to
+    the router prefix; the prefix is taken from the request path.
+    """
+    route = request.scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if not template:
+        return "unmatched"
+    prefix = request.url.path.rsplit("/", template.count("/"))[0]
+    return template if template.startswith(prefix) else prefix + template
+
+
+def _load_index(settings: Settings, vector_store: Any) -> Any:
+    if vector_store is None and settings.vector_index_mode == "shared":
+        from .services.shared_index import SharedVectorStore
+
+        vector_store = SharedVectorStore(
+            settings.vector_dimensions, settings.faiss_index_path
+        )
+    elif vector_store is None:
+        from .services.vector_store import VectorStore
+
+        vector_store = VectorStore(settings.vector_dimensions, settings.faiss_index_path)
+    vector_store.load()
+    return vector_store
+
+
+def _load_model(settings: Settings, embedding_service: Any) -> Any:
+    if embedding_service is None:
+        from .services.embedding_service import EmbeddingService
+
+        embedding_service = EmbeddingService(settings.embedding_model)
+    load = getattr(embedding_service, "load", None)
+    if load is not None:
+        try:
+            load()
+        except Exception:
+            # the model is loaded again on first use; RL and index routes
+            # should not be held back by a missing or broken model
+            logger.exception("Embedding model failed to load at startup")
+    return embedding_service
+
+
+def _open_rl(settings: Settings, rl_service: Any) -> Any:
+    if rl_service is None:
+        from .services.log_writer import BufferedLogWriter
+        from .services.rl_service import RLService
+
+        rl_service = RLService(
+            settings.rl_data_dir,
+            writer=BufferedLogWriter(
+                batch_size=settings.rl_flush_batch_size,
+                flush_interval=settings.rl_flush_interval_ms / 1000,
+                fsync=settings.rl_fsync,
+            ),
+            segment_max_bytes=settings.rl_segment_max_bytes,
+            retention_bytes=settings.rl_retention_bytes,
+            policy=settings.rl_policy,
+            epsilon=settings.rl_epsilon,
+        )
+    return rl_service
+
+
+async def _start_toon(app: FastAPI, settings: Settings) -> None:
+    from .toon.compression import CompressionPolicy
+    from .toon.server import TOONServer
+
+    app.state.toon_server = TOONServer(
+        app.state.embedding_service,
+        app.state.vector_store,
+        app.state.rl_service,
+        max_frame_size=settings.toon_max_frame_bytes,
+        compression=CompressionPolicy(
+            codec=settings.toon_codec,
+            level=settings.toon_codec_level,
+            threshold=settings.toon_compression_threshold,
+        ),
+        scheduler=app.state.scheduler,
+    )
+    if settings.toon_socket_path:
+        await app.state.toon_server.start_unix(settings.toon_socket_path)
+    if settings.toon_port:
+        await app.state.toon_server.start_tcp(settings.toon_host, settings.toon_port)
+    toon = app.state.toon_server
+    QUEUE_DEPTH.labels(queue="toon_inflight").set_function(lambda: toon.inflight)
+
+
+def _fork_error(settings: Settings) -> str | None:
+    """Why collections cannot be forked, or None when they can.
+
+    Forks live in one process's memory, so every other worker would answer
+    ``404`` for them.
+    """
+    if settings.vector_index_mode == "shared":
+        return "Collections cannot be forked with VECTOR_INDEX_MODE=shared"
+    if settings.workers > 1:
+        return "Collections cannot be forked with more than one worker"
+    return None
+
+
+async def _initialize(
+    app: FastAPI,
+    settings: Settings,
+    embedding_service: Any,
+    vector_store: Any,
+    rl_service: Any,
+) -> None:
+    """Load the index, the model and RL state concurrently, then start TOON.
+
+    Each phase's wall time is recorded in ``app.state.startup_phases`` (ms)
+    and in the ``kado_startup_phase_seconds`` gauge.
+    """
+    phases = app.state.startup_phases
+    started = time.perf_counter()
+
+    def record(name: str, seconds: float) -> None:
+        phases[name] = round(seconds * 1000, 1)
+        STARTUP_SECONDS.labels(phase=name).set(seconds)
+
+    async def phase(name: str, fn: Any, *args: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            record(name, time.perf_counter() - start)
+
+    results = await asyncio.gather(
+        phase("index", _load_index, settings, vector_store),
+        phase("model", _load_model, settings, embedding_service),
+        phase("rl", _open_rl, settings, rl_service),
+        return_exceptions=True,
+    )
+    # keep whatever did come up so shutdown can close it
+    for name, result in zip(("vector_store", "embedding_service", "rl_service"), results):
+        if not isinstance(result, BaseException):
+            setattr(app.state, name, result)
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.error("Startup failed", exc_info=result)
+            raise result
+
+    from .services.vector_collections import Collection, CollectionManager
+
+    # the default collection owns the on-disk index; forks layer over it
+    app.state.vector_store = Collection(app.state.vector_store, persistent=True)
+    app.state.collections = CollectionManager(
+        app.state.vector_store, fork_error=_fork_error(settings)
+    )
+    rl = app.state.rl_service
+    QUEUE_DEPTH.labels(queue="rl_log_writer").set_function(lambda: rl.pending_writes)
+
+    if settings.toon_socket_path or settings.toon_port:
+        start = time.perf_counter()
+        await _start_toon(app, settings)
+        record("toon", time.perf_counter() - start)
+
+    record("total", time.perf_counter() - started)
+    logger.info(
+        "Startup complete: %s",
+        ", ".join(f"{name} {ms:.0f}ms" for name, ms in phases.items()),
+    )
 
 
 def create_app(
@@ -31,6 +212,11 @@ def create_app(
         start = time.perf_counter()
         response = await call_next(request)
         duration = time.perf_counter() - start
+        REQUEST_SECONDS.labels(
+            method=request.method,
+            route=_route_template(request),
+            status=str(response.status_code),
+        ).observe(duration)
         logging.info(
             "%s %s %s %.3fs",
             request.method,
@@ -40,36 +226,103 @@ def create_app(
         )
         return response
 
+    @app.exception_handler(QueueFullError)
+    async def queue_full(request: Request, exc: QueueFullError) -> JSONResponse:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
     app.include_router(router)
 
+    settings = get_settings()
+    if settings.debug:
+        # nothing below exists unless DEBUG is set, so profiling costs
+        # nothing in production
+        profiler = RequestProfiler(
+            settings.profile_dir,
+            settings.profile_max_artifacts,
+            settings.profile_sample_rate,
+        )
+        app.state.profiler = profiler
+        app.include_router(debug_router, prefix="/debug", tags=["debug"])
+
+        @app.middleware("http")
+        async def profile_requests(request: Request, call_next):
+            if request.url.path.startswith("/debug/") or not profiler.wanted(
+                request.headers
+            ):
+                return await call_next(request)
+            profile = profiler.start()
+            if profile is None:
+                return await call_next(request)
+            start = time.perf_counter()
+            try:
+                response = await call_next(request)
+            finally:
+                profiler.stop(profile)
+            info = {
+                "method": request.method,
+                "path": request.url.path,
+                "status": response.status_code,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            profile_id = await asyncio.to_thread(profiler.save, profile, info)
+            response.headers[PROFILE_ID_HEADER] = profile_id
+            return response
+
     @app.on_event("startup")
     async def startup() -> None:
         settings = get_settings()
         logging.basicConfig(level=getattr(logging, settings.log_level.upper()))
-        app.state.embedding_service = (
-            embedding_service
-            if embedding_service is not None
-            else EmbeddingService(settings.embedding_model)
-        )
-        app.state.vector_store = (
-            vector_store
-            if vector_store is not None
-            else VectorStore(
-                settings.vector_dimensions,
-                settings.faiss_index_path,
-            )
+        app.state.startup_phases = {}
+        app.state.scheduler = AdmissionScheduler(
+            {
+                INTERACTIVE: settings.admission_interactive_queue_size,
+                BULK: settings.admission_bulk_queue_size,
+            },
+            batch_size=settings.admission_batch_size,
         )
-        app.state.vector_store.load()
-        app.state.rl_service = (
-            rl_service if rl_service is not None else RLService()
+        app.state.scheduler.start()
+        # initialization runs in the background so the server starts
+        # accepting requests at once; routes that need a service wait for it
+        app.state.startup = asyncio.create_task(
+            _initialize(app, settings, embedding_service, vector_store, rl_service)
         )
+        app.state.loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag())
 
     @app.on_event("shutdown")
     async def shutdown() -> None:
+        if hasattr(app.state, "loop_lag_monitor"):
+            app.state.loop_lag_monitor.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await app.state.loop_lag_monitor
+        if hasattr(app.state, "startup"):
+            # the phases run in threads and cannot be interrupted
+            with contextlib.suppress(Exception):
+                await app.state.startup
+        if hasattr(app.state, "toon_server"):
+            await app.state.toon_server.close()
+        if hasattr(app.state, "scheduler"):
+            # let the job in progress finish before the index is saved
+            await asyncio.to_thread(app.state.scheduler.close)
         if hasattr(app.state, "vector_store"):
             app.state.vector_store.save()
+            if hasattr(app.state.vector_store, "close"):
+                app.state.vector_store.close()
+        if hasattr(app.state, "rl_service"):
+            app.state.rl_service.close()
 
     return app
 
 
-app = create_app()
+def __getattr__(name: str) -> Any:
+    # ``uvicorn src.main:app`` looks the app up by name; build it then rather
+    # than as a side effect of every import of this module
+    if name == "app":
+        app = create_app()
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -13,11 +13,13 @@ class UpsertRequest(BaseModel):
     id: str
     text: str
     metadata: dict = Field(default_factory=dict)
+    collection: str = "default"
 
 
 class QueryRequest(BaseModel):
     text: str
     top_k: int = 10
+    collection: str = "default"
 
 
 class QueryResult(BaseModel):
@@ -30,6 +32,22 @@ class QueryResponse(BaseModel):
     results: list[QueryResult]
 
 
+class ForkRequest(BaseModel):
+    name: str = Field(min_length=1)
+
+
+class CollectionInfo(BaseModel):
+    name: str
+    parent: str | None
+    size: int
+    depth: int
+    overlay: dict[str, int]
+
+
+class CollectionsResponse(BaseModel):
+    collections: list[CollectionInfo]
+
+
 class HealthResponse(BaseModel):
     status: str
     version: str
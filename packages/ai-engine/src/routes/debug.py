@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from ..dependencies import get_profiler
+from ..services.profiler import RequestProfiler
+
+router = APIRouter()
+
+
+@router.get("/profiles")
+async def list_profiles(
+    profiler: RequestProfiler = Depends(get_profiler),
+) -> dict:
+    return {"profiles": profiler.list()}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    profiler: RequestProfiler = Depends(get_profiler),
+) -> dict:
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return profile
+
+
+@router.get("/profiles/{profile_id}/download")
+async def download_profile(
+    profile_id: str,
+    profiler: RequestProfiler = Depends(get_profiler),
+) -> FileResponse:
+    path = profiler.artifact_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(
+        path, media_type="application/octet-stream", filename=path.name
+    )
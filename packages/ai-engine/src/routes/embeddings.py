@@ -1,51 +1,101 @@
+import asyncio
+from typing import TYPE_CHECKING
+
 from fastapi import APIRouter, Depends, HTTPException
 
-from ..dependencies import get_embedding_service, get_vector_store
+from ..dependencies import (
+    get_collections,
+    get_embedding_service,
+    get_scheduler,
+    request_priority,
+)
 from ..models.schemas import (
+    CollectionInfo,
+    CollectionsResponse,
     EmbeddingRequest,
     EmbeddingResponse,
+    ForkRequest,
     QueryRequest,
     QueryResponse,
     QueryResult,
     UpsertRequest,
 )
+from ..services.scheduler import BULK, INTERACTIVE
+from ..services.errors import CollectionExistsError, ForkUnavailableError
+
+if TYPE_CHECKING:
+    from ..services.vector_collections import Collection, CollectionManager
 
 router = APIRouter()
 
 
+def _collection(collections: "CollectionManager", name: str) -> "Collection":
+    try:
+        return collections.get(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown collection: {name}") from None
+
+
 @router.post("/encode", response_model=EmbeddingResponse)
 async def encode(
     request: EmbeddingRequest,
     service=Depends(get_embedding_service),
+    scheduler=Depends(get_scheduler),
+    priority: str = Depends(request_priority(BULK)),
 ) -> EmbeddingResponse:
-    embeddings = service.encode(request.texts)
+    if priority == INTERACTIVE:
+        batches = [request.texts]
+    else:
+        # one job per batch, so interactive work can run between them
+        size = scheduler.batch_size
+        batches = [request.texts[i : i + size] for i in range(0, len(request.texts), size)]
+    embeddings = []
+    for batch in batches:
+        embeddings.extend(await scheduler.run(priority, service.encode, batch))
     return EmbeddingResponse(
         embeddings=[emb.tolist() for emb in embeddings]
     )
 
 
+def _upsert(service, store, request: UpsertRequest) -> None:
+    embedding = service.encode([request.text])[0]
+    # the TOON transport holds the same lock for its own load/upsert/save
+    with store.lock:
+        store.load()
+        store.upsert(request.id, embedding, request.metadata)
+        store.save()
+
+
 @router.post("/upsert")
 async def upsert(
     request: UpsertRequest,
     service=Depends(get_embedding_service),
-    store=Depends(get_vector_store),
+    collections=Depends(get_collections),
+    scheduler=Depends(get_scheduler),
+    priority: str = Depends(request_priority(BULK)),
 ) -> dict:
-    store.load()
-    embedding = service.encode([request.text])[0]
-    store.upsert(request.id, embedding, request.metadata)
-    store.save()
+    store = _collection(collections, request.collection)
+    await scheduler.run(priority, _upsert, service, store, request)
     return {"ok": True}
 
 
+def _query(service, store, request: QueryRequest) -> list:
+    embedding = service.encode([request.text])[0]
+    with store.lock:
+        store.load()
+        return store.query(embedding, request.top_k)
+
+
 @router.post("/query", response_model=QueryResponse)
 async def query(
     request: QueryRequest,
     service=Depends(get_embedding_service),
-    store=Depends(get_vector_store),
+    collections=Depends(get_collections),
+    scheduler=Depends(get_scheduler),
+    priority: str = Depends(request_priority(INTERACTIVE)),
 ) -> QueryResponse:
-    store.load()
-    embedding = service.encode([request.text])[0]
-    results = store.query(embedding, request.top_k)
+    store = _collection(collections, request.collection)
+    results = await scheduler.run(priority, _query, service, store, request)
     return QueryResponse(
         results=[
             QueryResult(id=doc_id, score=score, metadata=meta)
@@ -54,13 +104,73 @@ async def query(
     )
 
 
+def _describe(collections: "CollectionManager") -> list[CollectionInfo]:
+    return [
+        CollectionInfo(
+            name=name,
+            parent=collection.parent,
+            size=collection.size,
+            depth=collection.depth,
+            overlay=collection.overlay,
+        )
+        for name, collection in collections.items()
+    ]
+
+
+@router.get("/collections", response_model=CollectionsResponse)
+async def list_collections(collections=Depends(get_collections)) -> CollectionsResponse:
+    # size and overlay wait for each collection's lock, held during saves
+    return CollectionsResponse(collections=await asyncio.to_thread(_describe, collections))
+
+
+@router.post("/collections/{name}/fork", status_code=201)
+async def fork_collection(
+    name: str,
+    request: ForkRequest,
+    collections=Depends(get_collections),
+) -> dict:
+    try:
+        collections.fork(name, request.name)
+    except ForkUnavailableError as exc:
+        raise HTTPException(status_code=501, detail=str(exc)) from None
+    except CollectionExistsError:
+        raise HTTPException(
+            status_code=409, detail=f"Collection already exists: {request.name}"
+        ) from None
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown collection: {name}") from None
+    return {"ok": True, "name": request.name, "parent": name}
+
+
+@router.delete("/collections/{name}")
+async def drop_collection(name: str, collections=Depends(get_collections)) -> dict:
+    try:
+        collections.drop(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown collection: {name}") from None
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from None
+    return {"ok": True}
+
+
+def _delete(store, id: str) -> bool:
+    with store.lock:
+        store.load()
+        if not store.delete(id):
+            return False
+        store.save()
+    return True
+
+
 @router.delete("/{id}")
 async def delete_embedding(
     id: str,
-    store=Depends(get_vector_store),
+    collection: str = "default",
+    collections=Depends(get_collections),
+    scheduler=Depends(get_scheduler),
+    priority: str = Depends(request_priority(INTERACTIVE)),
 ) -> dict:
-    store.load()
-    if not store.delete(id):
+    store = _collection(collections, collection)
+    if not await scheduler.run(priority, _delete, store, id):
         raise HTTPException(status_code=404, detail="Not found")
-    store.save()
     return {"ok": True}
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Request
 
-from ..dependencies import get_vector_store
+from ..dependencies import is_ready
 from ..models.schemas import HealthResponse
 
 router = APIRouter()
@@ -12,6 +12,9 @@ async def health() -> HealthResponse:
 
 
 @router.get("/health/ready")
-async def ready(store=Depends(get_vector_store)) -> dict:
-    store.load()
-    return {"ready": store.is_loaded}
+async def ready(request: Request) -> dict:
+    # answers immediately, also while startup is still loading services
+    return {
+        "ready": is_ready(request.app),
+        "startup_ms": dict(getattr(request.app.state, "startup_phases", {})),
+    }
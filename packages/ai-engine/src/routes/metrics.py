@@ -0,0 +1,15 @@
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from ..services.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def metrics() -> Response:
+    # gauge callbacks such as the index size wait for the index's lock,
+    # which a save can hold for a long time
+    return Response(await asyncio.to_thread(REGISTRY.render), media_type=CONTENT_TYPE)
@@ -1,7 +1,12 @@
+import asyncio
+from typing import TYPE_CHECKING
+
 from fastapi import APIRouter, Depends, HTTPException
 
 from ..dependencies import get_rl_service
-from ..services.rl_service import RLService
+
+if TYPE_CHECKING:
+    from ..services.rl_service import RLService
 
 router = APIRouter()
 
@@ -9,7 +14,7 @@ router = APIRouter()
 @router.post("/log-action")
 async def log_action(
     body: dict,
-    service: RLService = Depends(get_rl_service),
+    service: "RLService" = Depends(get_rl_service),
 ) -> dict:
     action = body.get("action", "")
     context = body.get("context", {})
@@ -23,7 +28,7 @@ async def log_action(
 @router.post("/feedback")
 async def record_feedback(
     body: dict,
-    service: RLService = Depends(get_rl_service),
+    service: "RLService" = Depends(get_rl_service),
 ) -> dict:
     action_id = body.get("action_id")
     accepted = body.get("accepted")
@@ -37,25 +42,34 @@ async def record_feedback(
 
 @router.get("/stats")
 async def get_stats(
-    service: RLService = Depends(get_rl_service),
+    service: "RLService" = Depends(get_rl_service),
+) -> dict:
+    # these wait on file locks, SQLite and log writes, so keep them off the loop
+    return await asyncio.to_thread(service.get_stats)
+
+
+@router.post("/flush")
+async def flush(
+    service: "RLService" = Depends(get_rl_service),
 ) -> dict:
-    return service.get_stats()
+    return {"ok": True, "flushed": await asyncio.to_thread(service.flush)}
 
 
 @router.post("/optimize")
 async def optimize(
-    service: RLService = Depends(get_rl_service),
+    service: "RLService" = Depends(get_rl_service),
 ) -> dict:
-    return service.optimize()
+    return await asyncio.to_thread(service.optimize)
 
 
 @router.post("/recommend")
 async def recommend(
     body: dict,
-    service: RLService = Depends(get_rl_service),
+    service: "RLService" = Depends(get_rl_service),
 ) -> dict:
     context = body.get("context", "")
     if not context:
         raise HTTPException(status_code=400, detail="context is required")
-    recommendations = service.recommend(context)
+    # waits for the model lock while an optimisation runs
+    recommendations = await asyncio.to_thread(service.recommend, context)
     return {"context": context, "recommendations": recommendations}
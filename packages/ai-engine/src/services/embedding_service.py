@@ -2,9 +2,13 @@ from typing import TYPE_CHECKING
 
 import numpy as np
 
+from .metrics import STAGE_SECONDS
+
 if TYPE_CHECKING:
     from sentence_transformers import SentenceTransformer
 
+_ENCODE = STAGE_SECONDS.labels(stage="encode")
+
 
 class EmbeddingService:
     def __init__(self, model_name: str = "all-MiniLM-L6-v2") -> None:
@@ -18,6 +22,11 @@ class EmbeddingService:
             self._model = SentenceTransformer(self._model_name)
         return self._model
 
+    def load(self) -> None:
+        """Load the model now instead of on the first ``encode``."""
+        self._get_model()
+
     def encode(self, texts: list[str]) -> np.ndarray:
         model = self._get_model()
-        return model.encode(texts, convert_to_numpy=True)
+        with _ENCODE.time():
+            return model.encode(texts, convert_to_numpy=True)
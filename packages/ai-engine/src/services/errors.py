@@ -0,0 +1,18 @@
+"""
+Exceptions raised by services and mapped to HTTP errors by the routes.
+
+This module imports nothing heavy, so routes can import it at module
+level without loading numpy or FAISS when the app module is imported.
+"""
+
+
+class CollectionNotFoundError(KeyError):
+    """No collection has the requested name."""
+
+
+class CollectionExistsError(ValueError):
+    """A collection with the requested name already exists."""
+
+
+class ForkUnavailableError(RuntimeError):
+    """Collections cannot be forked in this deployment."""
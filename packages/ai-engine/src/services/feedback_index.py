@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+_LOOKUP_CHUNK = 500
+
+
+class FeedbackIndex:
+    """Persistent ``action_id -> accepted`` map backed by SQLite.
+
+    Alongside the map it keeps the accepted/total counters and the cursor
+    (segment and byte offset) of the feedback log it has consumed. All of
+    them are updated in one transaction, so the index is always consistent
+    with a prefix of the feedback log and can be caught up by replaying the
+    tail.
+
+    The connection is shared by every thread of the process, so each
+    transaction and read holds a reentrant lock.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path),
+            timeout=30.0,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._lock = threading.RLock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback ("
+                "action_id TEXT PRIMARY KEY, accepted INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                "key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _meta(self, key: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    @property
+    def cursor(self) -> tuple[int, int]:
+        with self._lock:
+            return self._meta("segment"), self._meta("offset")
+
+    def counts(self) -> tuple[int, int]:
+        """Return ``(total_feedback, accepted)`` over distinct action ids."""
+        with self._lock:
+            return self._meta("total"), self._meta("accepted")
+
+    def apply(
+        self,
+        records: Iterable[tuple[str, bool]],
+        start: tuple[int, int],
+        end: tuple[int, int],
+    ) -> bool:
+        """Record feedback read from ``start`` and advance the cursor to ``end``.
+
+        Later records for the same action id replace earlier ones. Returns
+        False without changing anything if the stored cursor is no longer
+        ``start``, i.e. another process already consumed that range.
+        """
+        with self._transaction():
+            if self.cursor != tuple(start):
+                return False
+            total = self._meta("total")
+            accepted_count = self._meta("accepted")
+            for action_id, accepted in records:
+                accepted = bool(accepted)
+                row = self._conn.execute(
+                    "SELECT accepted FROM feedback WHERE action_id = ?",
+                    (action_id,),
+                ).fetchone()
+                if row is None:
+                    total += 1
+                elif row[0]:
+                    accepted_count -= 1
+                if accepted:
+                    accepted_count += 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO feedback (action_id, accepted) "
+                    "VALUES (?, ?)",
+                    (action_id, int(accepted)),
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [
+                    ("total", total),
+                    ("accepted", accepted_count),
+                    ("segment", end[0]),
+                    ("offset", end[1]),
+                ],
+            )
+        return True
+
+    def get_many(self, action_ids: Iterable[str]) -> dict[str, bool]:
+        ids = list(dict.fromkeys(action_ids))
+        found: dict[str, bool] = {}
+        for start in range(0, len(ids), _LOOKUP_CHUNK):
+            chunk = ids[start : start + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT action_id, accepted FROM feedback "
+                    f"WHERE action_id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+            found.update((aid, bool(accepted)) for aid, accepted in rows)
+        return found
+
+    def reset(self) -> None:
+        with self._transaction():
+            self._conn.execute("DELETE FROM feedback")
+            self._conn.execute("DELETE FROM meta")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
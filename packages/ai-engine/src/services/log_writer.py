@@ -0,0 +1,116 @@
+import json
+import logging
+import threading
+from typing import Any
+
+from .metrics import STAGE_SECONDS
+from .segmented_log import SegmentedLog
+
+logger = logging.getLogger(__name__)
+
+_APPEND = STAGE_SECONDS.labels(stage="jsonl_append")
+_RETRY_DELAY = 1.0
+
+
+class BufferedLogWriter:
+    """Group-commit writer for append-only JSONL logs.
+
+    ``append`` only serializes the record and queues it, so request
+    handlers never touch the file system. A background thread writes the
+    queue once ``batch_size`` records are pending or ``flush_interval``
+    seconds after the first queued record, opening each target file once
+    per batch. With ``fsync`` enabled every batch is fsynced before the
+    next one starts. Segment rotation and compaction happen on the writer
+    thread as part of a flush, after the batch is written.
+
+    Records whose write fails go back to the front of the queue. The
+    writer thread logs the error and retries after a pause; an explicit
+    ``flush`` or ``close`` raises it. A failed rotation is only logged:
+    its records are already in the log and the next write retries it.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+        fsync: bool = False,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._pending: list[tuple[SegmentedLog, bytes]] = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="rl-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def append(self, log: SegmentedLog, record: dict[str, Any]) -> None:
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Log writer is closed")
+            self._pending.append((log, line))
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self) -> int:
+        """Write every queued record and return how many were written."""
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            grouped: dict[SegmentedLog, list[bytes]] = {}
+            for log, line in batch:
+                grouped.setdefault(log, []).append(line)
+            written: set[SegmentedLog] = set()
+            full: list[SegmentedLog] = []
+            try:
+                for log, lines in grouped.items():
+                    with _APPEND.time():
+                        if log.write(b"".join(lines), fsync=self.fsync):
+                            full.append(log)
+                    written.add(log)
+            except BaseException:
+                # requeue what was not written, ahead of newer records
+                with self._cond:
+                    self._pending[:0] = [item for item in batch if item[0] not in written]
+                raise
+            for log in full:
+                try:
+                    log.rotate_if_full()
+                except Exception:
+                    # the records are already written; the next full write retries
+                    logger.exception("Failed to rotate %s", log.active_path)
+            return len(batch)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                if len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # the batch is queued again; an exception must not end the thread
+                logger.exception("Failed to flush RL log batch")
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed, _RETRY_DELAY)
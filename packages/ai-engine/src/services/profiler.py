@@ -0,0 +1,163 @@
+"""
+Per-request profiling for debugging slow calls.
+
+``RequestProfiler`` decides whether a request is profiled (an explicit
+header or a random sample), runs it under ``cProfile`` and stores the
+result in a bounded ring of artifacts on disk: a ``.prof`` file readable
+with ``pstats`` or snakeviz, and a ``.json`` sidecar with the request
+line, status, duration and the top functions by cumulative time.
+
+Only one request is profiled at a time, because ``cProfile`` traces a
+whole thread and concurrent handlers share the event loop thread. Other
+coroutines that run on the loop while a profiled request awaits show up in
+its profile; with mostly synchronous handlers that interleaving is small.
+Work the request hands to another thread through :func:`run_profiled` is
+profiled on that thread and merged into the same artifact.
+"""
+
+import cProfile
+import contextvars
+import io
+import json
+import pstats
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+PROFILE_HEADER = "x-kado-profile"
+PROFILE_ID_HEADER = "X-Kado-Profile-Id"
+_TOP_FUNCTIONS = 25
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# profiles of work done on other threads for the request being profiled
+_THREAD_PROFILES: contextvars.ContextVar[list[cProfile.Profile] | None] = (
+    contextvars.ContextVar("kado_thread_profiles", default=None)
+)
+
+
+class _RequestProfile(cProfile.Profile):
+    threads: list[cProfile.Profile]
+    token: contextvars.Token
+
+
+def run_profiled(fn: Any, *args: Any) -> Any:
+    """Call ``fn(*args)``, profiling it if the calling request is profiled.
+
+    Run it inside a copy of the request's context, e.g. with
+    ``contextvars.copy_context().run`` on a worker thread.
+    """
+    profiles = _THREAD_PROFILES.get()
+    if profiles is None:
+        return fn(*args)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return fn(*args)
+    try:
+        return fn(*args)
+    finally:
+        profile.disable()
+        profiles.append(profile)
+
+
+class RequestProfiler:
+    def __init__(
+        self,
+        directory: str,
+        max_artifacts: int = 50,
+        sample_rate: float = 0.0,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_artifacts = max_artifacts
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def wanted(self, headers: Any) -> bool:
+        """Whether the request asked to be profiled or was sampled."""
+        if headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self) -> cProfile.Profile | None:
+        """A running profile, or ``None`` if another request holds the profiler."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = _RequestProfile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another tool has its own profiler active on this thread
+            self._busy.release()
+            return None
+        profile.threads = []
+        profile.token = _THREAD_PROFILES.set(profile.threads)
+        return profile
+
+    def stop(self, profile: cProfile.Profile) -> None:
+        profile.disable()
+        _THREAD_PROFILES.reset(profile.token)
+        self._busy.release()
+
+    def save(self, profile: cProfile.Profile, info: dict[str, Any]) -> str:
+        """Write the artifact pair, evict the oldest beyond the cap, return its id."""
+        slug = _UNSAFE.sub("_", f"{info['method']}{info['path']}").strip("_")
+        profile_id = f"{time.time_ns()}-{slug}"[:120]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        summary = io.StringIO()
+        stats = pstats.Stats(profile, stream=summary)
+        for thread_profile in getattr(profile, "threads", ()):
+            stats.add(thread_profile)
+        stats.dump_stats(str(self.directory / f"{profile_id}.prof"))
+
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_TOP_FUNCTIONS)
+        sidecar = {
+            "id": profile_id,
+            **info,
+            "total_calls": stats.total_calls,
+            "top": summary.getvalue(),
+        }
+        with open(self.directory / f"{profile_id}.json", "w") as f:
+            json.dump(sidecar, f)
+        self._evict()
+        return profile_id
+
+    def _evict(self) -> None:
+        with self._write_lock:
+            sidecars = sorted(self.directory.glob("*.json"))
+            for path in sidecars[: max(0, len(sidecars) - self.max_artifacts)]:
+                path.unlink(missing_ok=True)
+                path.with_suffix(".prof").unlink(missing_ok=True)
+
+    def list(self) -> list[dict[str, Any]]:
+        """Stored profiles, newest first, without their text summaries."""
+        entries = []
+        for path in sorted(self.directory.glob("*.json"), reverse=True):
+            try:
+                with open(path) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue  # evicted or half-written
+            entry.pop("top", None)
+            entries.append(entry)
+        return entries
+
+    def get(self, profile_id: str) -> dict[str, Any] | None:
+        if _UNSAFE.search(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.json"
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def artifact_path(self, profile_id: str) -> Path | None:
+        if _UNSAFE.search(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.prof"
+        return path if path.exists() else None
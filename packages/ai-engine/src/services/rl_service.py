@@ -1,95 +1,250 @@
 import json
+import os
 import random
+import tempfile
+import threading
 import uuid
 from pathlib import Path
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Any
 
+import numpy as np
+
+from .feedback_index import FeedbackIndex
+from .log_writer import BufferedLogWriter
+from .file_lock import FileLock
+from .metrics import STAGE_SECONDS
+from .segmented_log import Column, SegmentedLog, iter_lines, write_json_atomic
+
+_REPLAY_ATTEMPTS = 5
+_OPTIMIZE = STAGE_SECONDS.labels(stage="optimize")
+
+POLICIES = ("epsilon_greedy", "ucb1", "thompson")
+
+
+@dataclass
+class _ContextRanking:
+    entries: list[dict[str, Any]]
+    ranked: list[dict[str, Any]]
+    alpha: np.ndarray
+    beta: np.ndarray
+
 
 class ToolSelectionBandit:
-    """Epsilon-greedy contextual bandit for tool selection optimization.
+    """Contextual bandit for tool selection optimization.
 
     Each "arm" is a tool name, and the context is the task type. Tracks
     per-tool, per-context success/attempt counts to learn which tools
     work best for which kinds of tasks.
+
+    Context and tool names are interned to row/column ids of dense count
+    arrays, so a batch of rewards is applied with a single scatter-add.
+    The model is persisted as ``.npz`` next to ``model_path``; a legacy
+    JSON model at ``model_path`` is still read on load.
+
+    ``policy`` selects how recommendations are ordered: ``epsilon_greedy``
+    (by expected reward, shuffled with probability ``epsilon``), ``ucb1``
+    (by upper confidence bound) or ``thompson`` (by a draw from each
+    tool's Beta posterior). Per-context rankings are cached and only
+    recomputed after that context's counts change.
     """
 
-    def __init__(self, model_path: str, epsilon: float = 0.1) -> None:
+    def __init__(
+        self,
+        model_path: str,
+        epsilon: float = 0.1,
+        policy: str = "epsilon_greedy",
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown bandit policy: {policy}")
         self.model_path = Path(model_path)
+        self.array_path = self.model_path.with_suffix(".npz")
         self.epsilon = epsilon
-        self._data: dict[str, dict[str, dict[str, float]]] = {}
+        self.policy = policy
+        self._rng = np.random.default_rng()
+        self._rankings: dict[int, _ContextRanking] = {}
+        self._context_ids: dict[str, int] = {}
+        self._tool_ids: dict[str, int] = {}
+        self._tool_names: list[str] = []
+        self._successes = np.zeros((0, 0), dtype=np.float64)
+        self._attempts = np.zeros((0, 0), dtype=np.float64)
+        self._seen = np.zeros((0, 0), dtype=bool)
+        self._stamp: tuple[int, int, int] | None = None
         self._load()
 
-    def _load(self) -> None:
-        if self.model_path.exists():
-            with open(self.model_path) as f:
-                self._data = json.load(f)
-        else:
-            self._data = {}
-
-    def _save(self) -> None:
-        self.model_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.model_path, "w") as f:
-            json.dump(self._data, f, indent=2)
+    def _file_stamp(self) -> tuple[int, int, int] | None:
+        try:
+            st = self.array_path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
 
-    def _ensure_context(self, context: str) -> dict[str, dict[str, float]]:
-        if context not in self._data:
-            self._data[context] = {}
-        return self._data[context]
+    def reload_if_changed(self) -> None:
+        """Reload the model if another process saved a newer one."""
+        if self._file_stamp() != self._stamp:
+            self._load()
 
-    def _ensure_tool(self, context: str, tool: str) -> dict[str, float]:
-        ctx = self._ensure_context(context)
-        if tool not in ctx:
-            ctx[tool] = {"successes": 0.0, "attempts": 0.0}
-        return ctx[tool]
+    def _load(self) -> None:
+        self._rankings.clear()
+        self._stamp = self._file_stamp()
+        if self._stamp is not None:
+            with np.load(self.array_path, allow_pickle=False) as data:
+                contexts = data["contexts"].tolist()
+                tools = data["tools"].tolist()
+                self._context_ids = {c: i for i, c in enumerate(contexts)}
+                self._tool_ids = {t: i for i, t in enumerate(tools)}
+                self._tool_names = tools
+                self._successes = data["successes"].copy()
+                self._attempts = data["attempts"].copy()
+                self._seen = data["seen"].copy()
+        elif self.model_path.exists():
+            with open(self.model_path) as f:
+                self._load_legacy(json.load(f))
+
+    def _load_legacy(self, data: dict[str, dict[str, dict[str, float]]]) -> None:
+        for context, tools in data.items():
+            row = self._intern_context(context)
+            for tool, stats in tools.items():
+                col = self._intern_tool(tool)
+                self._successes[row, col] = stats.get("successes", 0.0)
+                self._attempts[row, col] = stats.get("attempts", 0.0)
+                self._seen[row, col] = True
+
+    def save(self) -> None:
+        """Atomically replace the persisted model with the current counts."""
+        self.array_path.parent.mkdir(parents=True, exist_ok=True)
+        n_contexts, n_tools = len(self._context_ids), len(self._tool_ids)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.array_path.parent, prefix=self.array_path.name, suffix=".tmp"
+        )
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                contexts=np.array(list(self._context_ids), dtype=str),
+                tools=np.array(self._tool_names, dtype=str),
+                successes=self._successes[:n_contexts, :n_tools],
+                attempts=self._attempts[:n_contexts, :n_tools],
+                seen=self._seen[:n_contexts, :n_tools],
+            )
+        os.replace(tmp_path, self.array_path)
+        self._stamp = self._file_stamp()
+
+    def _reserve(self, n_contexts: int, n_tools: int) -> None:
+        rows, cols = self._attempts.shape
+        if n_contexts <= rows and n_tools <= cols:
+            return
+        new_shape = (
+            max(n_contexts, rows * 2) if n_contexts > rows else rows,
+            max(n_tools, cols * 2) if n_tools > cols else cols,
+        )
+        for name in ("_successes", "_attempts", "_seen"):
+            old = getattr(self, name)
+            grown = np.zeros(new_shape, dtype=old.dtype)
+            grown[:rows, :cols] = old
+            setattr(self, name, grown)
+
+    def _intern_context(self, context: str) -> int:
+        row = self._context_ids.get(context)
+        if row is None:
+            row = len(self._context_ids)
+            self._context_ids[context] = row
+            self._reserve(row + 1, len(self._tool_ids))
+        return row
+
+    def _intern_tool(self, tool: str) -> int:
+        col = self._tool_ids.get(tool)
+        if col is None:
+            col = len(self._tool_ids)
+            self._tool_ids[tool] = col
+            self._tool_names.append(tool)
+            self._reserve(len(self._context_ids), col + 1)
+        return col
 
     def get_recommendation(self, context: str) -> list[dict[str, Any]]:
-        """Return tools ranked by expected reward for the given context.
+        """Return tools ranked for the given context according to the policy.
 
-        Uses epsilon-greedy: with probability epsilon, returns a random
-        ordering to encourage exploration.
+        The returned list may be shared with later calls and must not be
+        modified.
         """
-        ctx = self._data.get(context, {})
-        if not ctx:
+        row = self._context_ids.get(context)
+        if row is None:
             return []
+        ranking = self._rankings.get(row)
+        if ranking is None:
+            ranking = self._rankings[row] = self._rank(row)
+
+        if self.policy == "thompson":
+            samples = self._rng.beta(ranking.alpha, ranking.beta)
+            return [ranking.entries[i] for i in np.argsort(-samples, kind="stable")]
+        if self.policy == "epsilon_greedy" and random.random() < self.epsilon:
+            shuffled = list(ranking.entries)
+            random.shuffle(shuffled)
+            return shuffled
+        return ranking.ranked
+
+    def _rank(self, row: int) -> _ContextRanking:
+        cols = np.flatnonzero(self._seen[row, : len(self._tool_ids)])
+        attempts = self._attempts[row, cols]
+        successes = self._successes[row, cols]
+        explored = attempts > 0
+        # optimistic prior of 0.5 for unexplored tools
+        mean = np.full(cols.size, 0.5)
+        np.divide(successes, attempts, out=mean, where=explored)
+        expected = np.round(mean, 4)
+
+        if self.policy == "ucb1":
+            score = np.full(cols.size, np.inf)
+            total = max(float(attempts.sum()), 1.0)
+            score[explored] = mean[explored] + np.sqrt(
+                2.0 * np.log(total) / attempts[explored]
+            )
+        else:
+            score = expected
 
-        if random.random() < self.epsilon:
-            tools = list(ctx.keys())
-            random.shuffle(tools)
-            return [
-                {
-                    "tool": t,
-                    "expected_reward": self._expected_reward(context, t),
-                    "attempts": int(ctx[t].get("attempts", 0)),
-                }
-                for t in tools
-            ]
-
-        ranked = sorted(ctx.keys(), key=lambda t: self._expected_reward(context, t), reverse=True)
-        return [
+        entries = [
             {
-                "tool": t,
-                "expected_reward": self._expected_reward(context, t),
-                "attempts": int(ctx[t].get("attempts", 0)),
+                "tool": self._tool_names[col],
+                "expected_reward": float(expected[i]),
+                "attempts": int(attempts[i]),
             }
-            for t in ranked
+            for i, col in enumerate(cols)
         ]
-
-    def _expected_reward(self, context: str, tool: str) -> float:
-        ctx = self._data.get(context, {})
-        stats = ctx.get(tool, {})
-        attempts = stats.get("attempts", 0.0)
-        if attempts == 0:
-            return 0.5  # optimistic prior for unexplored tools
-        successes = stats.get("successes", 0.0)
-        return round(successes / attempts, 4)
+        return _ContextRanking(
+            entries=entries,
+            ranked=[entries[i] for i in np.argsort(-score, kind="stable")],
+            alpha=1.0 + successes,
+            beta=1.0 + np.maximum(attempts - successes, 0.0),
+        )
 
     def update(self, context: str, tool: str, reward: float) -> None:
         """Update the bandit's estimates for a tool in a given context."""
-        stats = self._ensure_tool(context, tool)
-        stats["attempts"] += 1.0
-        stats["successes"] += reward
-        self._save()
+        self.update_many([context], [tool], [reward])
+        self.save()
+
+    def update_many(
+        self,
+        contexts: list[str],
+        tools: list[str],
+        rewards: list[float],
+    ) -> None:
+        """Apply a batch of rewards in one scatter-add without persisting.
+
+        Callers are expected to call :meth:`save` once the batch is applied.
+        """
+        if len(rewards) == 0:
+            return
+        rows = np.fromiter(
+            (self._intern_context(c) for c in contexts), dtype=np.intp, count=len(contexts)
+        )
+        cols = np.fromiter(
+            (self._intern_tool(t) for t in tools), dtype=np.intp, count=len(tools)
+        )
+        np.add.at(self._attempts, (rows, cols), 1.0)
+        np.add.at(self._successes, (rows, cols), np.asarray(rewards, dtype=np.float64))
+        self._seen[rows, cols] = True
+        for row in np.unique(rows).tolist():
+            self._rankings.pop(row, None)
 
     @staticmethod
     def compute_reward(action_log: dict) -> float:
@@ -110,17 +265,183 @@ class ToolSelectionBandit:
 
         return round(0.4 * test_pass_rate + 0.2 * lint_score + 0.4 * user_acceptance, 4)
 
+    @staticmethod
+    def compute_rewards(
+        test_pass_rate: np.ndarray,
+        lint_score: np.ndarray,
+        accepted: np.ndarray,
+    ) -> np.ndarray:
+        """Vectorized :meth:`compute_reward` over columns of action logs."""
+        test_pass_rate = np.clip(np.asarray(test_pass_rate, dtype=np.float64), 0.0, 1.0)
+        lint_score = np.clip(np.asarray(lint_score, dtype=np.float64), 0.0, 1.0)
+        user_acceptance = np.asarray(accepted, dtype=np.float64)
+        return np.round(0.4 * test_pass_rate + 0.2 * lint_score + 0.4 * user_acceptance, 4)
+
+
+def _task_type(record: dict) -> str:
+    return record.get("context", {}).get("task_type", "general")
+
+
+ACTION_COLUMNS = (
+    Column("id", "str", lambda r: r.get("id", "")),
+    Column("action", "category", lambda r: r.get("action", "unknown")),
+    Column("task_type", "category", _task_type),
+    Column(
+        "test_pass_rate",
+        "float32",
+        lambda r: float(r.get("result", {}).get("test_pass_rate", 0.0)),
+    ),
+    Column(
+        "lint_score",
+        "float32",
+        lambda r: float(r.get("result", {}).get("lint_score", 0.0)),
+    ),
+)
+
+FEEDBACK_COLUMNS = (
+    Column("action_id", "str", lambda r: r.get("action_id") or ""),
+    Column("accepted", "bool", lambda r: bool(r.get("accepted", False))),
+)
+
 
 class RLService:
-    def __init__(self, data_dir: str = "./data/rl") -> None:
+    def __init__(
+        self,
+        data_dir: str = "./data/rl",
+        checkpoint_interval: int = 1000,
+        writer: BufferedLogWriter | None = None,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        retention_bytes: int = 0,
+        policy: str = "epsilon_greedy",
+        epsilon: float = 0.1,
+    ) -> None:
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        self.actions_file = self.data_dir / "actions.jsonl"
-        self.feedback_file = self.data_dir / "feedback.jsonl"
+        self.actions_log = SegmentedLog(
+            self.data_dir, "actions", ACTION_COLUMNS, segment_max_bytes, retention_bytes
+        )
+        self.feedback_log = SegmentedLog(
+            self.data_dir, "feedback", FEEDBACK_COLUMNS, segment_max_bytes, retention_bytes
+        )
+        self.actions_file = self.actions_log.active_path
+        self.feedback_file = self.feedback_log.active_path
         self.last_optimize_file = self.data_dir / "last_optimize.json"
+        self.stats_checkpoint_file = self.data_dir / "stats_checkpoint.json"
+        self.checkpoint_interval = checkpoint_interval
         self.bandit = ToolSelectionBandit(
             model_path=str(self.data_dir / "bandit_model.json"),
+            epsilon=epsilon,
+            policy=policy,
+        )
+        self._writer = writer if writer is not None else BufferedLogWriter()
+        self._optimize_lock = FileLock(self.data_dir / "optimize.lock")
+        # the counters, cursors and bandit are shared by the HTTP routes and
+        # the TOON transport's executor threads
+        self._lock = threading.RLock()
+        self._feedback_index = FeedbackIndex(str(self.data_dir / "feedback_index.db"))
+        for log in (self.actions_log, self.feedback_log):
+            log.compact_pending()
+            log.enforce_retention()
+        self._migrate_optimize_checkpoint()
+        self._reset_stats()
+        self._restore_stats()
+
+    def _reset_stats(self) -> None:
+        self._total_actions = 0
+        self._actions_cursor = self.actions_log.start()
+        self._updates_since_checkpoint = 0
+
+    def _restore_stats(self) -> None:
+        """Load the stats checkpoint and replay log records written after it."""
+        if self.stats_checkpoint_file.exists():
+            with open(self.stats_checkpoint_file) as f:
+                checkpoint = json.load(f)
+            self._total_actions = checkpoint.get("total_actions", 0)
+            # checkpoints from before segmentation only know the active file
+            self._actions_cursor = tuple(
+                checkpoint.get("actions_cursor", (0, checkpoint.get("actions_offset", 0)))
+            )
+
+        if self.actions_log.is_stale(self._actions_cursor):
+            self._reset_stats()
+        if self.feedback_log.is_stale(self._feedback_index.cursor):
+            self._feedback_index.reset()
+
+        self._consume_tail()
+        if self._updates_since_checkpoint:
+            self._write_checkpoint()
+
+    def _consume_tail(self) -> None:
+        """Fold log records written since the last call into the counters.
+
+        Counters advance from the log itself rather than from ``log_action``
+        so that they always match the cursors stored in the checkpoint, even
+        while records are still queued in the writer.
+        """
+        count, _, self._actions_cursor = self.actions_log.read(
+            self._actions_cursor, columns=()
+        )
+        self._total_actions += count
+        self._updates_since_checkpoint += count
+        self._replay_feedback()
+
+    def _replay_feedback(self) -> None:
+        # the index is shared with other workers, which may consume the same
+        # tail first; re-read from wherever they left the cursor
+        for _ in range(_REPLAY_ATTEMPTS):
+            cursor = self._feedback_index.cursor
+            _, columns, end = self.feedback_log.read(cursor)
+            if end == cursor:
+                return
+            records = [
+                (action_id, accepted)
+                for action_id, accepted in zip(
+                    columns["action_id"].tolist(), columns["accepted"].tolist()
+                )
+                if action_id
+            ]
+            if self._feedback_index.apply(records, cursor, end):
+                return
+
+    def _sync(self) -> None:
+        """Make buffered records visible to stats and optimize."""
+        self._writer.flush()
+        with self._lock:
+            self._consume_tail()
+            if self._updates_since_checkpoint >= self.checkpoint_interval:
+                self._write_checkpoint()
+
+    def _write_checkpoint(self) -> None:
+        write_json_atomic(
+            self.stats_checkpoint_file,
+            {
+                "actions_cursor": list(self._actions_cursor),
+                "total_actions": self._total_actions,
+            },
         )
+        self._updates_since_checkpoint = 0
+
+    def checkpoint(self) -> None:
+        """Persist the counters with the log cursors they cover."""
+        self._writer.flush()
+        with self._lock:
+            self._consume_tail()
+            self._write_checkpoint()
+
+    def flush(self) -> int:
+        """Write all buffered log records and return how many were written."""
+        return self._writer.flush()
+
+    @property
+    def pending_writes(self) -> int:
+        return self._writer.pending
+
+    def close(self) -> None:
+        self._writer.close()
+        with self._lock:
+            self._consume_tail()
+            self._write_checkpoint()
+            self._feedback_index.close()
 
     def log_action(self, action: str, context: dict, result: dict) -> str:
         action_id = str(uuid.uuid4())
@@ -131,8 +452,7 @@ class RLService:
             "result": result,
             "timestamp": datetime.utcnow().isoformat(),
         }
-        with open(self.actions_file, "a") as f:
-            f.write(json.dumps(record) + "\n")
+        self._writer.append(self.actions_log, record)
         return action_id
 
     def record_feedback(self, action_id: str, accepted: bool) -> None:
@@ -141,31 +461,14 @@ class RLService:
             "accepted": accepted,
             "timestamp": datetime.utcnow().isoformat(),
         }
-        with open(self.feedback_file, "a") as f:
-            f.write(json.dumps(record) + "\n")
+        self._writer.append(self.feedback_log, record)
 
     def get_stats(self) -> dict:
-        total_actions = 0
-        feedback_by_action: dict[str, bool] = {}
-
-        if self.actions_file.exists():
-            with open(self.actions_file) as f:
-                for line in f:
-                    if line.strip():
-                        total_actions += 1
-
-        if self.feedback_file.exists():
-            with open(self.feedback_file) as f:
-                for line in f:
-                    if line.strip():
-                        data = json.loads(line)
-                        aid = data.get("action_id")
-                        if aid:
-                            feedback_by_action[aid] = data.get("accepted", False)
-
-        accepted_count = sum(1 for v in feedback_by_action.values() if v)
-        rejected_count = len(feedback_by_action) - accepted_count
-        feedback_count = len(feedback_by_action)
+        with self._lock:
+            self._sync()
+            total_actions = self._total_actions
+            feedback_count, accepted_count = self._feedback_index.counts()
+        rejected_count = feedback_count - accepted_count
         acceptance_rate = accepted_count / feedback_count if feedback_count > 0 else 0.0
 
         return {
@@ -176,97 +479,93 @@ class RLService:
             "acceptance_rate": round(acceptance_rate, 4),
         }
 
-    def _load_actions_since_last_optimize(self) -> list[dict]:
-        last_ts: str | None = None
-        if self.last_optimize_file.exists():
-            with open(self.last_optimize_file) as f:
-                meta = json.load(f)
-                last_ts = meta.get("timestamp")
-
-        actions: list[dict] = []
-        if not self.actions_file.exists():
-            return actions
-
-        with open(self.actions_file) as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                record = json.loads(line)
-                if last_ts and record.get("timestamp", "") <= last_ts:
-                    continue
-                actions.append(record)
-        return actions
-
-    def _load_feedback_map(self) -> dict[str, bool]:
-        feedback_map: dict[str, bool] = {}
-        if not self.feedback_file.exists():
-            return feedback_map
-        with open(self.feedback_file) as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                data = json.loads(line)
-                aid = data.get("action_id")
-                if aid:
-                    feedback_map[aid] = data.get("accepted", False)
-        return feedback_map
+    def _migrate_optimize_checkpoint(self) -> None:
+        """Convert an offset- or timestamp-only optimize checkpoint to a cursor.
+
+        Both predate log segmentation, so they refer to the first segment.
+        Timestamp-only checkpoints are resolved by one filtered scan.
+        """
+        if not self.last_optimize_file.exists():
+            return
+        with open(self.last_optimize_file) as f:
+            meta = json.load(f)
+        if "actions_cursor" in meta:
+            return
+
+        if "actions_offset" in meta:
+            offset = meta["actions_offset"]
+        else:
+            last_ts = meta.get("timestamp") or ""
+            offset = 0
+            for line, end in iter_lines(self.actions_file, 0):
+                if line.strip() and json.loads(line).get("timestamp", "") <= last_ts:
+                    offset = end
+        meta["actions_cursor"] = [0, offset]
+        write_json_atomic(self.last_optimize_file, meta)
+
+    def _optimize_cursor(self) -> tuple[int, int]:
+        if not self.last_optimize_file.exists():
+            return self.actions_log.start()
+        with open(self.last_optimize_file) as f:
+            cursor = tuple(json.load(f)["actions_cursor"])
+        if self.actions_log.is_stale(cursor):
+            return self.actions_log.start()
+        return cursor
 
     def optimize(self) -> dict:
-        actions = self._load_actions_since_last_optimize()
-        if not actions:
+        with _OPTIMIZE.time(), self._lock:
+            self._sync()
+            # other workers optimize against the same log and model; hold the
+            # lock across reading the cursor and saving the model so no action
+            # is applied twice and no update is overwritten
+            with self._optimize_lock:
+                self.bandit.reload_if_changed()
+                return self._optimize_locked()
+
+    def _optimize_locked(self) -> dict:
+        count, columns, cursor = self.actions_log.read(self._optimize_cursor())
+        if count == 0:
             return {
                 "status": "ok",
                 "actions_processed": 0,
                 "message": "No new actions to process",
             }
 
-        feedback_map = self._load_feedback_map()
-
-        rewards: list[float] = []
-        for action_log in actions:
-            action_id = action_log.get("id", "")
-            tool = action_log.get("action", "unknown")
-            context = action_log.get("context", {})
-            task_type = context.get("task_type", "general")
-
-            enriched = {**action_log}
-            if action_id in feedback_map:
-                enriched["feedback"] = {"accepted": feedback_map[action_id]}
-            else:
-                enriched["feedback"] = {"accepted": False}
+        action_ids = columns["id"].tolist()
+        feedback_map = self._feedback_index.get_many(action_ids)
+        accepted = np.fromiter(
+            (feedback_map.get(aid, False) for aid in action_ids), dtype=bool, count=count
+        )
+        rewards = ToolSelectionBandit.compute_rewards(
+            columns["test_pass_rate"], columns["lint_score"], accepted
+        )
+        task_types = columns["task_type"].tolist()
 
-            reward = ToolSelectionBandit.compute_reward(enriched)
-            rewards.append(reward)
-            self.bandit.update(task_type, tool, reward)
+        self.bandit.update_many(task_types, columns["action"].tolist(), rewards)
+        self.bandit.save()
 
         now = datetime.utcnow().isoformat()
-        with open(self.last_optimize_file, "w") as f:
-            json.dump({"timestamp": now}, f)
-
-        avg_reward = sum(rewards) / len(rewards) if rewards else 0.0
-        reward_min = min(rewards) if rewards else 0.0
-        reward_max = max(rewards) if rewards else 0.0
-
-        contexts = set()
-        for a in actions:
-            contexts.add(a.get("context", {}).get("task_type", "general"))
+        write_json_atomic(
+            self.last_optimize_file,
+            {"timestamp": now, "actions_cursor": list(cursor)},
+        )
 
         recommendations: dict[str, list] = {}
-        for ctx in contexts:
+        for ctx in set(task_types):
             recommendations[ctx] = self.bandit.get_recommendation(ctx)
 
         return {
             "status": "ok",
-            "actions_processed": len(actions),
+            "actions_processed": count,
             "reward_distribution": {
-                "mean": round(avg_reward, 4),
-                "min": round(reward_min, 4),
-                "max": round(reward_max, 4),
+                "mean": round(float(rewards.mean()), 4),
+                "min": round(float(rewards.min()), 4),
+                "max": round(float(rewards.max()), 4),
             },
             "recommendations": recommendations,
         }
 
     def recommend(self, context: str) -> list[dict]:
-        return self.bandit.get_recommendation(context)
+        with self._lock:
+            self.bandit.reload_if_changed()
+            return self.bandit.get_recommendation(context)
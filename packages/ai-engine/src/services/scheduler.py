@@ -0,0 +1,157 @@
+"""
+Priority admission control for the embedding model and the vector index.
+
+HTTP routes and TOON methods that encode text or touch the index submit
+that work to one ``AdmissionScheduler`` instead of running it on the event
+loop or in an executor. A single worker thread runs the jobs, so the model
+and the FAISS index are used from one thread at a time whenever the app
+owns the scheduler. A ``TOONServer`` built without one, as in standalone
+use, runs handlers in executor threads and relies on the store's ``lock``.
+Whenever it picks the next job, the worker takes the oldest *interactive*
+job before any *bulk* job. Bulk encodes are split into batches, each its
+own job, so an interactive query waits for at most one batch rather than a
+whole indexing run.
+
+Each class has a bounded queue. A job that finds its queue full is
+rejected at once with :class:`QueueFullError`. The error carries a retry
+hint based on the work queued ahead of it and on recent job durations;
+the app turns it into ``429`` with ``Retry-After``.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+from .metrics import QUEUE_DEPTH, STAGE_SECONDS
+from .profiler import run_profiled
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)  # highest first
+PRIORITY_HEADER = "x-kado-priority"
+
+_WAIT = {p: STAGE_SECONDS.labels(stage=f"admission_wait_{p}") for p in PRIORITIES}
+_SMOOTHING = 0.2
+
+
+class QueueFullError(RuntimeError):
+    """The queue for ``priority`` is full; retry after ``retry_after`` seconds."""
+
+    def __init__(self, priority: str, retry_after: int) -> None:
+        super().__init__(f"The {priority} queue is full")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class _Job:
+    __slots__ = ("fn", "args", "context", "future", "enqueued")
+
+    def __init__(self, fn: Callable[..., Any], args: tuple[Any, ...]) -> None:
+        self.fn = fn
+        self.args = args
+        # carries request-scoped state such as an active profile to the worker
+        self.context = contextvars.copy_context()
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+        self.enqueued = time.perf_counter()
+
+
+class AdmissionScheduler:
+    def __init__(self, queue_sizes: dict[str, int], batch_size: int = 32) -> None:
+        unknown = set(queue_sizes) - set(PRIORITIES)
+        if unknown:
+            raise ValueError(f"Unknown priorities: {sorted(unknown)}")
+        self.batch_size = batch_size
+        self._limits = {p: queue_sizes.get(p, 0) for p in PRIORITIES}
+        self._queues: dict[str, deque[_Job]] = {p: deque() for p in PRIORITIES}
+        # recent job duration per class in seconds, for Retry-After
+        self._durations = {p: 0.01 for p in PRIORITIES}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            QUEUE_DEPTH.labels(queue=f"admission_{priority}").set_function(
+                lambda queue=queue: len(queue)
+            )
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._work, name="admission-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def depth(self, priority: str) -> int:
+        return len(self._queues[priority])
+
+    def submit(
+        self, priority: str, fn: Callable[..., Any], *args: Any
+    ) -> concurrent.futures.Future:
+        """Queue ``fn(*args)`` in ``priority``'s class; callable from any thread."""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority {priority!r}")
+        job = _Job(fn, args)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("The scheduler is closed")
+            queue = self._queues[priority]
+            if len(queue) >= self._limits[priority]:
+                raise QueueFullError(priority, self._retry_after(priority))
+            queue.append(job)
+            self._cond.notify()
+        return job.future
+
+    async def run(self, priority: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """Queue ``fn(*args)`` in ``priority``'s class and wait for its result."""
+        # cancelling the wrapper, e.g. when the client goes away, cancels
+        # the job if it has not started yet
+        return await asyncio.wrap_future(self.submit(priority, fn, *args))
+
+    def close(self) -> None:
+        """Stop the worker after its current job and fail the queued ones."""
+        with self._cond:
+            self._closed = True
+            pending = [job for queue in self._queues.values() for job in queue]
+            for queue in self._queues.values():
+                queue.clear()
+            self._cond.notify_all()
+        for job in pending:
+            if job.future.set_running_or_notify_cancel():
+                job.future.set_exception(RuntimeError("The scheduler is closed"))
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _retry_after(self, priority: str) -> int:
+        """Seconds until the work queued at or above ``priority`` should drain."""
+        ahead = 0.0
+        for p in PRIORITIES:
+            ahead += len(self._queues[p]) * self._durations[p]
+            if p == priority:
+                break
+        return max(1, math.ceil(ahead))
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and not any(self._queues.values()):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                priority = next(p for p in PRIORITIES if self._queues[p])
+                job = self._queues[priority].popleft()
+            if not job.future.set_running_or_notify_cancel():
+                continue  # the caller went away
+            start = time.perf_counter()
+            _WAIT[priority].observe(start - job.enqueued)
+            try:
+                job.future.set_result(job.context.run(run_profiled, job.fn, *job.args))
+            except BaseException as exc:
+                job.future.set_exception(exc)
+            duration = time.perf_counter() - start
+            self._durations[priority] += _SMOOTHING * (duration - self._durations[priority])
@@ -0,0 +1,385 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+from collections.abc import Callable, Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO
+
+import numpy as np
+
+from .file_lock import FileLock
+
+Cursor = tuple[int, int]
+"""Read position in a segmented log: ``(segment_seq, byte_offset)``."""
+
+
+def iter_lines(path: Path, offset: int) -> Iterator[tuple[bytes, int]]:
+    """Yield complete lines of ``path`` starting at byte ``offset``.
+
+    Each line is paired with the byte offset just past it. A trailing line
+    without a newline is treated as still being written and is not yielded.
+    """
+    if not path.exists():
+        return
+    with open(path, "rb") as f:
+        yield from _iter_file_lines(f, offset)
+
+
+def _iter_file_lines(f: BinaryIO, offset: int) -> Iterator[tuple[bytes, int]]:
+    f.seek(offset)
+    for line in f:
+        if not line.endswith(b"\n"):
+            return
+        offset += len(line)
+        yield line, offset
+
+
+def write_json_atomic(path: Path, data: Any) -> None:
+    """Replace ``path`` with ``data`` via a uniquely named temporary file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+@dataclass(frozen=True)
+class Column:
+    """A field extracted from every record when a segment is compacted.
+
+    ``kind`` is one of ``"str"`` (UTF-8 bytes), ``"category"`` (int32 codes
+    into a per-segment vocabulary), ``"float32"`` or ``"bool"``.
+    """
+
+    name: str
+    kind: str
+    extract: Callable[[dict], Any]
+
+
+def _to_array(kind: str, values: list) -> np.ndarray:
+    if kind in ("str", "category"):
+        return np.array(values, dtype=str) if values else np.array([], dtype=str)
+    return np.array(values, dtype=np.float32 if kind == "float32" else bool)
+
+
+class SegmentedLog:
+    """Append-only JSONL log split into numbered, size-bounded segments.
+
+    Records are appended to ``<name>.jsonl``. Once it grows past
+    ``max_segment_bytes`` it is renamed to ``<name>.<seq>.jsonl`` and
+    compacted into ``<name>.<seq>/``, a directory of ``.npy`` column files
+    that readers memory-map. ``retention_bytes`` (0 disables it) caps the
+    disk used by the log by deleting the oldest closed segments; the active
+    segment is never deleted.
+
+    Readers address records with a :data:`Cursor` so they can resume
+    across rotation and compaction without rescanning earlier segments.
+
+    Several processes may share one log. Appends and rotation serialize on
+    ``<name>.lock`` and compaction and retention on ``<name>.compact.lock``,
+    so batches are never interleaved and every process agrees on segment
+    numbers. Readers only hold the append lock long enough to open the
+    active segment.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        columns: Sequence[Column],
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        retention_bytes: int = 0,
+    ) -> None:
+        self.directory = Path(directory)
+        self.name = name
+        self.columns = {column.name: column for column in columns}
+        self.max_segment_bytes = max_segment_bytes
+        self.retention_bytes = retention_bytes
+        self.active_path = self.directory / f"{name}.jsonl"
+        self._manifest_path = self.directory / f"{name}.manifest.json"
+        self._segment_re = re.compile(rf"^{re.escape(name)}\.(\d{{6}})(\.jsonl)?$")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._append_lock = FileLock(self.directory / f"{name}.lock")
+        self._maintenance_lock = FileLock(self.directory / f"{name}.compact.lock")
+        with self._append_lock:
+            self._refresh()
+
+    def _refresh(self) -> None:
+        """Re-read the active segment number, which other processes may bump."""
+        seq = 0
+        if self._manifest_path.exists():
+            with open(self._manifest_path) as f:
+                seq = json.load(f).get("active_seq", 0)
+        closed = self.closed_segments()
+        # a crash between rotating and updating the manifest leaves it behind
+        self.active_seq = max(seq, closed[-1] + 1) if closed else seq
+
+    def _jsonl_path(self, seq: int) -> Path:
+        return self.directory / f"{self.name}.{seq:06d}.jsonl"
+
+    def _compacted_path(self, seq: int) -> Path:
+        return self.directory / f"{self.name}.{seq:06d}"
+
+    def closed_segments(self) -> list[int]:
+        seqs = set()
+        for path in self.directory.iterdir():
+            match = self._segment_re.match(path.name)
+            if match:
+                seqs.add(int(match.group(1)))
+        return sorted(seqs)
+
+    def append(self, data: bytes, fsync: bool = False) -> None:
+        if self.write(data, fsync=fsync):
+            self.rotate_if_full()
+
+    def write(self, data: bytes, fsync: bool = False) -> bool:
+        """Append ``data`` to the active segment and return whether it is full.
+
+        Rotation is left to the caller (see :meth:`rotate_if_full`), so once
+        this returns the data is in the log whatever maintenance does next.
+        A write or fsync that fails is truncated back to where it started
+        and re-raised, leaving no partial line behind.
+        """
+        with self._append_lock:
+            self._refresh()
+            # unbuffered, so nothing is left to flush after a truncate
+            with open(self.active_path, "ab", buffering=0) as f:
+                start = f.tell()
+                try:
+                    view = memoryview(data)
+                    while view:
+                        view = view[f.write(view):]
+                    if fsync:
+                        os.fsync(f.fileno())
+                except BaseException:
+                    f.truncate(start)
+                    raise
+                return f.tell() >= self.max_segment_bytes
+
+    def rotate_if_full(self) -> None:
+        """Rotate and compact the active segment once it reaches its size limit."""
+        with self._append_lock:
+            self._refresh()
+            rotated = (
+                self.active_path.exists()
+                and self.active_path.stat().st_size >= self.max_segment_bytes
+                and self._rotate_locked()
+            )
+        if rotated:
+            self.compact_pending()
+
+    def rotate(self) -> None:
+        """Close the active segment, compact it and apply retention."""
+        with self._append_lock:
+            self._refresh()
+            rotated = self._rotate_locked()
+        if rotated:
+            self.compact_pending()
+
+    def _rotate_locked(self) -> bool:
+        if not self.active_path.exists() or self.active_path.stat().st_size == 0:
+            return False
+        seq = self.active_seq
+        os.replace(self.active_path, self._jsonl_path(seq))
+        self.active_seq = seq + 1
+        write_json_atomic(self._manifest_path, {"active_seq": self.active_seq})
+        return True
+
+    def compact_pending(self) -> None:
+        """Compact closed segments still in JSONL form and apply retention."""
+        with self._maintenance_lock:
+            for seq in self.closed_segments():
+                if self._jsonl_path(seq).exists():
+                    self.compact(seq)
+            self.enforce_retention()
+
+    def compact(self, seq: int) -> None:
+        with self._maintenance_lock:
+            source = self._jsonl_path(seq)
+            target = self._compacted_path(seq)
+            if target.exists():
+                # compacted by a process that stopped before removing the source
+                source.unlink(missing_ok=True)
+                return
+            tmp = target.with_name(target.name + ".tmp")
+            if tmp.exists():
+                shutil.rmtree(tmp)
+            tmp.mkdir()
+
+            offsets: list[int] = []
+            values: dict[str, list] = {name: [] for name in self.columns}
+            end = 0
+            for line, end in iter_lines(source, 0):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                offsets.append(end)
+                for name, column in self.columns.items():
+                    values[name].append(column.extract(record))
+
+            np.save(tmp / "offsets.npy", np.array(offsets, dtype=np.int64))
+            vocabularies: dict[str, list[str]] = {}
+            for name, column in self.columns.items():
+                if column.kind == "category":
+                    vocab, codes = np.unique(
+                        _to_array(column.kind, values[name]), return_inverse=True
+                    )
+                    vocabularies[name] = vocab.tolist()
+                    np.save(tmp / f"{name}.npy", codes.astype(np.int32))
+                elif column.kind == "str":
+                    encoded = [str(v).encode("utf-8") for v in values[name]]
+                    np.save(tmp / f"{name}.npy", np.array(encoded, dtype=bytes))
+                else:
+                    np.save(tmp / f"{name}.npy", _to_array(column.kind, values[name]))
+            write_json_atomic(
+                tmp / "segment.json",
+                {"size": end, "vocabularies": vocabularies},
+            )
+            # readers fall back to the compacted form once the source is gone
+            os.replace(tmp, target)
+            source.unlink()
+
+    def disk_usage(self) -> int:
+        total = self.active_path.stat().st_size if self.active_path.exists() else 0
+        for seq in self.closed_segments():
+            total += self._segment_bytes(seq)
+        return total
+
+    def _segment_bytes(self, seq: int) -> int:
+        try:
+            compacted = self._compacted_path(seq)
+            if compacted.exists():
+                return sum(p.stat().st_size for p in compacted.iterdir())
+            return self._jsonl_path(seq).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def enforce_retention(self) -> None:
+        if self.retention_bytes <= 0:
+            return
+        with self._maintenance_lock:
+            total = self.disk_usage()
+            for seq in self.closed_segments():
+                if total <= self.retention_bytes:
+                    break
+                total -= self._segment_bytes(seq)
+                shutil.rmtree(self._compacted_path(seq), ignore_errors=True)
+                self._jsonl_path(seq).unlink(missing_ok=True)
+
+    def start(self) -> Cursor:
+        with self._append_lock:
+            self._refresh()
+        closed = self.closed_segments()
+        return (closed[0] if closed else self.active_seq, 0)
+
+    def is_stale(self, cursor: Cursor) -> bool:
+        """Whether ``cursor`` points past the end of the log."""
+        with self._append_lock:
+            self._refresh()
+            seq, offset = cursor
+            if seq != self.active_seq:
+                return seq > self.active_seq
+            size = self.active_path.stat().st_size if self.active_path.exists() else 0
+            return offset > size
+
+    def read(
+        self,
+        cursor: Cursor,
+        columns: Sequence[str] | None = None,
+    ) -> tuple[int, dict[str, np.ndarray], Cursor]:
+        """Read every complete record after ``cursor``.
+
+        Returns the record count, the requested columns (all by default) and
+        the cursor just past the last record read. Pass ``columns=()`` to
+        only count records.
+        """
+        names = list(self.columns) if columns is None else list(columns)
+        with self._append_lock:
+            self._refresh()
+            active_seq = self.active_seq
+            # the open file keeps pointing at this segment even if another
+            # process rotates it while we read
+            try:
+                active_file: BinaryIO | None = open(self.active_path, "rb")
+            except FileNotFoundError:
+                active_file = None
+
+        start_seq, start_offset = cursor
+        count = 0
+        parts: dict[str, list[np.ndarray]] = {name: [] for name in names}
+        try:
+            seqs = [s for s in self.closed_segments() if start_seq <= s < active_seq]
+            for seq in [*seqs, active_seq]:
+                offset = start_offset if seq == start_seq else 0
+                if seq == active_seq:
+                    n, cols, end = self._read_file(active_file, offset, names)
+                else:
+                    n, cols, end = self._read_closed(seq, offset, names)
+                count += n
+                for name in names:
+                    parts[name].append(cols[name])
+                cursor = (seq, end)
+        finally:
+            if active_file is not None:
+                active_file.close()
+
+        result = {
+            name: np.concatenate(arrays) if len(arrays) > 1 else arrays[0]
+            for name, arrays in parts.items()
+        }
+        return count, result, cursor
+
+    def _read_closed(
+        self, seq: int, offset: int, names: list[str]
+    ) -> tuple[int, dict[str, np.ndarray], int]:
+        compacted = self._compacted_path(seq)
+        try:
+            if not compacted.exists():
+                try:
+                    with open(self._jsonl_path(seq), "rb") as f:
+                        return self._read_file(f, offset, names)
+                except FileNotFoundError:
+                    pass  # compacted concurrently, or dropped by retention
+            return self._read_compacted(compacted, offset, names)
+        except FileNotFoundError:
+            return self._read_file(None, offset, names)
+
+    def _read_compacted(
+        self, path: Path, offset: int, names: list[str]
+    ) -> tuple[int, dict[str, np.ndarray], int]:
+        with open(path / "segment.json") as f:
+            meta = json.load(f)
+        offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        row = int(np.searchsorted(offsets, offset, side="right"))
+        cols: dict[str, np.ndarray] = {}
+        for name in names:
+            data = np.load(path / f"{name}.npy", mmap_mode="r")[row:]
+            kind = self.columns[name].kind
+            if kind == "category":
+                vocab = _to_array(kind, meta["vocabularies"][name])
+                data = vocab[data] if vocab.size else _to_array(kind, [])
+            elif kind == "str":
+                data = np.char.decode(data, "utf-8") if data.size else _to_array(kind, [])
+            cols[name] = data
+        return len(offsets) - row, cols, max(offset, meta["size"])
+
+    def _read_file(
+        self, f: BinaryIO | None, offset: int, names: list[str]
+    ) -> tuple[int, dict[str, np.ndarray], int]:
+        count = 0
+        values: dict[str, list] = {name: [] for name in names}
+        end = offset
+        for line, end in _iter_file_lines(f, offset) if f is not None else ():
+            if not line.strip():
+                continue
+            count += 1
+            if names:
+                record = json.loads(line)
+                for name in names:
+                    values[name].append(self.columns[name].extract(record))
+        cols = {
+            name: _to_array(self.columns[name].kind, values[name]) for name in names
+        }
+        return count, cols, end
@@ -0,0 +1,523 @@
+"""
+A vector index shared by several worker processes on one machine.
+
+With ``VECTOR_INDEX_MODE=shared`` every worker opens a ``SharedVectorStore``
+on the same directory, and the first one to take ``writer.lock`` becomes
+the writer:
+
+* The writer owns the mutable FAISS index and applies every upsert and
+  delete, its own and those forwarded by readers over ``writer.sock``.
+  Forwarded requests are TOON frames with binary payloads, so embeddings
+  travel as raw float32.
+* ``save`` on the writer publishes an immutable *generation*: a directory
+  holding ``vectors.npy``, ``labels.npy`` and ``docs.json``. The
+  ``CURRENT`` pointer is then replaced atomically. The newest generations
+  are kept and older ones are deleted. A reader still mapping a deleted
+  generation keeps working, because the file is unlinked, not truncated.
+* After publishing, the writer sends the generation number as a datagram
+  to every socket in ``readers/``.
+* Readers memory-map the newest generation's vectors and search them with
+  ``faiss.knn``, so N workers share one copy in the page cache.
+  ``save`` on a reader asks the writer to publish and attaches the
+  result, so a reader sees its own writes once they are saved.
+
+If the writer exits, its lock is released. The next reader whose
+forwarded write fails takes the lock and becomes the writer. Requires
+POSIX ``flock`` and Unix domain sockets.
+"""
+
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+import faiss
+import numpy as np
+
+from ..toon.protocol import MessageType, PayloadFormat, decode_payload, encode
+from ..toon.stream import StreamDecoder
+from .metrics import STAGE_SECONDS
+from .segmented_log import write_json_atomic
+from .vector_store import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_SEARCH = STAGE_SECONDS.labels(stage="faiss_search")
+_PUBLISH = STAGE_SECONDS.labels(stage="index_publish")
+_ATTACH = STAGE_SECONDS.labels(stage="index_attach")
+
+_RECV_SIZE = 256 * 1024
+_CONNECT_ATTEMPTS = 20
+
+
+class WriterUnavailableError(RuntimeError):
+    """No writer answered and this process could not become one."""
+
+
+class Generation:
+    """One published, immutable snapshot of the index."""
+
+    def __init__(self, number: int, path: Path) -> None:
+        self.number = number
+        try:
+            self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        except ValueError:
+            # an empty array has no data to map
+            self.vectors = np.load(path / "vectors.npy")
+        self.labels = np.load(path / "labels.npy")
+        with open(path / "docs.json") as f:
+            docs = json.load(f)
+        self.doc_ids: list[str] = docs["ids"]
+        self.metadata: list[dict[str, Any]] = docs["metadata"]
+
+        self._id_set: set[str] | None = None
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def __contains__(self, id: object) -> bool:
+        if self._id_set is None:
+            self._id_set = set(self.doc_ids)
+        return id in self._id_set
+
+    def ids(self) -> list[str]:
+        return self.doc_ids
+
+    @property
+    def size(self) -> int:
+        return len(self)
+
+    @property
+    def nbytes(self) -> int:
+        # the mapped vectors are shared with every other reader
+        return self.vectors.nbytes + len(self) * 200
+
+    def search(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[tuple[str, float, dict[str, Any]]]:
+        if not len(self) or top_k <= 0:
+            return []
+        query = np.ascontiguousarray(embedding, dtype=np.float32).reshape(1, -1)
+        with _SEARCH.time():
+            distances, rows = faiss.knn(query, self.vectors, min(top_k, len(self)))
+        return [
+            (self.doc_ids[row], float(dist), self.metadata[row])
+            for dist, row in zip(distances[0].tolist(), rows[0].tolist())
+            if row >= 0
+        ]
+
+    def query(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[tuple[str, float, dict[str, Any]]]:
+        return self.search(embedding, top_k)
+
+    def export(self) -> tuple[np.ndarray, np.ndarray, list[str], list[dict[str, Any]]]:
+        return np.asarray(self.vectors), self.labels, self.doc_ids, self.metadata
+
+
+def _generation_dir(root: Path, number: int) -> Path:
+    return root / "generations" / f"{number:012d}"
+
+
+def current_generation(root: Path) -> int | None:
+    try:
+        with open(root / "generations" / "CURRENT") as f:
+            return int(json.load(f)["generation"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def publish_generation(root: Path, store: VectorStore, number: int, keep: int) -> None:
+    """Write ``store`` as generation ``number`` and point ``CURRENT`` at it."""
+    vectors, labels, doc_ids, metadata = store.export()
+    target = _generation_dir(root, number)
+    staging = target.with_name(target.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    np.save(staging / "vectors.npy", vectors)
+    np.save(staging / "labels.npy", labels)
+    with open(staging / "docs.json", "w") as f:
+        json.dump({"ids": doc_ids, "metadata": metadata}, f, default=str)
+    os.replace(staging, target)
+    write_json_atomic(root / "generations" / "CURRENT", {"generation": number})
+
+    for path in (root / "generations").iterdir():
+        if path.name.isdigit() and int(path.name) <= number - keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class SharedVectorStore:
+    """``VectorStore`` interface over a writer-owned, reader-mapped index.
+
+    The writer or reader role is decided by the first :meth:`load`.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        index_path: str = "./data/faiss_index",
+        keep_generations: int = 2,
+    ) -> None:
+        if fcntl is None:
+            raise RuntimeError("The shared vector index requires a POSIX platform")
+        self._dimension = dimension
+        self._root = Path(index_path)
+        self._keep = keep_generations
+        self._lock = threading.RLock()
+        self._role: str | None = None
+
+        # writer state
+        self._store: VectorStore | None = None
+        self._lock_fd: int | None = None
+        self._server: socket.socket | None = None
+        self._generation_number = 0
+        self._dirty = False
+
+        # reader state
+        self._generation: Generation | None = None
+        self._announced = 0
+        self._listener: socket.socket | None = None
+        self._listener_path: Path | None = None
+        self._client: socket.socket | None = None
+        self._client_decoder = StreamDecoder()
+        self._sequence = 0
+
+    @property
+    def role(self) -> str | None:
+        """``"writer"``, ``"reader"``, or ``None`` before the first :meth:`load`."""
+        return self._role
+
+    @property
+    def lock(self) -> threading.RLock:
+        """Held by callers across multi-step sequences such as load, upsert, save."""
+        return self._lock
+
+    @property
+    def generation(self) -> int:
+        """The generation this process serves queries from."""
+        if self._role == "writer":
+            return self._generation_number
+        return self._generation.number if self._generation is not None else 0
+
+    # -- VectorStore interface ---------------------------------------------
+
+    def load(self) -> bool:
+        with self._lock:
+            if self._role is None:
+                self._root.mkdir(parents=True, exist_ok=True)
+                if not self._try_become_writer():
+                    self._become_reader()
+            elif self._role == "reader" and self._announced > self.generation:
+                self._attach(self._announced)
+        return True
+
+    def save(self) -> None:
+        with self._lock:
+            if self._role == "writer":
+                self._publish()
+                return
+        if self._role == "reader":
+            number = self._forward("index.publish")["generation"]
+            with self._lock:
+                if number > self.generation:
+                    self._attach(number)
+
+    def upsert(self, id: str, embedding: np.ndarray, metadata: dict[str, Any]) -> None:
+        with self._lock:
+            if self._role == "writer":
+                self._store.upsert(id, embedding, metadata)
+                self._dirty = True
+                return
+        self._forward(
+            "index.upsert",
+            id=id,
+            embedding=np.asarray(embedding, dtype=np.float32),
+            metadata=metadata,
+        )
+
+    def delete(self, id: str) -> bool:
+        with self._lock:
+            if self._role == "writer":
+                deleted = self._store.delete(id)
+                self._dirty = self._dirty or deleted
+                return deleted
+        return self._forward("index.delete", id=id)["deleted"]
+
+    def query(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[tuple[str, float, dict[str, Any]]]:
+        with self._lock:
+            if self._role == "writer":
+                return self._store.query(embedding, top_k)
+            generation = self._generation
+        return generation.search(embedding, top_k) if generation is not None else []
+
+    @property
+    def size(self) -> int:
+        if self._role == "writer":
+            return self._store.size
+        return len(self._generation) if self._generation is not None else 0
+
+    @property
+    def nbytes(self) -> int:
+        if self._role == "writer":
+            return self._store.nbytes
+        return self._generation.nbytes if self._generation is not None else 0
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def snapshot(self) -> Generation | None:
+        """The newest generation this process can see, as a read-only view.
+
+        The writer publishes pending writes first; a reader returns the
+        generation it already maps. ``None`` before anything is published.
+        """
+        with self._lock:
+            if self._role == "writer":
+                self._publish()
+                number = self._generation_number
+                return Generation(number, _generation_dir(self._root, number))
+            return self._generation
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._role is not None
+
+    def close(self) -> None:
+        with self._lock:
+            for sock in (self._server, self._listener, self._client):
+                if sock is not None:
+                    sock.close()
+            self._server = self._listener = self._client = None
+            if self._listener_path is not None:
+                self._listener_path.unlink(missing_ok=True)
+                self._listener_path = None
+            if self._role == "writer":
+                if self._dirty:
+                    self._publish()
+                (self._root / "writer.sock").unlink(missing_ok=True)
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)  # releases the flock
+                self._lock_fd = None
+            self._role = None
+
+    # -- writer --------------------------------------------------------------
+
+    def _try_become_writer(self) -> bool:
+        fd = os.open(self._root / "writer.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+
+        store = VectorStore(self._dimension, str(self._root))
+        number = current_generation(self._root)
+        if number is not None:
+            generation = Generation(number, _generation_dir(self._root, number))
+            store.restore(
+                np.asarray(generation.vectors),
+                generation.labels,
+                generation.doc_ids,
+                generation.metadata,
+            )
+            self._generation_number = number
+        else:
+            store.load()  # index files from the single-process mode, if any
+        self._store = store
+
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            self._listener_path.unlink(missing_ok=True)
+            self._listener_path = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        self._generation = None
+        self._role = "writer"
+        if number is None:
+            self._publish(force=True)
+        self._start_server()
+        logger.info("Shared index: writer at generation %d", self._generation_number)
+        return True
+
+    def _publish(self, force: bool = False) -> None:
+        if not (self._dirty or force):
+            return
+        with _PUBLISH.time():
+            number = self._generation_number + 1
+            publish_generation(self._root, self._store, number, self._keep)
+            self._generation_number = number
+            self._dirty = False
+        self._notify(number)
+
+    def _notify(self, number: int) -> None:
+        readers = self._root / "readers"
+        if not readers.exists():
+            return
+        message = str(number).encode()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            for path in readers.glob("*.sock"):
+                try:
+                    sock.sendto(message, str(path))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    path.unlink(missing_ok=True)  # its worker is gone
+                except OSError:
+                    pass  # a full receive buffer; the reader catches up later
+
+    def _start_server(self) -> None:
+        path = self._root / "writer.sock"
+        path.unlink(missing_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(path))
+        server.listen()
+        self._server = server
+        threading.Thread(
+            target=self._accept, args=(server,), name="shared-index-writer", daemon=True
+        ).start()
+
+    def _accept(self, server: socket.socket) -> None:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return  # closed
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        decoder = StreamDecoder()
+        with conn:
+            while True:
+                try:
+                    chunk = conn.recv(_RECV_SIZE)
+                except OSError:
+                    return
+                if not chunk:
+                    return
+                decoder.feed(chunk)
+                for header, payload in decoder.frames():
+                    try:
+                        body = decode_payload(payload, header["format"])
+                        msg_type, result = MessageType.CONTEXT_RESPONSE, self._apply(body)
+                    except Exception as exc:
+                        logger.exception("Shared index request failed")
+                        msg_type, result = MessageType.ERROR, {"message": str(exc)}
+                    conn.sendall(
+                        encode(msg_type, result, header["sequence_id"], PayloadFormat.BINARY)
+                    )
+
+    def _apply(self, body: dict[str, Any]) -> dict[str, Any]:
+        method = body.get("type")
+        with self._lock:
+            if self._role != "writer":
+                raise RuntimeError("This process is no longer the writer")
+            if method == "index.upsert":
+                self._store.upsert(body["id"], body["embedding"], body.get("metadata") or {})
+                self._dirty = True
+                return {"ok": True}
+            if method == "index.delete":
+                deleted = self._store.delete(body["id"])
+                self._dirty = self._dirty or deleted
+                return {"deleted": deleted}
+            if method == "index.publish":
+                self._publish()
+                return {"generation": self._generation_number}
+        raise ValueError(f"Unknown shared index method {method!r}")
+
+    # -- reader --------------------------------------------------------------
+
+    def _become_reader(self) -> None:
+        readers = self._root / "readers"
+        readers.mkdir(exist_ok=True)
+        path = readers / f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock"
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        listener.bind(str(path))
+        self._listener, self._listener_path = listener, path
+        threading.Thread(
+            target=self._listen, args=(listener,), name="shared-index-reader", daemon=True
+        ).start()
+        self._role = "reader"
+        number = current_generation(self._root)
+        if number is not None:
+            self._attach(number)
+        logger.info("Shared index: reader at generation %d", self.generation)
+
+    def _listen(self, listener: socket.socket) -> None:
+        while True:
+            try:
+                message = listener.recv(64)
+            except OSError:
+                return  # closed
+            try:
+                self._announced = max(self._announced, int(message))
+            except ValueError:
+                continue
+
+    def _attach(self, number: int) -> None:
+        with _ATTACH.time():
+            try:
+                self._generation = Generation(number, _generation_dir(self._root, number))
+            except FileNotFoundError:
+                # already pruned; CURRENT points at something newer
+                latest = current_generation(self._root)
+                if latest is None or latest == number:
+                    raise
+                self._generation = Generation(latest, _generation_dir(self._root, latest))
+
+    def _forward(self, method: str, **params: Any) -> dict[str, Any]:
+        """Send a mutation to the writer, taking over if there is none."""
+        for attempt in range(_CONNECT_ATTEMPTS):
+            with self._lock:
+                if self._role == "writer":
+                    return self._apply({"type": method, **params})
+                try:
+                    return self._request({"type": method, **params})
+                except (ConnectionError, FileNotFoundError):
+                    if self._client is not None:
+                        self._client.close()
+                        self._client = None
+                    if self._try_become_writer():
+                        continue
+            # another reader is taking over; give it a moment
+            time.sleep(0.05 * (attempt + 1))
+        raise WriterUnavailableError("No shared index writer is available")
+
+    def _request(self, body: dict[str, Any]) -> dict[str, Any]:
+        if self._client is None:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                client.connect(str(self._root / "writer.sock"))
+            except OSError:
+                client.close()
+                raise
+            self._client = client
+            self._client_decoder = StreamDecoder()
+        self._sequence = (self._sequence + 1) % 2**32
+        self._client.sendall(
+            encode(MessageType.CONTEXT_REQUEST, body, self._sequence, PayloadFormat.BINARY)
+        )
+        while True:
+            for header, payload in self._client_decoder.frames():
+                result = decode_payload(payload, header["format"])
+                if header["type"] == MessageType.ERROR:
+                    raise RuntimeError(result.get("message", "shared index error"))
+                return result
+            chunk = self._client.recv(_RECV_SIZE)
+            if not chunk:
+                raise ConnectionResetError("Shared index writer closed the connection")
+            self._client_decoder.feed(chunk)
@@ -0,0 +1,353 @@
+"""
+Named vector collections with copy-on-write forks.
+
+A git worktree shares nearly every file with the checkout it came from, so
+re-embedding it from scratch repeats work the main index has already done.
+A fork instead shares its parent's index and records only what differs:
+
+* A :class:`Collection` is a stack of frozen *layers* with one mutable
+  *overlay* on top. Each layer holds the documents upserted in it and the
+  ids deleted in it. An id found in a higher layer, either upserted or
+  deleted, hides every version of it below.
+* :meth:`Collection.fork` freezes the parent's overlay in place, gives the
+  parent a new empty overlay, and returns a child over the same frozen
+  layers. No vectors are copied, so forking costs the same for ten
+  documents as for a million. Later writes to either side land in that
+  side's own overlay.
+* A query searches every layer, asking each for enough extra neighbours to
+  make up for the hidden ids, and merges the hits by distance.
+* Only the ``default`` collection is persisted. While forks share its
+  bottom layer, :meth:`Collection.save` leaves that layer as it is on disk
+  and writes the changes above it to ``overlay.npz`` beside the index, so
+  a save after a fork costs as much as the changes, not the index. Once no
+  fork shares the layers, the next save folds the changes into the bottom
+  layer in place and writes one index again. Nothing is rebuilt or copied
+  while forks can still see the old layers.
+* With a shared index (``VECTOR_INDEX_MODE=shared``) the default
+  collection's store is live and is never frozen. A fork pins the newest
+  published generation instead, which is already immutable and mapped.
+
+Forks live in memory for the life of the process, so they are only
+offered when one process serves the index: a :class:`CollectionManager`
+built with ``fork_error`` refuses to fork.
+"""
+
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .errors import CollectionExistsError, CollectionNotFoundError, ForkUnavailableError
+from .metrics import INDEX_MEMORY, INDEX_SIZE
+from .vector_store import VectorStore
+
+DEFAULT_COLLECTION = "default"
+OVERLAY_FILE = "overlay.npz"
+
+_USERS_LOCK = threading.Lock()
+
+
+class _Layer:
+    """Documents upserted at one level of a collection, and ids deleted there.
+
+    ``users`` counts the collections that have the layer in their base.
+    """
+
+    __slots__ = ("store", "deleted", "users")
+
+    def __init__(self, store: Any) -> None:
+        self.store = store
+        self.deleted: set[str] = set()
+        self.users = 0
+
+
+class Collection:
+    """``VectorStore`` interface over frozen base layers and a private overlay.
+
+    ``store`` becomes the overlay. Pass ``persistent=True`` for the collection
+    that owns the on-disk index; only it reads from and writes to disk.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        base: tuple[_Layer, ...] = (),
+        parent: str | None = None,
+        persistent: bool = False,
+    ) -> None:
+        self.parent = parent
+        self._dimension = store.dimension
+        self._base = base  # bottom first
+        self._top = _Layer(store)
+        self._persistent = persistent
+        # a shared store is never frozen, so it never has an overlay file
+        index_path = getattr(store, "index_path", None) if persistent else None
+        self._overlay_path = Path(index_path) / OVERLAY_FILE if index_path else None
+        self._bottom_saved = True
+        self._lock = threading.RLock()
+        with _USERS_LOCK:
+            for layer in base:
+                layer.users += 1
+
+    @property
+    def lock(self) -> threading.RLock:
+        """Held by callers across multi-step sequences such as load, upsert, save."""
+        return self._lock
+
+    @property
+    def depth(self) -> int:
+        """Frozen layers below the overlay."""
+        return len(self._base)
+
+    @property
+    def overlay(self) -> dict[str, int]:
+        """Documents upserted and ids deleted since the last fork or compaction."""
+        with self._lock:
+            if not self._base:
+                return {"upserts": 0, "deletes": 0}
+            return {"upserts": self._top.store.size, "deletes": len(self._top.deleted)}
+
+    def fork(self, parent: str | None = None) -> "Collection":
+        """A child that sees exactly what this collection sees now.
+
+        ``parent`` is this collection's name, recorded on the child.
+        """
+        with self._lock:
+            snapshot = getattr(self._top.store, "snapshot", None)
+            if snapshot is not None:
+                # a live shared index; pin the generation it last published
+                generation = snapshot()
+                layer = _Layer(generation if generation is not None else self._new_overlay())
+                base = self._base + (layer,)
+            else:
+                if not self._base:
+                    # it may hold changes that were never saved
+                    self._bottom_saved = False
+                base = self._base + (self._top,)
+                with _USERS_LOCK:
+                    self._top.users += 1
+                self._base = base
+                self._top = _Layer(self._new_overlay())
+            return Collection(self._new_overlay(), base, parent=parent)
+
+    def release(self) -> None:
+        """Stop sharing the base layers, so their owner can fold them again."""
+        with self._lock, _USERS_LOCK:
+            for layer in self._base:
+                layer.users -= 1
+
+    # -- VectorStore interface ---------------------------------------------
+
+    def load(self) -> bool:
+        with self._lock:
+            if self._persistent and not self._base:
+                loaded = self._top.store.load()
+                self._apply_overlay_file()
+                return loaded
+        # a forked collection's state is in memory only
+        return True
+
+    def save(self) -> None:
+        if not self._persistent:
+            return
+        with self._lock:
+            if self._base and all(layer.users == 1 for layer in self._base):
+                self._fold()
+            if self._base:
+                self._save_overlay()
+                return
+            self._top.store.save()
+            if self._overlay_path is not None:
+                self._overlay_path.unlink(missing_ok=True)
+
+    def upsert(self, id: str, embedding: np.ndarray, metadata: dict[str, Any]) -> None:
+        with self._lock:
+            self._top.store.upsert(id, embedding, metadata)
+            self._top.deleted.discard(id)
+
+    def delete(self, id: str) -> bool:
+        with self._lock:
+            if not self._base:
+                return self._top.store.delete(id)
+            deleted = self._top.store.delete(id)
+            if id not in self._top.deleted and self._visible_below(id):
+                self._top.deleted.add(id)
+                deleted = True
+            return deleted
+
+    def query(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[tuple[str, float, dict[str, Any]]]:
+        with self._lock:
+            if not self._base:
+                return self._top.store.query(embedding, top_k)
+            hits: list[tuple[str, float, dict[str, Any]]] = []
+            hidden: set[str] = set()
+            layers = list(self._layers())
+            for i, layer in enumerate(layers):
+                # every hidden id could be among this layer's nearest hits
+                for hit in layer.store.query(embedding, top_k + len(hidden)):
+                    if hit[0] not in hidden:
+                        hits.append(hit)
+                if i < len(layers) - 1:
+                    hidden.update(layer.store.ids())
+                    hidden.update(layer.deleted)
+        hits.sort(key=lambda hit: hit[1])
+        return hits[:top_k]
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            if not self._base:
+                return self._top.store.size
+            total = 0
+            hidden: set[str] = set()
+            *upper, bottom = self._layers()
+            for layer in upper:
+                ids = set(layer.store.ids())
+                total += len(ids - hidden)
+                hidden |= ids | layer.deleted
+            return total + bottom.store.size - sum(1 for id in hidden if id in bottom.store)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory of the overlay plus the base layers, which forks share."""
+        with self._lock:
+            return sum(layer.store.nbytes for layer in self._layers())
+
+    @property
+    def is_loaded(self) -> bool:
+        return bool(self._base) or self._top.store.is_loaded
+
+    def close(self) -> None:
+        close = getattr(self._top.store, "close", None)
+        if close is not None:
+            close()
+
+    # -- internals -----------------------------------------------------------
+
+    def _layers(self) -> Iterator[_Layer]:
+        """Top to bottom."""
+        yield self._top
+        yield from reversed(self._base)
+
+    def _new_overlay(self) -> VectorStore:
+        store = VectorStore(self._dimension, "")
+        store.initialize()
+        return store
+
+    def _visible_below(self, id: str) -> bool:
+        for layer in reversed(self._base):
+            if id in layer.deleted:
+                return False
+            if id in layer.store:
+                return True
+        return False
+
+    def _fold(self) -> None:
+        """Apply every layer above the bottom one to it, in place."""
+        bottom = self._base[0].store
+        for layer in (*self._base[1:], self._top):
+            for doc_id in layer.deleted:
+                bottom.delete(doc_id)
+            vectors, _, doc_ids, metadata = layer.store.export()
+            for vector, doc_id, meta in zip(vectors, doc_ids, metadata):
+                bottom.upsert(doc_id, vector, meta)
+        self._base = ()
+        self._top = _Layer(bottom)
+
+    def _save_overlay(self) -> None:
+        """Write the bottom layer once and the layers above it as a diff."""
+        if self._overlay_path is None:
+            return
+        if not self._bottom_saved:
+            self._base[0].store.save()
+            self._bottom_saved = True
+        vectors: list[np.ndarray] = []
+        doc_ids: list[str] = []
+        metadata: list[dict[str, Any]] = []
+        deleted: set[str] = set()
+        hidden: set[str] = set()
+        for layer in list(self._layers())[:-1]:
+            layer_vectors, _, layer_ids, layer_meta = layer.store.export()
+            keep = [i for i, doc_id in enumerate(layer_ids) if doc_id not in hidden]
+            vectors.append(np.asarray(layer_vectors)[keep])
+            doc_ids.extend(layer_ids[i] for i in keep)
+            metadata.extend(layer_meta[i] for i in keep)
+            deleted.update(layer.deleted - hidden)
+            hidden.update(layer_ids)
+            hidden.update(layer.deleted)
+        partial = self._overlay_path.with_suffix(".tmp.npz")
+        np.savez(
+            partial,
+            vectors=np.concatenate(vectors).reshape(-1, self._dimension),
+            ids=np.array(doc_ids, dtype=object),
+            metadata=np.array(metadata, dtype=object),
+            deleted=np.array(sorted(deleted), dtype=object),
+        )
+        partial.replace(self._overlay_path)
+
+    def _apply_overlay_file(self) -> None:
+        """Replay the diff left by a save made while forks existed."""
+        if self._overlay_path is None or not self._overlay_path.exists():
+            return
+        store = self._top.store
+        data = np.load(self._overlay_path, allow_pickle=True)
+        for doc_id in data["deleted"].tolist():
+            store.delete(doc_id)
+        for vector, doc_id, meta in zip(
+            data["vectors"], data["ids"].tolist(), data["metadata"].tolist()
+        ):
+            store.upsert(doc_id, vector, meta)
+
+
+class CollectionManager:
+    """The named collections of one process, starting with ``default``.
+
+    ``fork_error`` is the reason forking is refused, if it is.
+    """
+
+    def __init__(self, default: Collection, fork_error: str | None = None) -> None:
+        self.fork_error = fork_error
+        self._collections: dict[str, Collection] = {}
+        self._lock = threading.Lock()
+        self._add(DEFAULT_COLLECTION, default)
+
+    def get(self, name: str) -> Collection:
+        try:
+            return self._collections[name]
+        except KeyError:
+            raise CollectionNotFoundError(name) from None
+
+    def items(self) -> list[tuple[str, Collection]]:
+        with self._lock:
+            return list(self._collections.items())
+
+    def fork(self, parent: str, name: str) -> Collection:
+        if self.fork_error is not None:
+            raise ForkUnavailableError(self.fork_error)
+        with self._lock:
+            if name in self._collections:
+                raise CollectionExistsError(name)
+            source = self.get(parent)
+            child = source.fork(parent)
+            self._add(name, child)
+            return child
+
+    def drop(self, name: str) -> None:
+        if name == DEFAULT_COLLECTION:
+            raise ValueError("The default collection cannot be dropped")
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is None:
+                raise CollectionNotFoundError(name)
+        collection.release()
+        INDEX_SIZE.remove(collection=name)
+        INDEX_MEMORY.remove(collection=name)
+
+    def _add(self, name: str, collection: Collection) -> None:
+        self._collections[name] = collection
+        INDEX_SIZE.labels(collection=name).set_function(lambda: collection.size)
+        INDEX_MEMORY.labels(collection=name).set_function(lambda: collection.nbytes)
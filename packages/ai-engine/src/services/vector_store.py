@@ -1,9 +1,19 @@
+import threading
+from collections.abc import KeysView
 from pathlib import Path
 from typing import Any
 
 import faiss
 import numpy as np
 
+from .metrics import STAGE_SECONDS
+
+_SEARCH = STAGE_SECONDS.labels(stage="faiss_search")
+_ADD = STAGE_SECONDS.labels(stage="faiss_add")
+_REMOVE = STAGE_SECONDS.labels(stage="faiss_remove")
+_SAVE = STAGE_SECONDS.labels(stage="index_save")
+_LOAD = STAGE_SECONDS.labels(stage="index_load")
+
 
 class VectorStore:
     def __init__(self, dimension: int, index_path: str = "./data/faiss_index") -> None:
@@ -14,6 +24,17 @@ class VectorStore:
         self._index_to_id: dict[int, str] = {}
         self._metadata: dict[int, dict[str, Any]] = {}
         self._next_index = 0
+        # callers hold this across load/upsert/save so that sequences from
+        # different threads (HTTP and TOON) do not interleave
+        self.lock = threading.RLock()
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    @property
+    def index_path(self) -> Path:
+        return self._index_path
 
     def initialize(self) -> None:
         self._index = faiss.IndexIDMap2(faiss.IndexFlatL2(self._dimension))
@@ -30,14 +51,15 @@ class VectorStore:
             self.initialize()
             return False
 
-        self._index = faiss.read_index(str(index_file))
+        with _LOAD.time():
+            self._index = faiss.read_index(str(index_file))
 
-        if meta_file.exists():
-            data = np.load(meta_file, allow_pickle=True)
-            self._id_to_index = dict(data["id_to_index"].item())
-            self._index_to_id = {v: k for k, v in self._id_to_index.items()}
-            self._metadata = dict(data["metadata"].item())
-            self._next_index = max(self._id_to_index.values(), default=-1) + 1
+            if meta_file.exists():
+                data = np.load(meta_file, allow_pickle=True)
+                self._id_to_index = dict(data["id_to_index"].item())
+                self._index_to_id = {v: k for k, v in self._id_to_index.items()}
+                self._metadata = dict(data["metadata"].item())
+                self._next_index = max(self._id_to_index.values(), default=-1) + 1
 
         return True
 
@@ -49,12 +71,13 @@ class VectorStore:
         index_file = self._index_path / "index.faiss"
         meta_file = self._index_path / "metadata.npz"
 
-        faiss.write_index(self._index, str(index_file))
-        np.savez(
-            meta_file,
-            id_to_index=np.array([self._id_to_index], dtype=object),
-            metadata=np.array([self._metadata], dtype=object),
-        )
+        with _SAVE.time():
+            faiss.write_index(self._index, str(index_file))
+            np.savez(
+                meta_file,
+                id_to_index=np.array([self._id_to_index], dtype=object),
+                metadata=np.array([self._metadata], dtype=object),
+            )
 
     def upsert(self, id: str, embedding: np.ndarray, metadata: dict[str, Any]) -> None:
         if self._index is None:
@@ -66,16 +89,18 @@ class VectorStore:
             idx = self._id_to_index[id]
             ids_to_remove = np.ascontiguousarray(np.array([idx], dtype=np.int64))
             sel = faiss.IDSelectorBatch(ids_to_remove.size, faiss.swig_ptr(ids_to_remove))
-            self._index.remove_ids(sel)
+            with _REMOVE.time():
+                self._index.remove_ids(sel)
         else:
             idx = self._next_index
             self._next_index += 1
             self._id_to_index[id] = idx
 
-        self._index.add_with_ids(
-            embedding.astype(np.float32).reshape(1, -1),
-            np.array([idx], dtype=np.int64),
-        )
+        with _ADD.time():
+            self._index.add_with_ids(
+                embedding.astype(np.float32).reshape(1, -1),
+                np.array([idx], dtype=np.int64),
+            )
         self._index_to_id[idx] = id
         self._metadata[idx] = metadata
 
@@ -83,9 +108,10 @@ class VectorStore:
         if self._index is None or self._index.ntotal == 0:
             return []
 
-        distances, indices = self._index.search(
-            embedding.astype(np.float32).reshape(1, -1), top_k
-        )
+        with _SEARCH.time():
+            distances, indices = self._index.search(
+                embedding.astype(np.float32).reshape(1, -1), top_k
+            )
 
         results: list[tuple[str, float, dict[str, Any]]] = []
         for dist, idx in zip(distances[0], indices[0]):
@@ -106,13 +132,62 @@ class VectorStore:
         idx = self._id_to_index[id]
         ids_to_remove = np.ascontiguousarray(np.array([idx], dtype=np.int64))
         sel = faiss.IDSelectorBatch(ids_to_remove.size, faiss.swig_ptr(ids_to_remove))
-        self._index.remove_ids(sel)
+        with _REMOVE.time():
+            self._index.remove_ids(sel)
         del self._id_to_index[id]
         del self._index_to_id[idx]
         del self._metadata[idx]
 
         return True
 
+    def __contains__(self, id: object) -> bool:
+        return id in self._id_to_index
+
+    def ids(self) -> KeysView[str]:
+        return self._id_to_index.keys()
+
+    def export(self) -> tuple[np.ndarray, np.ndarray, list[str], list[dict[str, Any]]]:
+        """Live vectors with their FAISS ids, document ids and metadata, row-aligned."""
+        if self._index is None or self._index.ntotal == 0:
+            return np.empty((0, self._dimension), dtype=np.float32), np.empty(0, np.int64), [], []
+        labels = faiss.vector_to_array(self._index.id_map).astype(np.int64)
+        vectors = self._index.index.reconstruct_n(0, self._index.ntotal)
+        doc_ids = [self._index_to_id[idx] for idx in labels.tolist()]
+        metadata = [self._metadata.get(idx, {}) for idx in labels.tolist()]
+        return vectors, labels, doc_ids, metadata
+
+    def restore(
+        self,
+        vectors: np.ndarray,
+        labels: np.ndarray,
+        doc_ids: list[str],
+        metadata: list[dict[str, Any]],
+    ) -> None:
+        """Replace the contents with rows previously returned by :meth:`export`."""
+        self.initialize()
+        assert self._index is not None
+        if len(labels):
+            self._index.add_with_ids(
+                np.ascontiguousarray(vectors, dtype=np.float32),
+                np.ascontiguousarray(labels, dtype=np.int64),
+            )
+        for idx, doc_id, meta in zip(labels.tolist(), doc_ids, metadata):
+            self._id_to_index[doc_id] = idx
+            self._index_to_id[idx] = doc_id
+            self._metadata[idx] = meta
+        self._next_index = max(labels.tolist(), default=-1) + 1
+
+    @property
+    def size(self) -> int:
+        return 0 if self._index is None else self._index.ntotal
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory of the vectors plus the id and metadata maps."""
+        # float32 vectors and int64 ids in FAISS, and roughly 200 bytes per
+        # entry for the three Python dicts; metadata contents are not counted
+        return self.size * (self._dimension * 4 + 8) + len(self._id_to_index) * 200
+
     @property
     def is_loaded(self) -> bool:
         return self._index is not None and self._index.ntotal >= 0
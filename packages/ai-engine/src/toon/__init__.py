@@ -1,19 +1,47 @@
-from .compression import compress, decompress, is_compressed
+from .compression import (
+    Codec,
+    CompressionPolicy,
+    PayloadTooLargeError,
+    available_codecs,
+    compress,
+    decompress,
+    get_codec,
+    is_compressed,
+    register_codec,
+)
 from .protocol import (
     MessageType,
+    PayloadFormat,
     encode,
     decode,
     encode_header,
     decode_header,
+    decode_payload,
+    encode_payload,
 )
+from .stream import FrameTooLargeError, StreamDecoder
+from .writer import FrameWriter, encode_many
 
 __all__ = [
+    "Codec",
+    "CompressionPolicy",
+    "PayloadTooLargeError",
+    "available_codecs",
     "compress",
     "decompress",
+    "get_codec",
     "is_compressed",
+    "register_codec",
     "MessageType",
+    "PayloadFormat",
     "encode",
     "decode",
     "encode_header",
     "decode_header",
+    "decode_payload",
+    "encode_payload",
+    "FrameTooLargeError",
+    "StreamDecoder",
+    "FrameWriter",
+    "encode_many",
 ]
@@ -0,0 +1,129 @@
+"""
+Binary TOON payloads: a JSON descriptor followed by raw numpy buffers.
+
+Layout of a binary body::
+
+    uint32 LE   descriptor length
+    bytes       descriptor, UTF-8 JSON {"data": ..., "arrays": [...]}
+    padding     up to the next 8-byte boundary
+    bytes       array buffers, each starting at an 8-byte aligned offset
+
+``data`` is the message with every numpy array replaced by
+``{"$ndarray": <index>}``; ``arrays[index]`` holds its ``dtype``, ``shape``
+and ``offset`` from the first 8-byte boundary after the descriptor. Only
+little-endian float32 and int64 buffers are sent. Decoded arrays are
+read-only views of the payload buffer and keep it alive.
+
+Accepted array dtypes when encoding:
+
+* float32, sent as is.
+* Signed integers, and unsigned integers up to 32 bits, widened to int64.
+* uint64, widened to int64 only when every value fits; otherwise rejected.
+
+Anything else raises ``ValueError``, including other float widths and
+bool arrays, which would otherwise come back as integers.
+"""
+
+import json
+import struct
+from typing import Any
+
+import numpy as np
+
+_LENGTH = struct.Struct("<I")
+_ALIGNMENT = 8
+_PLACEHOLDER = "$ndarray"
+_FLOAT32 = np.dtype("<f4")
+_INT64 = np.dtype("<i8")
+_DTYPES = {_FLOAT32.str: _FLOAT32, _INT64.str: _INT64}
+
+
+def _wire_array(array: np.ndarray) -> np.ndarray:
+    kind, itemsize = array.dtype.kind, array.dtype.itemsize
+    if kind == "f" and itemsize == 4:
+        target = _FLOAT32
+    elif kind == "i" or (kind == "u" and itemsize < 8):
+        target = _INT64
+    elif kind == "u":
+        if array.size and array.max() > np.iinfo(_INT64).max:
+            raise ValueError("uint64 array has values that do not fit in int64")
+        target = _INT64
+    else:
+        raise ValueError(
+            f"Binary TOON payloads support float32 and integer arrays, not {array.dtype}"
+        )
+    return np.ascontiguousarray(array, dtype=target)
+
+
+def _extract(value: Any, arrays: list[np.ndarray]) -> Any:
+    if isinstance(value, np.ndarray):
+        arrays.append(_wire_array(value))
+        return {_PLACEHOLDER: len(arrays) - 1}
+    if isinstance(value, dict):
+        return {key: _extract(item, arrays) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_extract(item, arrays) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _restore(value: Any, arrays: list[np.ndarray]) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and _PLACEHOLDER in value:
+            return arrays[value[_PLACEHOLDER]]
+        return {key: _restore(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore(item, arrays) for item in value]
+    return value
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def encode_binary(data: Any) -> bytes:
+    arrays: list[np.ndarray] = []
+    tree = _extract(data, arrays)
+    specs = []
+    offset = 0
+    for array in arrays:
+        specs.append(
+            {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        )
+        offset = _align(offset + array.nbytes)
+    descriptor = json.dumps({"data": tree, "arrays": specs}).encode("utf-8")
+
+    data_start = _align(_LENGTH.size + len(descriptor))
+    body = bytearray(data_start + offset)
+    _LENGTH.pack_into(body, 0, len(descriptor))
+    body[_LENGTH.size : _LENGTH.size + len(descriptor)] = descriptor
+    for spec, array in zip(specs, arrays):
+        if array.nbytes:
+            start = data_start + spec["offset"]
+            body[start : start + array.nbytes] = array.data.cast("B")
+    return bytes(body)
+
+
+def decode_binary(payload: bytes | memoryview) -> Any:
+    view = memoryview(payload)
+    if len(view) < _LENGTH.size:
+        raise ValueError("Binary payload too short for descriptor length")
+    (length,) = _LENGTH.unpack_from(view)
+    if _LENGTH.size + length > len(view):
+        raise ValueError("Binary payload too short for descriptor")
+    descriptor = json.loads(str(view[_LENGTH.size : _LENGTH.size + length], "utf-8"))
+    data_start = _align(_LENGTH.size + length)
+    arrays = []
+    for spec in descriptor["arrays"]:
+        dtype = _DTYPES.get(spec["dtype"])
+        if dtype is None:
+            raise ValueError(f"Unsupported binary array dtype {spec['dtype']!r}")
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape, dtype=np.int64))
+        start = data_start + spec["offset"]
+        if start + count * dtype.itemsize > len(view):
+            raise ValueError("Binary payload too short for array data")
+        array = np.frombuffer(view, dtype=dtype, count=count, offset=start)
+        arrays.append(array.reshape(shape))
+    return _restore(descriptor["data"], arrays)
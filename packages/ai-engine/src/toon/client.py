@@ -0,0 +1,115 @@
+"""
+Asyncio client for :class:`toon.server.TOONServer`.
+
+Requests are pipelined over one connection: each gets the next
+``sequence_id`` and its future is resolved when the matching response
+arrives, in whatever order the server answers. With
+``payload_format=PayloadFormat.BINARY`` numpy arrays in requests and
+responses travel as raw buffers.
+"""
+
+import asyncio
+import itertools
+from typing import Any
+
+from .compression import LEGACY_CODECS, CompressionPolicy, available_codecs
+from .protocol import DEFAULT_COMPRESSION, MessageType, PayloadFormat, encode_frame
+from .server import RequestError, negotiate_codecs
+from .stream import DEFAULT_MAX_FRAME_SIZE, StreamDecoder
+
+_SEQUENCE_LIMIT = 2**32
+
+
+class TOONClient:
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+        payload_format: PayloadFormat = PayloadFormat.JSON,
+        compression: CompressionPolicy = DEFAULT_COMPRESSION,
+    ) -> None:
+        self.payload_format = payload_format
+        self.compression = compression
+        self.accepted_codecs: tuple[str, ...] = LEGACY_CODECS
+        self._reader = reader
+        self._writer = writer
+        self._decoder = StreamDecoder(max_frame_size)
+        self._sequence = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+        self._reader_task = asyncio.create_task(self._read_responses())
+
+    @classmethod
+    async def connect_unix(cls, path: str, **kwargs: Any) -> "TOONClient":
+        reader, writer = await asyncio.open_unix_connection(path)
+        return cls(reader, writer, **kwargs)
+
+    @classmethod
+    async def connect_tcp(cls, host: str, port: int, **kwargs: Any) -> "TOONClient":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, **kwargs)
+
+    async def request(self, method: str, **params: Any) -> Any:
+        """Call ``method`` with a ``CONTEXT_REQUEST`` and return its result."""
+        return await self.send(MessageType.CONTEXT_REQUEST, {"type": method, **params})
+
+    async def negotiate(self) -> tuple[str, ...]:
+        """Exchange codec lists with the server and return the shared ones."""
+        reply = await self.send(MessageType.HEARTBEAT, {"codecs": available_codecs()})
+        self.accepted_codecs = negotiate_codecs(reply.get("codecs"))
+        return self.accepted_codecs
+
+    async def send(self, msg_type: MessageType, data: Any) -> Any:
+        """Send one frame and return the payload of its response."""
+        if self._reader_task.done():
+            raise ConnectionError("TOON connection is closed")
+        sequence_id = next(self._sequence) % _SEQUENCE_LIMIT
+        future = asyncio.get_running_loop().create_future()
+        self._pending[sequence_id] = future
+        self._writer.writelines(
+            encode_frame(
+                msg_type,
+                data,
+                sequence_id,
+                self.payload_format,
+                self.compression,
+                self.accepted_codecs,
+            )
+        )
+        await self._writer.drain()
+        return await future
+
+    async def _read_responses(self) -> None:
+        error: BaseException = ConnectionError("TOON connection closed")
+        try:
+            while True:
+                chunk = await self._reader.read(256 * 1024)
+                if not chunk:
+                    break
+                self._decoder.feed(chunk)
+                for message in self._decoder.messages():
+                    self._resolve(message["header"], message["payload"])
+        except (ConnectionError, ValueError) as exc:
+            error = exc
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+    def _resolve(self, header: dict[str, Any], payload: Any) -> None:
+        future = self._pending.pop(header["sequence_id"], None)
+        if future is None or future.done():
+            return
+        if header["type"] == MessageType.ERROR:
+            future.set_exception(RequestError(payload["code"], payload["message"]))
+        else:
+            future.set_result(payload)
+
+    async def close(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self._reader_task
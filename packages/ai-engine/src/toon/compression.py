@@ -1,17 +1,54 @@
 """
-TOON RLE compression — Python port of packages/orchestrator/src/toon/compression.ts
+TOON compression — Python port of packages/orchestrator/src/toon/compression.ts
 
-Uses a simple run-length encoding scheme with a 0xFF escape byte.
-Runs of >3 identical bytes (or any run of 0xFF) are encoded as [0xFF, byte, count].
-A single magic byte (0x5A) prefix marks compressed payloads.
+Two framings mark a compressed payload:
+
+* ``0x5A`` followed by RLE data, the original format. Runs of >3 identical
+  bytes (or any run of 0xFF) are encoded as [0xFF, byte, count].
+* ``0xC0`` followed by a one-byte codec id and that codec's output. Codecs
+  live in a registry; ``rle`` and ``zlib`` are always available and ``bz2``
+  and ``lzma`` when the interpreter was built with them.
+
+Neither magic byte can start a JSON document, so uncompressed payloads are
+never mistaken for compressed ones. ``compress`` keeps producing the
+original RLE framing unless another codec is requested, so peers that only
+know RLE keep working until they advertise more codecs.
+
+``_simple_rle_encode``/``_simple_rle_decode`` are byte-at-a-time reference
+implementations that mirror the TypeScript code. ``compress``/``decompress``
+use ``_fast_rle_encode``/``_fast_rle_decode``, which produce identical bytes
+using numpy run detection and bulk slice copies.
+
+``decompress`` stops as soon as its output would exceed ``max_size`` and
+raises :class:`PayloadTooLargeError`, so a small frame cannot expand into
+an arbitrarily large buffer.
 """
 
+import zlib
+from collections.abc import Callable, Collection, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
 COMPRESSION_THRESHOLD = 1024
 MAGIC_COMPRESSED = 0x5A
+MAGIC_CODEC = 0xC0
+LEGACY_CODECS = ("rle",)
+"""Codecs a peer is assumed to understand before it advertises any."""
+DEFAULT_MAX_DECODED_SIZE = 16 * 1024 * 1024  # the default frame size limit
+
+
+class PayloadTooLargeError(ValueError):
+    """A compressed payload expands past the decoded size limit."""
+
+
+def _too_large(max_size: int) -> PayloadTooLargeError:
+    return PayloadTooLargeError(f"Decompressed payload exceeds the {max_size} byte limit")
 
 
 def is_compressed(data: bytes) -> bool:
-    return len(data) > 0 and data[0] == MAGIC_COMPRESSED
+    return len(data) > 0 and data[0] in (MAGIC_COMPRESSED, MAGIC_CODEC)
 
 
 def _simple_rle_encode(data: bytes) -> bytes:
@@ -57,16 +94,220 @@ def _simple_rle_decode(data: bytes) -> bytes:
     return bytes(result)
 
 
-def compress(data: bytes) -> bytes:
-    if len(data) < COMPRESSION_THRESHOLD:
+def _fast_rle_encode(data: bytes) -> bytes:
+    length = len(data)
+    if length == 0:
+        return b""
+    arr = np.frombuffer(data, dtype=np.uint8)
+
+    starts = np.concatenate(([0], np.flatnonzero(arr[1:] != arr[:-1]) + 1))
+    run_lengths = np.diff(np.append(starts, length))
+    run_values = arr[starts]
+
+    # runs longer than 255 are emitted as consecutive 255-byte chunks
+    chunks_per_run = (run_lengths + 254) // 255
+    chunk_run = np.repeat(np.arange(starts.size), chunks_per_run)
+    chunk_len = np.full(chunk_run.size, 255, dtype=np.int64)
+    chunk_len[np.cumsum(chunks_per_run) - 1] = run_lengths - 255 * (chunks_per_run - 1)
+    chunk_val = run_values[chunk_run]
+
+    encoded = (chunk_len > 3) | (chunk_val == 0xFF)
+    out_len = np.where(encoded, 3, chunk_len)
+    # literal chunks repeat their byte; encoded chunks are patched below so
+    # that [byte, byte, byte] becomes [0xFF, byte, count]
+    out = np.repeat(chunk_val, out_len)
+    enc_pos = (np.cumsum(out_len) - out_len)[encoded]
+    out[enc_pos] = 0xFF
+    out[enc_pos + 2] = chunk_len[encoded]
+    return out.tobytes()
+
+
+def _fast_rle_decode(data: bytes, max_size: int | None = None) -> bytes:
+    result = bytearray()
+    view = memoryview(data)
+    find = data.find
+    i = 0
+    length = len(data)
+
+    while i < length:
+        j = find(b"\xff", i)
+        if j < 0:
+            result += view[i:]
+            break
+        result += view[i:j]
+        if j + 2 >= length:
+            # a trailing escape without byte and count is kept literally
+            result += view[j:]
+            break
+        result += bytes((data[j + 1],)) * data[j + 2]
+        if max_size is not None and len(result) > max_size:
+            raise _too_large(max_size)
+        i = j + 3
+
+    if max_size is not None and len(result) > max_size:
+        raise _too_large(max_size)
+    return bytes(result)
+
+
+def _bounded(decompressor: Any, data: bytes, max_size: int) -> bytes:
+    """Run a zlib/bz2/lzma decompressor, producing at most ``max_size`` bytes."""
+    out = decompressor.decompress(data, max_size + 1)
+    if len(out) > max_size:
+        raise _too_large(max_size)
+    if not decompressor.eof:
+        raise ValueError("Compressed payload is truncated")
+    return out
+
+
+@dataclass(frozen=True)
+class Codec:
+    """A compression codec addressable by a one-byte id on the wire.
+
+    ``compress`` receives the level requested by the caller, or None for
+    the codec's default. ``decompress`` receives the largest output allowed
+    and raises :class:`PayloadTooLargeError` rather than exceed it.
+    """
+
+    id: int
+    name: str
+    compress: Callable[[bytes, int | None], bytes]
+    decompress: Callable[[bytes, int], bytes]
+
+
+_CODECS_BY_ID: dict[int, Codec] = {}
+_CODECS_BY_NAME: dict[str, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    existing = _CODECS_BY_ID.get(codec.id)
+    if existing is not None and existing.name != codec.name:
+        raise ValueError(f"Codec id {codec.id} is already used by {existing.name!r}")
+    _CODECS_BY_ID[codec.id] = codec
+    _CODECS_BY_NAME[codec.name] = codec
+
+
+def get_codec(name: str) -> Codec:
+    try:
+        return _CODECS_BY_NAME[name]
+    except KeyError:
+        raise ValueError(f"Unknown compression codec {name!r}") from None
+
+
+def available_codecs() -> list[str]:
+    """Names of the registered codecs, in the order they were registered."""
+    return list(_CODECS_BY_NAME)
+
+
+register_codec(
+    Codec(1, "rle", lambda data, level: _fast_rle_encode(data), _fast_rle_decode)
+)
+register_codec(
+    Codec(
+        2,
+        "zlib",
+        lambda data, level: zlib.compress(data, -1 if level is None else level),
+        lambda data, max_size: _bounded(zlib.decompressobj(), data, max_size),
+    )
+)
+
+try:
+    import bz2
+except ImportError:  # pragma: no cover - optional in some Python builds
+    bz2 = None
+else:
+    register_codec(
+        Codec(
+            3,
+            "bz2",
+            lambda data, level: bz2.compress(data, 9 if level is None else level),
+            lambda data, max_size: _bounded(bz2.BZ2Decompressor(), data, max_size),
+        )
+    )
+
+try:
+    import lzma
+except ImportError:  # pragma: no cover - optional in some Python builds
+    lzma = None
+else:
+    register_codec(
+        Codec(
+            4,
+            "lzma",
+            lambda data, level: lzma.compress(data, preset=level),
+            lambda data, max_size: _bounded(lzma.LZMADecompressor(), data, max_size),
+        )
+    )
+
+
+def compress(
+    data: bytes,
+    codec: str = "rle",
+    level: int | None = None,
+    threshold: int = COMPRESSION_THRESHOLD,
+) -> bytes:
+    """Compress ``data`` with ``codec`` unless it is small or would grow.
+
+    ``rle`` uses the original ``0x5A`` framing that every peer understands;
+    other codecs are framed as ``0xC0 <codec id>``.
+    """
+    if len(data) < threshold:
         return data
-    encoded = _simple_rle_encode(data)
-    if len(encoded) >= len(data):
+    if codec == "rle":
+        encoded = _fast_rle_encode(data)
+        if len(encoded) >= len(data):
+            return data
+        return bytes([MAGIC_COMPRESSED]) + encoded
+    selected = get_codec(codec)
+    encoded = selected.compress(bytes(data), level)
+    if len(encoded) + 2 >= len(data):
         return data
-    return bytes([MAGIC_COMPRESSED]) + encoded
+    return bytes([MAGIC_CODEC, selected.id]) + encoded
 
 
-def decompress(data: bytes) -> bytes:
+def decompress(data: bytes, max_size: int = DEFAULT_MAX_DECODED_SIZE) -> bytes:
     if not is_compressed(data):
         return data
-    return _simple_rle_decode(data[1:])
+    if data[0] == MAGIC_COMPRESSED:
+        return _fast_rle_decode(bytes(data[1:]), max_size)
+    if len(data) < 2:
+        raise ValueError("Compressed payload is missing its codec id")
+    codec = _CODECS_BY_ID.get(data[1])
+    if codec is None:
+        raise ValueError(f"Unknown compression codec id {data[1]}")
+    return codec.decompress(bytes(data[2:]), max_size)
+
+
+@dataclass(frozen=True)
+class CompressionPolicy:
+    """Chooses how to compress each message from its type and size.
+
+    ``by_type`` maps a message type to a codec name, or to None to never
+    compress that type; other types use ``codec``. Payloads smaller than
+    ``threshold`` are sent as is. A codec the peer has not accepted falls
+    back to RLE.
+    """
+
+    codec: str = "rle"
+    level: int | None = None
+    threshold: int = COMPRESSION_THRESHOLD
+    by_type: Mapping[int, str | None] = field(default_factory=dict)
+
+    def select(
+        self, msg_type: int, size: int, accepted: Collection[str] = LEGACY_CODECS
+    ) -> str | None:
+        if size < self.threshold:
+            return None
+        codec = self.by_type.get(int(msg_type), self.codec)
+        if codec is None:
+            return None
+        if codec in accepted:
+            return codec
+        return "rle" if "rle" in accepted else None
+
+    def compress(
+        self, data: bytes, msg_type: int, accepted: Collection[str] = LEGACY_CODECS
+    ) -> bytes:
+        codec = self.select(msg_type, len(data), accepted)
+        if codec is None:
+            return data
+        return compress(data, codec, self.level, threshold=0)
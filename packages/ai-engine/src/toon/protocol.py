@@ -1,8 +1,21 @@
 import json
 import struct
+import time
+from collections.abc import Collection
 from enum import IntEnum
 from typing import Any
 
+import numpy as np
+
+from .binary import decode_binary, encode_binary
+from .compression import (
+    DEFAULT_MAX_DECODED_SIZE,
+    LEGACY_CODECS,
+    CompressionPolicy,
+    decompress,
+    is_compressed,
+)
+
 
 class MessageType(IntEnum):
     INSTRUCTION = 0x01
@@ -15,36 +28,59 @@ class MessageType(IntEnum):
     CONTEXT_RESPONSE = 0x08
 
 
+class PayloadFormat(IntEnum):
+    """Payload encoding, carried in the high nibble of the version byte.
+
+    JSON frames keep the version byte at ``TOON_VERSION`` exactly, so they
+    are unchanged on the wire. Decoders that compare the whole byte with
+    ``TOON_VERSION`` reject binary frames instead of misreading them.
+    """
+
+    JSON = 0x0
+    BINARY = 0x1
+
+
 TOON_VERSION = 1
+VERSION_MASK = 0x0F
+FORMAT_SHIFT = 4
 HEADER_SIZE = 18
 HEADER_FORMAT = "<BBIQI"
 HEADER_STRUCT = struct.Struct(HEADER_FORMAT)
 
+DEFAULT_COMPRESSION = CompressionPolicy()
+
+
+def now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def pack_version(payload_format: PayloadFormat = PayloadFormat.JSON) -> int:
+    return TOON_VERSION | (int(payload_format) << FORMAT_SHIFT)
+
 
 def encode_header(
     msg_type: MessageType,
     payload_length: int,
     sequence_id: int,
     timestamp: int | None = None,
+    payload_format: PayloadFormat = PayloadFormat.JSON,
 ) -> bytes:
-    if timestamp is None:
-        import time
-        timestamp = int(time.time() * 1000)
     return HEADER_STRUCT.pack(
-        TOON_VERSION,
+        pack_version(payload_format),
         int(msg_type),
         payload_length,
-        timestamp,
+        now_ms() if timestamp is None else timestamp,
         sequence_id,
     )
 
 
-def decode_header(buffer: bytes) -> dict[str, Any]:
-    if len(buffer) < HEADER_SIZE:
+def decode_header(buffer: bytes, offset: int = 0) -> dict[str, Any]:
+    if len(buffer) - offset < HEADER_SIZE:
         raise ValueError("Buffer too short for header")
-    unpacked = HEADER_STRUCT.unpack_from(buffer)
+    unpacked = HEADER_STRUCT.unpack_from(buffer, offset)
     return {
-        "version": unpacked[0],
+        "version": unpacked[0] & VERSION_MASK,
+        "format": unpacked[0] >> FORMAT_SHIFT,
         "type": unpacked[1],
         "payload_length": unpacked[2],
         "timestamp": unpacked[3],
@@ -52,18 +88,100 @@ def decode_header(buffer: bytes) -> dict[str, Any]:
     }
 
 
-def encode(msg_type: MessageType, data: Any, sequence_id: int) -> bytes:
-    payload_bytes = json.dumps(data).encode("utf-8")
-    header = encode_header(msg_type, len(payload_bytes), sequence_id)
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# json.dumps builds a new encoder per call when given ``default``
+_JSON_ENCODER = json.JSONEncoder(default=_json_default)
+
+
+def encode_payload(
+    data: Any, payload_format: PayloadFormat = PayloadFormat.JSON
+) -> bytes:
+    """Serialize ``data``; numpy arrays become lists in JSON payloads."""
+    if payload_format == PayloadFormat.BINARY:
+        return encode_binary(data)
+    return _JSON_ENCODER.encode(data).encode("utf-8")
+
+
+def encode(
+    msg_type: MessageType,
+    data: Any,
+    sequence_id: int,
+    payload_format: PayloadFormat = PayloadFormat.JSON,
+) -> bytes:
+    payload_bytes = encode_payload(data, payload_format)
+    header = encode_header(
+        msg_type, len(payload_bytes), sequence_id, payload_format=payload_format
+    )
     return header + payload_bytes
 
 
+def frame_payload(
+    msg_type: MessageType,
+    data: Any,
+    payload_format: PayloadFormat = PayloadFormat.JSON,
+    compression: CompressionPolicy = DEFAULT_COMPRESSION,
+    accepted: Collection[str] = LEGACY_CODECS,
+) -> bytes:
+    """Serialize ``data`` and compress it as ``compression`` selects.
+
+    Only JSON payloads are compressed; binary payloads are sent as is.
+    """
+    if payload_format != PayloadFormat.JSON:
+        return encode_payload(data, payload_format)
+    payload = _JSON_ENCODER.encode(data).encode("utf-8")
+    if len(payload) >= compression.threshold:
+        payload = compression.compress(payload, msg_type, accepted)
+    return payload
+
+
+def encode_frame(
+    msg_type: MessageType,
+    data: Any,
+    sequence_id: int,
+    payload_format: PayloadFormat = PayloadFormat.JSON,
+    compression: CompressionPolicy = DEFAULT_COMPRESSION,
+    accepted: Collection[str] = LEGACY_CODECS,
+) -> tuple[bytes, bytes]:
+    """Encode a frame as ``(header, payload)`` for ``writelines``."""
+    payload = frame_payload(msg_type, data, payload_format, compression, accepted)
+    header = encode_header(
+        msg_type, len(payload), sequence_id, payload_format=payload_format
+    )
+    return header, payload
+
+
+def decode_payload(
+    payload: bytes | memoryview,
+    payload_format: int = PayloadFormat.JSON,
+    max_size: int = DEFAULT_MAX_DECODED_SIZE,
+) -> Any:
+    """Parse a payload, decompressing JSON payloads that are compressed.
+
+    A compressed payload that expands past ``max_size`` bytes raises
+    ``PayloadTooLargeError``. Binary payloads are never compressed; their
+    numpy arrays are views of ``payload``.
+    """
+    if payload_format == PayloadFormat.BINARY:
+        return decode_binary(payload)
+    if payload_format != PayloadFormat.JSON:
+        raise ValueError(f"Unsupported payload format {payload_format}")
+    if is_compressed(payload):
+        payload = decompress(payload, max_size)
+    return json.loads(str(payload, "utf-8"))
+
+
 def decode(buffer: bytes) -> dict[str, Any]:
     header = decode_header(buffer)
     payload_start = HEADER_SIZE
     payload_end = payload_start + header["payload_length"]
     if len(buffer) < payload_end:
         raise ValueError("Buffer too short for payload")
-    payload_bytes = buffer[payload_start:payload_end]
-    payload = json.loads(payload_bytes.decode("utf-8"))
+    payload = decode_payload(
+        memoryview(buffer)[payload_start:payload_end], header["format"]
+    )
     return {"header": header, "payload": payload}
@@ -0,0 +1,417 @@
+"""
+Native TOON transport for the AI engine.
+
+``TOONServer`` accepts TOON frames over a Unix domain socket or TCP and
+dispatches them to the same embedding, vector store and RL services as the
+HTTP routes, so callers avoid HTTP parsing and per-request connection
+overhead.
+
+Requests are pipelined: every frame is handled as soon as it is read, and
+each response carries the request's ``sequence_id`` and is written as soon
+as it is ready, possibly out of order. A client that needs one request to
+finish before another starts must wait for its response.
+
+Supported frames:
+
+* ``CONTEXT_REQUEST`` ``{"type": <method>, ...params}`` is answered with a
+  ``CONTEXT_RESPONSE`` holding the method's result.
+* ``TOOL_CALL`` ``{"toolName": <method>, "args": {...params}}`` is answered
+  with a ``TOOL_RESULT`` ``{"success": true, "data": ..., "duration": ms}``.
+* ``HEARTBEAT`` is echoed back. A heartbeat ``{"codecs": [...]}`` also
+  negotiates compression: the server answers with its own codec list and
+  from then on compresses responses on that connection with any codec
+  both sides support. Until then only RLE is used.
+
+Failures are answered with an ``ERROR`` frame ``{"code", "message"}``.
+When the admission queue for a request is full the code is ``OVERLOADED``
+and the frame also carries ``retry_after`` in seconds.
+Responses use the payload format of their request, so a client that sends
+binary frames gets embeddings back as float32 arrays instead of JSON lists.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from ..services.scheduler import BULK, INTERACTIVE, PRIORITIES, QueueFullError
+from .compression import LEGACY_CODECS, CompressionPolicy, available_codecs
+from .protocol import (
+    DEFAULT_COMPRESSION,
+    MessageType,
+    PayloadFormat,
+    decode_payload,
+    encode_frame,
+)
+from .stream import DEFAULT_MAX_FRAME_SIZE, StreamDecoder
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 256 * 1024
+
+
+class RequestError(Exception):
+    """A request that cannot be served, reported to the client as ``ERROR``."""
+
+    def __init__(self, code: str, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _require(params: dict[str, Any], name: str) -> Any:
+    value = params.get(name)
+    if value is None or value == "":
+        raise RequestError("BAD_REQUEST", f"{name} is required")
+    return value
+
+
+def negotiate_codecs(offered: Any) -> tuple[str, ...]:
+    """Codecs from a peer's heartbeat ``codecs`` list that are available here."""
+    if not isinstance(offered, list):
+        return LEGACY_CODECS
+    return tuple(name for name in available_codecs() if name in offered)
+
+
+@dataclass
+class Connection:
+    """Per-connection protocol state."""
+
+    accepted_codecs: tuple[str, ...] = LEGACY_CODECS
+
+
+class TOONServer:
+    """Serve embedding, query and RL requests over TOON framing.
+
+    Payloads are decoded and handlers run in the default executor so a slow
+    encode or search does not stall reading and writing other pipelined
+    frames. With a ``scheduler``, as in the app, ``encode``, ``query``,
+    ``upsert`` and ``delete`` are queued on it like the HTTP routes instead:
+    ``query`` and ``delete`` as interactive work, the others as bulk work,
+    unless the request's ``priority`` parameter says otherwise. Their
+    results are awaited on the event loop, so requests waiting in the queue
+    hold no executor thread. Vector store access is
+    also serialized on the store's ``lock`` because the store is not
+    thread-safe; the HTTP routes hold the same lock. At most
+    ``max_inflight`` requests per connection are processed at once; further
+    frames wait in the socket buffer.
+    """
+
+    def __init__(
+        self,
+        embedding_service: Any,
+        vector_store: Any,
+        rl_service: Any,
+        max_frame_size: int = DEFAULT_MAX_FRAME_SIZE,
+        max_inflight: int = 64,
+        compression: CompressionPolicy = DEFAULT_COMPRESSION,
+        scheduler: Any = None,
+    ) -> None:
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.rl_service = rl_service
+        self.scheduler = scheduler
+        self.max_frame_size = max_frame_size
+        self.max_inflight = max_inflight
+        self.compression = compression
+        # shared with the HTTP routes when the store provides one
+        self._store_lock = getattr(vector_store, "lock", None) or threading.RLock()
+        self._inflight = 0
+        self._servers: list[asyncio.AbstractServer] = []
+        self._socket_paths: list[str] = []
+        self._methods: dict[str, Callable[[dict[str, Any]], Any]] = {
+            "encode": self._encode,
+            "query": self._query,
+            "upsert": self._upsert,
+            "delete": self._delete,
+            "rl.log_action": self._log_action,
+            "rl.feedback": self._feedback,
+            "rl.stats": lambda params: self.rl_service.get_stats(),
+            "rl.flush": lambda params: {"ok": True, "flushed": self.rl_service.flush()},
+            "rl.optimize": lambda params: self.rl_service.optimize(),
+            "rl.recommend": self._recommend,
+        }
+
+    async def start_unix(self, path: str) -> None:
+        if os.path.exists(path):
+            os.unlink(path)  # left behind by a previous run
+        server = await asyncio.start_unix_server(self._serve, path=path)
+        self._servers.append(server)
+        self._socket_paths.append(path)
+
+    async def start_tcp(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self._serve, host=host, port=port)
+        self._servers.append(server)
+
+    @property
+    def inflight(self) -> int:
+        """Requests being handled across all connections."""
+        return self._inflight
+
+    @property
+    def sockets(self) -> list[Any]:
+        return [sock for server in self._servers for sock in server.sockets]
+
+    async def close(self) -> None:
+        for server in self._servers:
+            server.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers.clear()
+        for path in self._socket_paths:
+            if os.path.exists(path):
+                os.unlink(path)
+        self._socket_paths.clear()
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        decoder = StreamDecoder(self.max_frame_size)
+        connection = Connection()
+        inflight = asyncio.Semaphore(self.max_inflight)
+        tasks: set[asyncio.Task] = set()
+        try:
+            while True:
+                chunk = await reader.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                decoder.feed(chunk)
+                for header, payload in decoder.frames():
+                    await inflight.acquire()
+                    self._inflight += 1
+                    task = asyncio.create_task(
+                        self._respond(writer, connection, header, payload)
+                    )
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    task.add_done_callback(lambda _: self._finished(inflight))
+        except ValueError as exc:
+            # an oversized or garbled header leaves the stream out of sync
+            self._write(writer, *encode_frame(
+                MessageType.ERROR, {"code": "BAD_FRAME", "message": str(exc)}, 0
+            ))
+        except ConnectionError:
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def _finished(self, inflight: asyncio.Semaphore) -> None:
+        self._inflight -= 1
+        inflight.release()
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        connection: Connection,
+        header: dict[str, Any],
+        payload: memoryview,
+    ) -> None:
+        msg_type, data = await self.dispatch(
+            header["type"], payload, header["format"], connection
+        )
+        if writer.is_closing():
+            return
+        try:
+            payload_format = PayloadFormat(header["format"])
+        except ValueError:
+            payload_format = PayloadFormat.JSON  # reported as BAD_PAYLOAD
+        try:
+            frame = encode_frame(
+                msg_type,
+                data,
+                header["sequence_id"],
+                payload_format,
+                self.compression,
+                connection.accepted_codecs,
+            )
+        except Exception as exc:
+            # a result the payload format cannot represent; without an
+            # answer the client would wait on this sequence_id forever
+            logger.exception("Could not encode TOON response")
+            frame = encode_frame(
+                MessageType.ERROR,
+                {"code": "INTERNAL", "message": str(exc)},
+                header["sequence_id"],
+                payload_format,
+            )
+        self._write(writer, *frame)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, header: bytes, payload: bytes) -> None:
+        writer.writelines((header, payload))
+
+    def handle(
+        self,
+        msg_type: int,
+        payload: bytes | memoryview,
+        payload_format: int = PayloadFormat.JSON,
+        connection: Connection | None = None,
+    ) -> tuple[MessageType, Any]:
+        """:meth:`dispatch` for a thread that is not running an event loop."""
+        return asyncio.run(self.dispatch(msg_type, payload, payload_format, connection))
+
+    async def dispatch(
+        self,
+        msg_type: int,
+        payload: bytes | memoryview,
+        payload_format: int = PayloadFormat.JSON,
+        connection: Connection | None = None,
+    ) -> tuple[MessageType, Any]:
+        """Serve one request frame and return the response type and payload."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            try:
+                # the frame size limit also bounds what a payload expands to
+                body = await loop.run_in_executor(
+                    None, decode_payload, payload, payload_format, self.max_frame_size
+                )
+            except ValueError as exc:
+                raise RequestError("BAD_PAYLOAD", str(exc)) from exc
+            if msg_type == MessageType.HEARTBEAT:
+                if isinstance(body, dict) and "codecs" in body:
+                    if connection is not None:
+                        connection.accepted_codecs = negotiate_codecs(body["codecs"])
+                    return MessageType.HEARTBEAT, {"codecs": available_codecs()}
+                return MessageType.HEARTBEAT, {}
+            if not isinstance(body, dict):
+                raise RequestError("BAD_PAYLOAD", "payload must be an object")
+            if msg_type == MessageType.CONTEXT_REQUEST:
+                params = {k: v for k, v in body.items() if k != "type"}
+                data = await self.call(body.get("type"), params)
+                return MessageType.CONTEXT_RESPONSE, data
+            if msg_type == MessageType.TOOL_CALL:
+                data = await self.call(body.get("toolName"), body.get("args") or {})
+                duration = round((time.perf_counter() - start) * 1000)
+                return MessageType.TOOL_RESULT, {
+                    "success": True,
+                    "data": data,
+                    "duration": duration,
+                }
+            raise RequestError("UNSUPPORTED_TYPE", f"Unsupported message type {msg_type}")
+        except RequestError as exc:
+            return MessageType.ERROR, {"code": exc.code, "message": exc.message}
+        except QueueFullError as exc:
+            return MessageType.ERROR, {
+                "code": "OVERLOADED",
+                "message": str(exc),
+                "retry_after": exc.retry_after,
+            }
+        except Exception as exc:
+            logger.exception("TOON request failed")
+            return MessageType.ERROR, {"code": "INTERNAL", "message": str(exc)}
+
+    async def call(self, method: Any, params: dict[str, Any]) -> Any:
+        handler = self._methods.get(method) if isinstance(method, str) else None
+        if handler is None:
+            raise RequestError("UNKNOWN_METHOD", f"Unknown method {method!r}")
+        if asyncio.iscoroutinefunction(handler):
+            return await handler(params)
+        return await asyncio.get_running_loop().run_in_executor(None, handler, params)
+
+    async def _schedule(
+        self, params: dict[str, Any], default: str, fn: Callable[..., Any], *args: Any
+    ) -> Any:
+        """Run ``fn(*args)`` on the scheduler, or in the executor without one."""
+        if self.scheduler is None:
+            return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+        priority = params.get("priority", default)
+        if priority not in PRIORITIES:
+            raise RequestError("BAD_REQUEST", f"Unknown priority {priority!r}")
+        return await asyncio.wrap_future(self.scheduler.submit(priority, fn, *args))
+
+    async def _encode(self, params: dict[str, Any]) -> dict[str, Any]:
+        texts = _require(params, "texts")
+        if self.scheduler is None or params.get("priority", BULK) != BULK:
+            embeddings = await self._schedule(params, BULK, self.embedding_service.encode, texts)
+            return {"embeddings": embeddings}
+        # one job per batch, so interactive work can run between them
+        size = self.scheduler.batch_size
+        batches = [texts[i : i + size] for i in range(0, len(texts), size)] or [texts]
+        embeddings = [
+            await self._schedule(params, BULK, self.embedding_service.encode, batch)
+            for batch in batches
+        ]
+        return {"embeddings": np.concatenate(embeddings)}
+
+    async def _query(self, params: dict[str, Any]) -> dict[str, Any]:
+        text = _require(params, "text")
+        results = await self._schedule(
+            params, INTERACTIVE, self._search, text, int(params.get("top_k", 10))
+        )
+        return {
+            "results": [
+                {"id": doc_id, "score": score, "metadata": meta}
+                for doc_id, score, meta in results
+            ]
+        }
+
+    def _search(self, text: str, top_k: int) -> list[tuple[str, float, dict[str, Any]]]:
+        embedding = self.embedding_service.encode([text])[0]
+        with self._store_lock:
+            self.vector_store.load()
+            return self.vector_store.query(embedding, top_k)
+
+    async def _upsert(self, params: dict[str, Any]) -> dict[str, Any]:
+        doc_id = _require(params, "id")
+        text = _require(params, "text")
+        await self._schedule(params, BULK, self._put, doc_id, text, params.get("metadata") or {})
+        return {"ok": True}
+
+    def _put(self, doc_id: str, text: str, metadata: dict[str, Any]) -> None:
+        embedding = self.embedding_service.encode([text])[0]
+        with self._store_lock:
+            self.vector_store.load()
+            self.vector_store.upsert(doc_id, embedding, metadata)
+            self.vector_store.save()
+
+    async def _delete(self, params: dict[str, Any]) -> dict[str, Any]:
+        doc_id = _require(params, "id")
+        if not await self._schedule(params, INTERACTIVE, self._remove, doc_id):
+            raise RequestError("NOT_FOUND", "Not found")
+        return {"ok": True}
+
+    def _remove(self, doc_id: str) -> bool:
+        with self._store_lock:
+            self.vector_store.load()
+            if not self.vector_store.delete(doc_id):
+                return False
+            self.vector_store.save()
+        return True
+
+    def _log_action(self, params: dict[str, Any]) -> dict[str, Any]:
+        action = _require(params, "action")
+        action_id = self.rl_service.log_action(
+            action, params.get("context", {}), params.get("result", {})
+        )
+        return {"action_id": action_id}
+
+    def _feedback(self, params: dict[str, Any]) -> dict[str, Any]:
+        action_id = _require(params, "action_id")
+        if params.get("accepted") is None:
+            raise RequestError("BAD_REQUEST", "accepted is required")
+        self.rl_service.record_feedback(action_id, bool(params["accepted"]))
+        return {"ok": True}
+
+    def _recommend(self, params: dict[str, Any]) -> dict[str, Any]:
+        context = _require(params, "context")
+        return {
+            "context": context,
+            "recommendations": self.rl_service.recommend(context),
+        }
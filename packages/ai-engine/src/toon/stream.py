@@ -0,0 +1,90 @@
+"""
+Incremental TOON decoding for byte streams such as sockets.
+
+``StreamDecoder`` buffers arbitrary chunks and yields every complete frame
+they contain. Payloads are handed out as ``memoryview`` slices of the
+receive buffer rather than copies; the buffer is never resized while such
+views may be alive; unconsumed bytes are moved to a fresh buffer instead.
+"""
+
+from collections.abc import Iterator
+from typing import Any
+
+from .protocol import HEADER_SIZE, decode_header, decode_payload
+
+DEFAULT_MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class FrameTooLargeError(ValueError):
+    """A frame header announced a payload larger than the configured limit."""
+
+
+class StreamDecoder:
+    """Reassemble TOON frames from a stream of arbitrarily split chunks.
+
+    Call :meth:`feed` with each chunk as it arrives, then iterate
+    :meth:`frames` (raw header and payload view) or :meth:`messages`
+    (decoded like :func:`toon.protocol.decode`). Payload views stay valid
+    after later calls to ``feed``.
+
+    A frame whose header announces more than ``max_frame_size`` payload
+    bytes raises :class:`FrameTooLargeError` before any of it is buffered.
+    The stream is out of sync at that point and should be closed.
+    :meth:`messages` also applies ``max_frame_size`` to each payload after
+    decompression.
+    """
+
+    def __init__(self, max_frame_size: int = DEFAULT_MAX_FRAME_SIZE) -> None:
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+        self._start = 0
+
+    @property
+    def buffered(self) -> int:
+        """Bytes received that do not yet form a complete frame."""
+        return len(self._buffer) - self._start
+
+    def feed(self, data: bytes | bytearray | memoryview) -> None:
+        if self._start:
+            # views handed out for earlier frames pin the old buffer, so
+            # copy the unconsumed tail instead of shifting it in place
+            tail = memoryview(self._buffer)[self._start :]
+            self._buffer = bytearray(tail)
+            tail.release()
+            self._start = 0
+        self._buffer += data
+
+    def frames(self) -> Iterator[tuple[dict[str, Any], memoryview]]:
+        """Yield ``(header, payload)`` for every complete buffered frame."""
+        buffer = self._buffer
+        view = memoryview(buffer)
+        end = len(buffer)
+        while end - self._start >= HEADER_SIZE:
+            header = decode_header(buffer, self._start)
+            length = header["payload_length"]
+            if length > self.max_frame_size:
+                raise FrameTooLargeError(
+                    f"Frame payload of {length} bytes exceeds the "
+                    f"{self.max_frame_size} byte limit"
+                )
+            payload_start = self._start + HEADER_SIZE
+            payload_end = payload_start + length
+            if payload_end > end:
+                return
+            self._start = payload_end
+            yield header, view[payload_start:payload_end]
+            if self._buffer is not buffer:
+                return  # fed while suspended; a new pass picks up the rest
+
+    def messages(self) -> Iterator[dict[str, Any]]:
+        """Yield every complete buffered frame with its payload parsed."""
+        for header, payload in self.frames():
+            yield {
+                "header": header,
+                "payload": decode_payload(
+                    payload, header["format"], self.max_frame_size
+                ),
+            }
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        return self.messages()
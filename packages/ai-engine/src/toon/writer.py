@@ -0,0 +1,163 @@
+"""
+Batched TOON frame encoding.
+
+``FrameWriter`` collects frames and hands them out in one of two shapes:
+
+* :meth:`FrameWriter.buffers` returns headers and payloads as a list for
+  ``writelines`` or ``socket.sendmsg``. Headers are packed into one shared
+  ``bytearray`` and payloads are referenced, not copied.
+* :meth:`FrameWriter.getbuffer` lays every frame out in one contiguous,
+  reused ``bytearray`` and returns a ``memoryview`` of it. Each payload is
+  copied exactly once, into its final position.
+
+Headers are written with ``HEADER_STRUCT.pack_into`` straight into the
+output buffer. One timestamp is taken per :meth:`FrameWriter.add` call, or
+once per batch in :func:`encode_many`.
+"""
+
+from collections.abc import Collection, Iterable
+from typing import Any
+
+from .compression import LEGACY_CODECS, CompressionPolicy
+from .protocol import (
+    DEFAULT_COMPRESSION,
+    HEADER_SIZE,
+    HEADER_STRUCT,
+    MessageType,
+    PayloadFormat,
+    frame_payload,
+    now_ms,
+    pack_version,
+)
+
+_INITIAL_CAPACITY = 64 * 1024
+
+Payload = bytes | bytearray | memoryview
+
+
+class FrameWriter:
+    """Accumulate TOON frames and serialize them without redundant copies.
+
+    Views returned by :meth:`buffers` and :meth:`getbuffer` are never
+    overwritten: :meth:`clear` reuses the writer's memory only if no view
+    of it is still held, and allocates fresh buffers otherwise.
+    """
+
+    def __init__(
+        self,
+        payload_format: PayloadFormat = PayloadFormat.JSON,
+        compression: CompressionPolicy = DEFAULT_COMPRESSION,
+        accepted: Collection[str] = LEGACY_CODECS,
+        capacity: int = _INITIAL_CAPACITY,
+    ) -> None:
+        self.payload_format = payload_format
+        self.compression = compression
+        self.accepted = accepted
+        self._version = pack_version(payload_format)
+        # (msg_type, timestamp, sequence_id, payload) per frame; headers are
+        # packed straight into the output buffer when it is requested
+        self._frames: list[tuple[int, int, int, Payload]] = []
+        self._headers = bytearray()
+        self._frame = bytearray(capacity)
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Number of frames added since the last :meth:`clear`."""
+        return len(self._frames)
+
+    @property
+    def nbytes(self) -> int:
+        return self._size
+
+    def add(
+        self,
+        msg_type: MessageType,
+        data: Any,
+        sequence_id: int,
+        timestamp: int | None = None,
+    ) -> None:
+        payload = frame_payload(
+            msg_type, data, self.payload_format, self.compression, self.accepted
+        )
+        self.add_payload(msg_type, payload, sequence_id, timestamp)
+
+    def add_payload(
+        self,
+        msg_type: MessageType,
+        payload: Payload,
+        sequence_id: int,
+        timestamp: int | None = None,
+    ) -> None:
+        """Add a frame whose payload is already encoded (and compressed)."""
+        if timestamp is None:
+            timestamp = now_ms()
+        self._frames.append((msg_type, timestamp, sequence_id, payload))
+        self._size += HEADER_SIZE + len(payload)
+
+    def buffers(self) -> list[Payload]:
+        """Headers and payloads in wire order, for ``writelines``/``sendmsg``."""
+        needed = len(self._frames) * HEADER_SIZE
+        if needed > len(self._headers):
+            self._headers = bytearray(max(needed, 2 * len(self._headers)))
+        headers = self._headers
+        view = memoryview(headers)
+        pack_into = HEADER_STRUCT.pack_into
+        version = self._version
+        result: list[Payload] = []
+        offset = 0
+        for msg_type, timestamp, sequence_id, payload in self._frames:
+            pack_into(
+                headers, offset, version, msg_type, len(payload), timestamp, sequence_id
+            )
+            result.append(view[offset : offset + HEADER_SIZE])
+            result.append(payload)
+            offset += HEADER_SIZE
+        return result
+
+    def getbuffer(self) -> memoryview:
+        """All frames as one contiguous ``memoryview``."""
+        if self._size > len(self._frame):
+            self._frame = bytearray(max(self._size, 2 * len(self._frame)))
+        frame = self._frame
+        pack_into = HEADER_STRUCT.pack_into
+        version = self._version
+        position = 0
+        for msg_type, timestamp, sequence_id, payload in self._frames:
+            length = len(payload)
+            pack_into(frame, position, version, msg_type, length, timestamp, sequence_id)
+            position += HEADER_SIZE
+            frame[position : position + length] = payload
+            position += length
+        return memoryview(frame)[:position]
+
+    def clear(self) -> None:
+        self._frames.clear()
+        self._size = 0
+        # a caller may still hold views of the old buffers; those must not
+        # be overwritten, so only reuse buffers nobody else references
+        self._headers = self._reusable(self._headers)
+        self._frame = self._reusable(self._frame)
+
+    @staticmethod
+    def _reusable(buffer: bytearray) -> bytearray:
+        try:
+            # resizing fails with BufferError while views are exported
+            buffer.append(0)
+            buffer.pop()
+        except BufferError:
+            return bytearray(len(buffer))
+        return buffer
+
+
+def encode_many(
+    messages: Iterable[tuple[MessageType, Any, int]],
+    payload_format: PayloadFormat = PayloadFormat.JSON,
+    compression: CompressionPolicy = DEFAULT_COMPRESSION,
+    accepted: Collection[str] = LEGACY_CODECS,
+) -> memoryview:
+    """Encode ``(msg_type, data, sequence_id)`` tuples into one buffer."""
+    writer = FrameWriter(payload_format, compression, accepted, capacity=0)
+    timestamp = now_ms()
+    for msg_type, data, sequence_id in messages:
+        writer.add(msg_type, data, sequence_id, timestamp)
+    return writer.getbuffer()
@@ -0,0 +1,11 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.helpers import make_app
+
+
+@pytest.fixture
+def test_client(tmp_path):
+    # 384 dimensions, like the default all-MiniLM-L6-v2 model
+    with TestClient(make_app(tmp_path, dimensions=384)) as client:
+        yield client
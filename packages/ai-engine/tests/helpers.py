@@ -0,0 +1,31 @@
+"""Stub services and app factories shared by the test modules."""
+
+from pathlib import Path
+
+from fastapi import FastAPI
+
+from benchmarks.stubs import stub_embedding_service
+from src.main import create_app
+from src.services.embedding_service import EmbeddingService
+from src.services.rl_service import RLService
+from src.services.vector_store import VectorStore
+
+DIMENSIONS = 8
+
+
+def embedding_service(dimensions: int = DIMENSIONS) -> EmbeddingService:
+    """Deterministic embeddings: equal texts get equal vectors."""
+    return stub_embedding_service(dimensions)
+
+
+def make_app(
+    tmp_path: Path,
+    embeddings: EmbeddingService | None = None,
+    dimensions: int = DIMENSIONS,
+) -> FastAPI:
+    """The app over stub embeddings, with its index and RL logs under ``tmp_path``."""
+    return create_app(
+        embeddings or embedding_service(dimensions),
+        VectorStore(dimensions, str(tmp_path / "index")),
+        RLService(str(tmp_path / "rl")),
+    )
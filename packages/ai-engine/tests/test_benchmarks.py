@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.harness import Result, compare, measure
+from benchmarks.load import DEFAULT_MIX, Workload, _client, _services, drive, parse_mix
+from benchmarks.stubs import StubSentenceTransformer
+from src.main import create_app
+
+
+def _result(name: str, p50_ms: float, ops_per_s: float) -> Result:
+    return Result(name, 10, 1, ops_per_s, ops_per_s, p50_ms, p50_ms)
+
+
+class TestHarness:
+    def test_measure_counts_items(self):
+        calls = []
+        result = measure("noop", lambda: calls.append(1), 5, warmup=2, items_per_op=4)
+        assert len(calls) == 7
+        assert result.iterations == 5
+        assert result.items_per_s == pytest.approx(result.ops_per_s * 4)
+
+    def test_compare_flags_regressions_beyond_threshold(self):
+        baseline = {
+            "results": {
+                "fast": {"p50_ms": 1.0, "ops_per_s": 1000.0},
+                "slower": {"p50_ms": 1.0, "ops_per_s": 1000.0},
+                "lower": {"p50_ms": 1.0, "ops_per_s": 1000.0},
+            }
+        }
+        results = [
+            _result("fast", 1.1, 950.0),
+            _result("slower", 1.5, 1000.0),
+            _result("lower", 1.0, 500.0),
+            _result("new", 99.0, 1.0),
+        ]
+        regressions = compare(results, baseline, threshold=0.25)
+        assert [line.split(":")[0] for line in regressions] == ["slower", "lower"]
+
+
+class TestStubModel:
+    def test_deterministic_embeddings(self):
+        model = StubSentenceTransformer(16)
+        first = model.encode(["a", "b", "a"])
+        assert first.shape == (3, 16)
+        assert (first[0] == first[2]).all()
+        assert (model.encode(["a"])[0] == first[0]).all()
+
+
+class TestLoadGenerator:
+    def test_parse_mix(self):
+        assert parse_mix("query=3, upsert") == {"query": 3.0, "upsert": 1.0}
+        with pytest.raises(ValueError):
+            parse_mix("search=1")
+        with pytest.raises(ValueError):
+            parse_mix("query=0")
+
+    def test_feedback_waits_for_logged_actions(self):
+        workload = Workload(documents=10)
+        route, body = workload.body("feedback")
+        assert route == "log_action"
+        assert "action" in body
+        workload.action_ids.append("a1")
+        route, body = workload.body("feedback")
+        assert route == "feedback"
+        assert body["action_id"] == "a1"
+
+    def test_drive_against_asgi_app(self, tmp_path):
+        embedding_service, store, rl_service = _services(tmp_path, "stub", 20)
+        app = create_app(embedding_service, store, rl_service)
+        mix = parse_mix(DEFAULT_MIX)
+
+        async def main():
+            async with _client(app, "asgi") as client:
+                return await drive(client, Workload(20), mix, rate=200, duration=0.3, max_inflight=64)
+
+        recorder, elapsed, dropped = asyncio.run(main())
+        report = recorder.summary(elapsed)
+        assert dropped == 0
+        assert sum(r["requests"] for r in report.values()) == 60
+        assert all(r["errors"] == 0 for r in report.values())
+        assert "feedback" in report
@@ -1,19 +1,41 @@
 import os
+import random
 import sys
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import pytest
 
-from toon.compression import (
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.toon.compression import (
     COMPRESSION_THRESHOLD,
+    MAGIC_CODEC,
     MAGIC_COMPRESSED,
+    Codec,
+    CompressionPolicy,
+    PayloadTooLargeError,
+    available_codecs,
+    get_codec,
+    register_codec,
     compress,
     decompress,
     is_compressed,
     _simple_rle_encode,
     _simple_rle_decode,
+    _fast_rle_encode,
+    _fast_rle_decode,
 )
 
 
+def _random_payload(rng: random.Random) -> bytes:
+    """Concatenate runs of random lengths, favouring run-length edge cases."""
+    out = bytearray()
+    for _ in range(rng.randint(0, 60)):
+        byte = rng.choice([0x00, 0x20, 0x7B, 0xFE, 0xFF, rng.randrange(256)])
+        count = rng.choice([1, 2, 3, 4, 5, 254, 255, 256, 258, 259, 510, rng.randint(1, 700)])
+        out += bytes([byte]) * count
+    return bytes(out)
+
+
 class TestIsCompressed:
     def test_empty_bytes(self):
         assert is_compressed(b"") is False
@@ -147,3 +169,121 @@ class TestCompressDecompressRoundTrip:
     def test_roundtrip_below_threshold(self):
         original = b"small payload"
         assert decompress(compress(original)) == original
+
+
+class TestFastRLEMatchesReference:
+    def test_edge_cases(self):
+        cases = [
+            b"",
+            b"\x00",
+            b"\xff",
+            b"\xff\xff",
+            bytes([7] * 3),
+            bytes([7] * 4),
+            bytes([0xFF] * 255),
+            bytes([0xFF] * 256),
+            bytes([0x42] * 258),
+            bytes([0x42] * 259),
+            bytes(range(256)) * 3,
+        ]
+        for data in cases:
+            assert _fast_rle_encode(data) == _simple_rle_encode(data)
+            assert _fast_rle_decode(_fast_rle_encode(data)) == data
+
+    def test_random_payloads_encode_identically(self):
+        rng = random.Random(1234)
+        for _ in range(300):
+            data = _random_payload(rng)
+            encoded = _fast_rle_encode(data)
+            assert encoded == _simple_rle_encode(data)
+            assert _fast_rle_decode(encoded) == data
+
+    def test_arbitrary_input_decodes_identically(self):
+        rng = random.Random(99)
+        for _ in range(300):
+            data = bytes(
+                rng.choice([0xFF, rng.randrange(256)]) for _ in range(rng.randint(0, 64))
+            )
+            assert _fast_rle_decode(data) == _simple_rle_decode(data)
+
+    def test_compress_output_matches_reference_format(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            data = _random_payload(rng) + bytes([0x00] * COMPRESSION_THRESHOLD)
+            expected = bytes([MAGIC_COMPRESSED]) + _simple_rle_encode(data)
+            assert compress(data) == expected
+            assert decompress(expected) == data
+
+
+class TestCodecRegistry:
+    def test_builtin_codecs(self):
+        assert available_codecs()[:2] == ["rle", "zlib"]
+        assert get_codec("zlib").id == 2
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError):
+            get_codec("snappy")
+
+    def test_conflicting_id(self):
+        with pytest.raises(ValueError):
+            register_codec(
+                Codec(2, "other", lambda data, level: data, lambda data, max_size: data)
+            )
+
+    def test_codec_framing_round_trip(self):
+        data = b'{"path": "src/app.py", "content": "def f(x):\\n    return x\\n"}' * 100
+        for name in available_codecs():
+            compressed = compress(data, name)
+            assert is_compressed(compressed)
+            if name == "rle":
+                assert compressed[0] == MAGIC_COMPRESSED
+            else:
+                assert compressed[:2] == bytes([MAGIC_CODEC, get_codec(name).id])
+            assert decompress(compressed) == data
+
+    def test_zlib_beats_rle_on_json(self):
+        data = b'{"path": "src/app.py", "content": "def f(x):\\n    return x\\n"}' * 100
+        assert len(compress(data, "zlib", level=9)) < len(compress(data, "rle")) / 10
+
+    def test_unknown_codec_id_on_decompress(self):
+        with pytest.raises(ValueError):
+            decompress(bytes([MAGIC_CODEC, 0xEE, 1, 2, 3]))
+
+    def test_decompression_is_bounded(self):
+        # a few KB on the wire that would expand to 64 MB
+        data = bytes(64 * 1024 * 1024)
+        for name in available_codecs():
+            compressed = compress(data, name, threshold=0)
+            assert len(compressed) < 4 * 1024 * 1024
+            with pytest.raises(PayloadTooLargeError):
+                decompress(compressed, max_size=1024 * 1024)
+        small = compress(bytes(4096), "zlib")
+        assert decompress(small, max_size=4096) == bytes(4096)
+        with pytest.raises(PayloadTooLargeError):
+            decompress(small, max_size=4095)
+
+    def test_truncated_codec_payload(self):
+        compressed = compress(bytes(4096), "zlib")
+        with pytest.raises(ValueError):
+            decompress(compressed[:-4])
+
+    def test_codec_output_never_grows_payload(self):
+        data = os.urandom(4096)
+        assert compress(data, "zlib") == data
+
+
+class TestCompressionPolicy:
+    def test_threshold_and_type_overrides(self):
+        policy = CompressionPolicy(codec="zlib", threshold=100, by_type={6: None, 3: "rle"})
+        accepted = ("rle", "zlib")
+        assert policy.select(8, 50, accepted) is None
+        assert policy.select(8, 500, accepted) == "zlib"
+        assert policy.select(6, 500, accepted) is None
+        assert policy.select(3, 500, accepted) == "rle"
+
+    def test_falls_back_to_rle_for_legacy_peers(self):
+        policy = CompressionPolicy(codec="zlib")
+        data = bytes([0x20] * 4096)
+        assert policy.select(8, len(data)) == "rle"
+        assert policy.compress(data, 8)[0] == MAGIC_COMPRESSED
+        assert policy.compress(data, 8, ("rle", "zlib"))[0] == MAGIC_CODEC
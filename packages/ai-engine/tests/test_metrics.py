@@ -0,0 +1,104 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.metrics import STAGE_SECONDS, MetricsRegistry
+from tests.helpers import make_app
+
+
+class TestRegistry:
+    def test_histogram_exposition(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("h_seconds", "A histogram.", ("stage",), (0.1, 1.0))
+        child = histogram.labels(stage="a")
+        for value in (0.05, 0.5, 5.0):
+            child.observe(value)
+        text = registry.render()
+        assert "# TYPE h_seconds histogram" in text
+        assert 'h_seconds_bucket{stage="a",le="0.1"} 1' in text
+        assert 'h_seconds_bucket{stage="a",le="1"} 2' in text
+        assert 'h_seconds_bucket{stage="a",le="+Inf"} 3' in text
+        assert 'h_seconds_count{stage="a"} 3' in text
+        assert 'h_seconds_sum{stage="a"} 5.55' in text
+
+    def test_gauge_function_and_escaping(self):
+        registry = MetricsRegistry()
+        gauge = registry.gauge("g", "A gauge.", ("name",))
+        gauge.labels(name='a"b').set(3)
+        gauge.labels(name="live").set_function(lambda: 7)
+        text = registry.render()
+        assert 'g{name="a\\"b"} 3' in text
+        assert 'g{name="live"} 7' in text
+
+    def test_labels_must_match(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("h", "A histogram.", ("stage",))
+        with pytest.raises(ValueError):
+            histogram.labels(other="x")
+        assert registry.histogram("h", "A histogram.", ("stage",)) is histogram
+        with pytest.raises(ValueError):
+            registry.gauge("h", "Same name.")
+
+
+class TestEndpoint:
+    def test_metrics_endpoint(self, tmp_path):
+        with TestClient(make_app(tmp_path)) as client:
+            assert client.post("/embeddings/upsert", json={"id": "a", "text": "x"}).status_code == 200
+            assert client.post("/embeddings/query", json={"text": "x"}).status_code == 200
+            assert client.delete("/embeddings/missing").status_code == 404
+            response = client.get("/metrics")
+
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert (
+            'kado_http_request_duration_seconds_count'
+            '{method="DELETE",route="/embeddings/{id}",status="404"}'
+        ) in text
+        assert 'kado_index_vectors{collection="default"} 1' in text
+        assert 'kado_queue_depth{queue="rl_log_writer"}' in text
+        assert "kado_event_loop_lag_seconds" in text
+        for stage in ("faiss_add", "faiss_search", "index_save", "index_load"):
+            assert f'kado_stage_duration_seconds_count{{stage="{stage}"}}' in text
+
+    def test_scrape_during_a_save_does_not_block_other_requests(self, tmp_path):
+        app = make_app(tmp_path)
+        with TestClient(app) as client:
+            # waits for startup
+            response = client.post("/embeddings/upsert", json={"id": "a", "text": "x"})
+            assert response.status_code == 200
+            store = app.state.vector_store
+            locked, release = threading.Event(), threading.Event()
+
+            def save() -> None:
+                # stands in for a long save holding the index lock
+                with store.lock:
+                    locked.set()
+                    release.wait(1)
+
+            saver = threading.Thread(target=save)
+            saver.start()
+            assert locked.wait(2)
+            scraper = threading.Thread(target=client.get, args=("/metrics",))
+            scraper.start()
+            time.sleep(0.05)
+            started = time.perf_counter()
+            assert client.get("/health").status_code == 200
+            assert time.perf_counter() - started < 0.5
+            release.set()
+            saver.join(5)
+            scraper.join(5)
+
+    def test_stage_timer_records(self):
+        child = STAGE_SECONDS.labels(stage="test_stage")
+        before = child.snapshot()[0][-1] + sum(child.snapshot()[0][:-1])
+        with child.time():
+            pass
+        counts, total = child.snapshot()
+        assert sum(counts) == before + 1
+        assert total >= 0
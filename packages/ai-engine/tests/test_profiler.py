@@ -0,0 +1,88 @@
+import os
+import pstats
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config import get_settings
+from src.services.profiler import PROFILE_ID_HEADER, RequestProfiler
+from tests.helpers import make_app
+
+
+@pytest.fixture
+def debug_settings(monkeypatch, tmp_path):
+    monkeypatch.setenv("DEBUG", "true")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setenv("PROFILE_MAX_ARTIFACTS", "2")
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
+
+
+class TestRequestProfiler:
+    def test_ring_keeps_newest(self, tmp_path):
+        profiler = RequestProfiler(str(tmp_path), max_artifacts=2)
+        ids = []
+        for i in range(3):
+            profile = profiler.start()
+            sum(range(1000))
+            profiler.stop(profile)
+            ids.append(profiler.save(profile, {"method": "POST", "path": f"/x/{i}"}))
+        assert [p["id"] for p in profiler.list()] == ids[:0:-1]
+        assert len(list(tmp_path.glob("*.prof"))) == 2
+        assert "cumulative" in profiler.get(ids[-1])["top"]
+
+    def test_one_profile_at_a_time(self, tmp_path):
+        profiler = RequestProfiler(str(tmp_path))
+        first = profiler.start()
+        assert profiler.start() is None
+        profiler.stop(first)
+
+    def test_rejects_unsafe_ids(self, tmp_path):
+        profiler = RequestProfiler(str(tmp_path))
+        assert profiler.get("../secret") is None
+        assert profiler.artifact_path("../secret") is None
+
+    def test_sampling(self, tmp_path):
+        assert RequestProfiler(str(tmp_path), sample_rate=1.0).wanted({})
+        assert not RequestProfiler(str(tmp_path)).wanted({})
+        assert RequestProfiler(str(tmp_path)).wanted({"x-kado-profile": "1"})
+
+
+class TestProfilingMiddleware:
+    def test_disabled_without_debug(self, tmp_path):
+        get_settings.cache_clear()
+        with TestClient(make_app(tmp_path)) as client:
+            response = client.get("/health", headers={"X-Kado-Profile": "1"})
+            assert PROFILE_ID_HEADER not in response.headers
+            assert client.get("/debug/profiles").status_code == 404
+
+    def test_header_profiles_request(self, tmp_path, debug_settings):
+        with TestClient(make_app(tmp_path)) as client:
+            response = client.post(
+                "/embeddings/query",
+                json={"text": "x"},
+                headers={"X-Kado-Profile": "1"},
+            )
+            profile_id = response.headers[PROFILE_ID_HEADER]
+            assert PROFILE_ID_HEADER not in client.get("/health").headers
+
+            listing = client.get("/debug/profiles").json()["profiles"]
+            assert listing[0]["id"] == profile_id
+            assert listing[0]["path"] == "/embeddings/query"
+            assert listing[0]["status"] == 200
+            detail = client.get(f"/debug/profiles/{profile_id}").json()
+            assert "function calls" in detail["top"]
+            download = client.get(f"/debug/profiles/{profile_id}/download")
+            assert download.status_code == 200
+            artifact = tmp_path / "download.prof"
+            artifact.write_bytes(download.content)
+            functions = pstats.Stats(str(artifact)).stats
+            assert any(
+                name == "query" and path.endswith("vector_store.py")
+                for path, _, name in functions
+            )
+            assert client.get("/debug/profiles/missing").status_code == 404
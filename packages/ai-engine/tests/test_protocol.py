@@ -0,0 +1,110 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.toon.binary import decode_binary, encode_binary
+from src.toon.protocol import (
+    HEADER_SIZE,
+    TOON_VERSION,
+    MessageType,
+    PayloadFormat,
+    decode,
+    decode_header,
+    encode,
+)
+from src.toon.stream import StreamDecoder
+
+
+class TestPayloadFormatFlag:
+    def test_json_frames_keep_plain_version_byte(self):
+        frame = encode(MessageType.STATUS, {"status": "ok"}, 1)
+        assert frame[0] == TOON_VERSION
+        header = decode_header(frame)
+        assert header["version"] == TOON_VERSION
+        assert header["format"] == PayloadFormat.JSON
+
+    def test_binary_frames_set_high_nibble(self):
+        frame = encode(MessageType.STATUS, {}, 1, payload_format=PayloadFormat.BINARY)
+        assert frame[0] == TOON_VERSION | 0x10
+        header = decode_header(frame)
+        assert header["version"] == TOON_VERSION
+        assert header["format"] == PayloadFormat.BINARY
+
+    def test_json_payload_accepts_numpy(self):
+        frame = encode(MessageType.CONTEXT_RESPONSE, {"v": np.arange(3, dtype=np.float32)}, 1)
+        assert decode(frame)["payload"] == {"v": [0.0, 1.0, 2.0]}
+
+    def test_unknown_format_is_rejected(self):
+        frame = bytearray(encode(MessageType.STATUS, {}, 1))
+        frame[0] = TOON_VERSION | 0x70
+        with pytest.raises(ValueError):
+            decode(bytes(frame))
+
+
+class TestBinaryPayload:
+    def test_round_trip(self):
+        embeddings = np.random.default_rng(0).random((4, 384), dtype=np.float32)
+        ids = np.array([3, 1, 4, 1], dtype=np.int64)
+        data = {"embeddings": embeddings, "ids": ids, "meta": [{"n": 1}, "x"], "k": 4}
+        frame = encode(
+            MessageType.CONTEXT_RESPONSE, data, 9, payload_format=PayloadFormat.BINARY
+        )
+        payload = decode(frame)["payload"]
+        np.testing.assert_array_equal(payload["embeddings"], embeddings)
+        np.testing.assert_array_equal(payload["ids"], ids)
+        assert payload["embeddings"].dtype == np.float32
+        assert payload["meta"] == [{"n": 1}, "x"]
+        assert payload["k"] == 4
+
+    def test_arrays_are_views_of_the_frame(self):
+        vector = np.arange(16, dtype=np.float32)
+        frame = encode(MessageType.CONTEXT_RESPONSE, [vector], 1, PayloadFormat.BINARY)
+        (decoded,) = decode(frame)["payload"]
+        assert not decoded.flags.owndata
+        assert not decoded.flags.writeable
+        assert decoded.ctypes.data % 8 == (
+            np.frombuffer(frame, dtype=np.uint8).ctypes.data + HEADER_SIZE
+        ) % 8
+
+    def test_integer_arrays_widen_to_int64(self):
+        decoded = decode_binary(encode_binary(np.array([1, 2], dtype=np.int32)))
+        assert decoded.dtype == np.int64
+
+    def test_unsupported_dtype(self):
+        with pytest.raises(ValueError):
+            encode_binary(np.zeros(2, dtype=np.float64))
+        with pytest.raises(ValueError):
+            encode_binary(np.array([True, False]))
+
+    def test_uint64_must_fit_in_int64(self):
+        small = np.array([0, 2**63 - 1], dtype=np.uint64)
+        assert decode_binary(encode_binary(small)).tolist() == small.tolist()
+        with pytest.raises(ValueError):
+            encode_binary(np.array([2**63], dtype=np.uint64))
+
+    def test_empty_and_scalar_values(self):
+        data = {"empty": np.zeros((0, 8), dtype=np.float32), "score": np.float32(0.5)}
+        decoded = decode_binary(encode_binary(data))
+        assert decoded["empty"].shape == (0, 8)
+        assert decoded["score"] == 0.5
+
+    def test_truncated_payload(self):
+        body = encode_binary({"v": np.ones(8, dtype=np.float32)})
+        with pytest.raises(ValueError):
+            decode_binary(body[:-4])
+
+    def test_stream_decoder_handles_binary_frames(self):
+        vector = np.ones(32, dtype=np.float32)
+        frames = [
+            encode(MessageType.CONTEXT_RESPONSE, {"v": vector}, i, PayloadFormat.BINARY)
+            for i in range(3)
+        ]
+        decoder = StreamDecoder()
+        decoder.feed(b"".join(frames))
+        messages = list(decoder)
+        assert [m["header"]["sequence_id"] for m in messages] == [0, 1, 2]
+        np.testing.assert_array_equal(messages[2]["payload"]["v"], vector)
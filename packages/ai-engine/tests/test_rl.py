@@ -1,3 +1,15 @@
+import os
+import sys
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tests.helpers import make_app
+
+
 def test_log_action(test_client):
     response = test_client.post(
         "/rl/log-action",
@@ -61,3 +73,37 @@ def test_get_stats(test_client):
     assert "accepted" in data
     assert "rejected" in data
     assert "acceptance_rate" in data
+
+
+def test_slow_rl_calls_do_not_block_other_requests(tmp_path):
+    app = make_app(tmp_path)
+    with TestClient(app) as client:
+        assert client.get("/rl/stats").status_code == 200  # waits for startup
+        service = app.state.rl_service
+        locked, release = threading.Event(), threading.Event()
+
+        def optimize() -> None:
+            # stands in for a long optimisation holding the service lock
+            with service._lock:
+                locked.set()
+                release.wait(1)
+
+        holder = threading.Thread(target=optimize)
+        holder.start()
+        assert locked.wait(2)
+        callers = [
+            threading.Thread(target=client.get, args=("/rl/stats",)),
+            threading.Thread(target=client.post, args=("/rl/optimize",)),
+            threading.Thread(
+                target=client.post, args=("/rl/recommend",), kwargs={"json": {"context": "x"}}
+            ),
+        ]
+        for caller in callers:
+            caller.start()
+        time.sleep(0.05)
+        started = time.perf_counter()
+        assert client.get("/health").status_code == 200
+        assert time.perf_counter() - started < 0.5
+        release.set()
+        for thread in (holder, *callers):
+            thread.join(5)
@@ -0,0 +1,528 @@
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.log_writer import BufferedLogWriter
+from src.services.rl_service import RLService, ToolSelectionBandit
+from src.services.segmented_log import Column, SegmentedLog
+
+
+class TestIncrementalStats:
+    def test_counts_follow_log_and_feedback(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        first = service.log_action("edit_file", {}, {})
+        second = service.log_action("shell", {}, {})
+        service.log_action("shell", {}, {})
+        service.record_feedback(first, True)
+        service.record_feedback(second, True)
+        service.record_feedback(second, False)
+
+        stats = service.get_stats()
+        assert stats["total_actions"] == 3
+        assert stats["total_feedback"] == 2
+        assert stats["accepted"] == 1
+        assert stats["rejected"] == 1
+        assert stats["acceptance_rate"] == 0.5
+
+    def test_restart_restores_from_checkpoint(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        action_id = service.log_action("edit_file", {}, {})
+        service.record_feedback(action_id, True)
+        expected = service.get_stats()
+        service.close()
+
+        restarted = RLService(data_dir=str(tmp_path))
+        assert restarted.get_stats() == expected
+
+    def test_restart_replays_log_tail(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        service.log_action("edit_file", {}, {})
+        service.checkpoint()
+        action_id = service.log_action("edit_file", {}, {})
+        service.record_feedback(action_id, False)
+        service.flush()
+
+        with open(tmp_path / "stats_checkpoint.json") as f:
+            assert json.load(f)["total_actions"] == 1
+
+        restarted = RLService(data_dir=str(tmp_path))
+        stats = restarted.get_stats()
+        assert stats["total_actions"] == 2
+        assert stats["rejected"] == 1
+
+    def test_partial_trailing_line_is_not_consumed(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        service.log_action("edit_file", {}, {})
+        service.close()
+        with open(tmp_path / "actions.jsonl", "ab") as f:
+            f.write(b'{"id": "partial"')
+
+        restarted = RLService(data_dir=str(tmp_path))
+        assert restarted.get_stats()["total_actions"] == 1
+
+    def test_truncated_log_triggers_full_rebuild(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        service.log_action("edit_file", {}, {})
+        service.log_action("edit_file", {}, {})
+        service.close()
+        with open(tmp_path / "actions.jsonl", "w") as f:
+            f.write(json.dumps({"id": "only"}) + "\n")
+
+        restarted = RLService(data_dir=str(tmp_path))
+        assert restarted.get_stats()["total_actions"] == 1
+
+
+class TestOptimizeCheckpoints:
+    def test_optimize_only_processes_new_actions(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        service.log_action("edit_file", {"task_type": "fix"}, {})
+        assert service.optimize()["actions_processed"] == 1
+        assert service.optimize()["actions_processed"] == 0
+
+        service.log_action("shell", {"task_type": "fix"}, {})
+        assert service.optimize()["actions_processed"] == 1
+
+        with open(tmp_path / "last_optimize.json") as f:
+            meta = json.load(f)
+        size = (tmp_path / "actions.jsonl").stat().st_size
+        assert meta["actions_cursor"] == [0, size]
+
+    def test_legacy_timestamp_checkpoint_is_honoured(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        service.log_action("edit_file", {}, {})
+        service.close()
+        with open(tmp_path / "last_optimize.json", "w") as f:
+            json.dump({"timestamp": "9999-01-01T00:00:00"}, f)
+
+        restarted = RLService(data_dir=str(tmp_path))
+        assert restarted.optimize()["actions_processed"] == 0
+        restarted.log_action("edit_file", {}, {})
+        assert restarted.optimize()["actions_processed"] == 1
+
+    def test_feedback_is_applied_from_persistent_index(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        action_id = service.log_action(
+            "edit_file",
+            {"task_type": "fix"},
+            {"test_pass_rate": 1.0, "lint_score": 1.0},
+        )
+        service.record_feedback(action_id, True)
+        service.close()
+
+        restarted = RLService(data_dir=str(tmp_path))
+        result = restarted.optimize()
+        assert result["reward_distribution"]["mean"] == 1.0
+        assert restarted.get_stats()["accepted"] == 1
+
+    def test_feedback_index_rebuilds_from_log(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        action_id = service.log_action("edit_file", {}, {})
+        service.record_feedback(action_id, True)
+        service.close()
+        for suffix in ("", "-wal", "-shm"):
+            path = tmp_path / f"feedback_index.db{suffix}"
+            if path.exists():
+                path.unlink()
+
+        restarted = RLService(data_dir=str(tmp_path))
+        assert restarted.get_stats()["accepted"] == 1
+
+
+class TestToolSelectionBandit:
+    def test_loads_legacy_json_model(self, tmp_path):
+        model_path = tmp_path / "bandit_model.json"
+        with open(model_path, "w") as f:
+            json.dump(
+                {
+                    "fix": {
+                        "edit_file": {"successes": 3.0, "attempts": 4.0},
+                        "shell": {"successes": 1.0, "attempts": 4.0},
+                    }
+                },
+                f,
+            )
+        bandit = ToolSelectionBandit(str(model_path), epsilon=0.0)
+        ranked = bandit.get_recommendation("fix")
+        assert [r["tool"] for r in ranked] == ["edit_file", "shell"]
+        assert ranked[0]["expected_reward"] == 0.75
+        assert ranked[0]["attempts"] == 4
+
+    def test_update_many_matches_sequential_updates(self, tmp_path):
+        batched = ToolSelectionBandit(str(tmp_path / "a" / "model.json"), epsilon=0.0)
+        sequential = ToolSelectionBandit(str(tmp_path / "b" / "model.json"), epsilon=0.0)
+        contexts = ["fix", "fix", "docs", "fix", "docs"]
+        tools = ["edit", "edit", "write", "shell", "edit"]
+        rewards = [1.0, 0.5, 0.2, 0.0, 0.9]
+
+        batched.update_many(contexts, tools, rewards)
+        for c, t, r in zip(contexts, tools, rewards):
+            sequential.update(c, t, r)
+
+        for context in ("fix", "docs"):
+            assert batched.get_recommendation(context) == sequential.get_recommendation(
+                context
+            )
+        assert batched.get_recommendation("fix")[0] == {
+            "tool": "edit",
+            "expected_reward": 0.75,
+            "attempts": 2,
+        }
+
+    def test_save_round_trips_and_supersedes_json(self, tmp_path):
+        model_path = tmp_path / "bandit_model.json"
+        with open(model_path, "w") as f:
+            json.dump({"fix": {"edit": {"successes": 1.0, "attempts": 1.0}}}, f)
+        bandit = ToolSelectionBandit(str(model_path), epsilon=0.0)
+        bandit.update_many(["fix"], ["shell"], [0.0])
+        bandit.save()
+
+        reloaded = ToolSelectionBandit(str(model_path), epsilon=0.0)
+        assert reloaded.get_recommendation("fix") == bandit.get_recommendation("fix")
+        assert not (tmp_path / "bandit_model.npz.tmp").exists()
+
+    def test_unknown_context_has_no_recommendations(self, tmp_path):
+        bandit = ToolSelectionBandit(str(tmp_path / "model.json"))
+        assert bandit.get_recommendation("missing") == []
+
+
+class TestBufferedLogging:
+    def test_stats_and_optimize_see_buffered_records(self, tmp_path):
+        writer = BufferedLogWriter(batch_size=1000, flush_interval=60)
+        service = RLService(data_dir=str(tmp_path), writer=writer)
+        action_id = service.log_action("edit_file", {"task_type": "fix"}, {})
+        service.record_feedback(action_id, True)
+        assert writer.pending == 2
+
+        stats = service.get_stats()
+        assert stats["total_actions"] == 1
+        assert stats["accepted"] == 1
+        assert writer.pending == 0
+        service.log_action("shell", {"task_type": "fix"}, {})
+        assert service.optimize()["actions_processed"] == 2
+        service.close()
+
+    def test_writer_flushes_on_batch_size(self, tmp_path):
+        writer = BufferedLogWriter(batch_size=2, flush_interval=60)
+        log = SegmentedLog(tmp_path, "log", ())
+        path = log.active_path
+        writer.append(log, {"n": 1})
+        writer.append(log, {"n": 2})
+        deadline = time.monotonic() + 5
+        while writer.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        writer.close()
+        with open(path) as f:
+            assert [json.loads(line)["n"] for line in f] == [1, 2]
+
+    def test_close_drains_queue(self, tmp_path):
+        writer = BufferedLogWriter(batch_size=1000, flush_interval=60)
+        log = SegmentedLog(tmp_path, "log", ())
+        path = log.active_path
+        for n in range(10):
+            writer.append(log, {"n": n})
+        writer.close()
+        with open(path) as f:
+            assert len(f.readlines()) == 10
+
+
+    def test_failed_batch_is_retried(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("src.services.log_writer._RETRY_DELAY", 0.01)
+        writer = BufferedLogWriter(batch_size=1, flush_interval=60)
+        log = SegmentedLog(tmp_path, "log", ())
+        path = log.active_path
+        write = log.write
+        failures = []
+
+        def flaky(data, fsync=False):
+            if len(failures) < 2:
+                failures.append(data)
+                raise ValueError("disk went away")
+            return write(data, fsync=fsync)
+
+        monkeypatch.setattr(log, "write", flaky)
+        writer.append(log, {"n": 1})
+        deadline = time.monotonic() + 5
+        while (writer.pending or len(failures) < 2) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # the thread survived the errors and keeps writing
+        writer.append(log, {"n": 2})
+        writer.close()
+        assert len(failures) == 2
+        with open(path) as f:
+            assert [json.loads(line)["n"] for line in f] == [1, 2]
+
+    def test_flush_raises_and_keeps_the_batch(self, tmp_path, monkeypatch):
+        writer = BufferedLogWriter(batch_size=1000, flush_interval=60)
+        log = SegmentedLog(tmp_path, "log", ())
+        write = log.write
+
+        def failing(data, fsync=False):
+            raise OSError("read-only file system")
+
+        monkeypatch.setattr(log, "write", failing)
+        writer.append(log, {"n": 1})
+        with pytest.raises(OSError):
+            writer.flush()
+        assert writer.pending == 1
+        monkeypatch.setattr(log, "write", write)
+        assert writer.flush() == 1
+        writer.close()
+
+    def test_failed_rotation_does_not_rewrite_the_batch(self, tmp_path, monkeypatch):
+        writer = BufferedLogWriter(batch_size=1000, flush_interval=60)
+        log = SegmentedLog(tmp_path, "log", (), max_segment_bytes=1)
+
+        def failing():
+            raise OSError("no space left on device")
+
+        monkeypatch.setattr(log, "compact_pending", failing)
+        writer.append(log, {"n": 1})
+        assert writer.flush() == 1
+        assert writer.pending == 0
+        writer.close()
+        assert log.closed_segments() == [0]
+        with open(log._jsonl_path(0)) as f:
+            assert [json.loads(line)["n"] for line in f] == [1]
+
+    def test_failed_write_is_truncated(self, tmp_path, monkeypatch):
+        log = SegmentedLog(tmp_path, "log", ())
+        log.append(b'{"n": 1}\n')
+
+        def failing(fd):
+            raise OSError("I/O error")
+
+        monkeypatch.setattr("src.services.segmented_log.os.fsync", failing)
+        with pytest.raises(OSError):
+            log.write(b'{"n": 2}\n', fsync=True)
+        assert log.active_path.read_bytes() == b'{"n": 1}\n'
+
+class TestBanditPolicies:
+    def _bandit(self, tmp_path, **kwargs):
+        bandit = ToolSelectionBandit(str(tmp_path / "model.json"), **kwargs)
+        bandit.update_many(
+            ["fix"] * 12,
+            ["good"] * 10 + ["bad"] * 2,
+            [1.0] * 10 + [0.0] * 2,
+        )
+        return bandit
+
+    def test_rejects_unknown_policy(self, tmp_path):
+        with pytest.raises(ValueError):
+            ToolSelectionBandit(str(tmp_path / "model.json"), policy="softmax")
+
+    def test_ranking_is_cached_until_context_changes(self, tmp_path):
+        bandit = self._bandit(tmp_path, epsilon=0.0)
+        first = bandit.get_recommendation("fix")
+        assert bandit.get_recommendation("fix") is first
+
+        bandit.update_many(["docs"], ["good"], [1.0])
+        assert bandit.get_recommendation("fix") is first
+
+        bandit.update_many(["fix"], ["bad"], [1.0])
+        refreshed = bandit.get_recommendation("fix")
+        assert refreshed is not first
+        assert refreshed[1] == {"tool": "bad", "expected_reward": 0.3333, "attempts": 3}
+
+    def test_ucb1_prefers_less_explored_tools(self, tmp_path):
+        bandit = self._bandit(tmp_path, policy="ucb1")
+        assert [r["tool"] for r in bandit.get_recommendation("fix")] == ["good", "bad"]
+
+        bandit.update_many(["fix"], ["new"], [0.0])
+        bandit.update_many(["fix"] * 50, ["good"] * 50, [0.6] * 50)
+        ranked = [r["tool"] for r in bandit.get_recommendation("fix")]
+        assert ranked[0] == "new"
+
+    def test_thompson_samples_from_posterior(self, tmp_path):
+        bandit = self._bandit(tmp_path, policy="thompson")
+        firsts = [bandit.get_recommendation("fix")[0]["tool"] for _ in range(200)]
+        assert {"good"} <= set(firsts) <= {"good", "bad"}
+        assert firsts.count("good") > 150
+        assert sorted(r["tool"] for r in bandit.get_recommendation("fix")) == [
+            "bad",
+            "good",
+        ]
+
+
+def _action_log(tmp_path, **kwargs):
+    columns = (
+        Column("id", "str", lambda r: r["id"]),
+        Column("kind", "category", lambda r: r["kind"]),
+        Column("score", "float32", lambda r: r["score"]),
+    )
+    return SegmentedLog(tmp_path, "actions", columns, **kwargs)
+
+
+def _append(log, start, stop):
+    for n in range(start, stop):
+        record = {"id": f"a{n}", "kind": "odd" if n % 2 else "even", "score": n / 10}
+        log.append((json.dumps(record) + "\n").encode("utf-8"))
+
+
+class TestSegmentedLog:
+    def test_rotates_and_compacts_closed_segments(self, tmp_path):
+        log = _action_log(tmp_path, max_segment_bytes=200)
+        _append(log, 0, 10)
+        assert log.closed_segments()
+        for seq in log.closed_segments():
+            assert (tmp_path / f"actions.{seq:06d}" / "offsets.npy").exists()
+            assert not (tmp_path / f"actions.{seq:06d}.jsonl").exists()
+
+        count, columns, _ = log.read(log.start())
+        assert count == 10
+        assert columns["id"].tolist() == [f"a{n}" for n in range(10)]
+        assert columns["kind"].tolist()[:3] == ["even", "odd", "even"]
+        assert columns["score"][9] == pytest.approx(0.9)
+
+    def test_cursor_resumes_across_rotation(self, tmp_path):
+        log = _action_log(tmp_path, max_segment_bytes=200)
+        _append(log, 0, 3)
+        count, _, cursor = log.read(log.start(), columns=())
+        assert count == 3
+
+        _append(log, 3, 12)
+        count, columns, cursor = log.read(cursor, columns=["id"])
+        assert count == 9
+        assert columns["id"].tolist() == [f"a{n}" for n in range(3, 12)]
+        assert log.read(cursor)[0] == 0
+
+    def test_retention_drops_oldest_closed_segments(self, tmp_path):
+        log = _action_log(tmp_path, max_segment_bytes=200, retention_bytes=1500)
+        _append(log, 0, 60)
+        assert log.disk_usage() <= 1500
+        count, columns, _ = log.read(log.start(), columns=["id"])
+        assert 0 < count < 60
+        assert columns["id"].tolist()[-1] == "a59"
+
+    def test_reopen_recovers_active_segment_number(self, tmp_path):
+        log = _action_log(tmp_path, max_segment_bytes=200)
+        _append(log, 0, 10)
+        reopened = _action_log(tmp_path, max_segment_bytes=200)
+        assert reopened.active_seq == log.active_seq
+        assert not reopened.is_stale((log.active_seq, 0))
+        assert reopened.is_stale((log.active_seq + 1, 0))
+
+    def test_rl_service_reads_across_segments(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path), segment_max_bytes=300)
+        ids = [
+            service.log_action("edit_file", {"task_type": "fix"}, {"test_pass_rate": 1.0})
+            for _ in range(20)
+        ]
+        for action_id in ids[:5]:
+            service.record_feedback(action_id, True)
+
+        assert service.get_stats()["total_actions"] == 20
+        result = service.optimize()
+        assert result["actions_processed"] == 20
+        assert result["reward_distribution"]["max"] == 0.8
+        assert result["reward_distribution"]["min"] == 0.4
+        service.close()
+
+        restarted = RLService(data_dir=str(tmp_path), segment_max_bytes=300)
+        assert restarted.get_stats()["total_actions"] == 20
+        assert restarted.get_stats()["accepted"] == 5
+        assert restarted.optimize()["actions_processed"] == 0
+
+
+def _log_from_worker(data_dir, worker, count):
+    service = RLService(data_dir=data_dir, segment_max_bytes=4096)
+    for n in range(count):
+        action_id = service.log_action(
+            "edit_file", {"task_type": "fix", "worker": worker, "n": n}, {}
+        )
+        if n % 2 == 0:
+            service.record_feedback(action_id, True)
+    service.close()
+
+
+class TestMultiProcess:
+    def test_concurrent_workers_do_not_lose_or_interleave_records(self, tmp_path):
+        ctx = multiprocessing.get_context("spawn")
+        workers = [
+            ctx.Process(target=_log_from_worker, args=(str(tmp_path), w, 200))
+            for w in range(4)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+
+        service = RLService(data_dir=str(tmp_path), segment_max_bytes=4096)
+        stats = service.get_stats()
+        assert stats["total_actions"] == 800
+        assert stats["accepted"] == 400
+        count, columns, _ = service.actions_log.read(service.actions_log.start(), ["id"])
+        assert count == 800
+        assert len(set(columns["id"].tolist())) == 800
+        service.close()
+
+    def test_optimize_is_shared_between_workers(self, tmp_path):
+        first = RLService(data_dir=str(tmp_path))
+        second = RLService(data_dir=str(tmp_path))
+        first.log_action("edit_file", {"task_type": "fix"}, {})
+        second.log_action("shell", {"task_type": "fix"}, {})
+        second.flush()
+
+        assert first.optimize()["actions_processed"] == 2
+        assert second.optimize()["actions_processed"] == 0
+
+        second.log_action("shell", {"task_type": "fix"}, {})
+        assert second.optimize()["actions_processed"] == 1
+        attempts = {r["tool"]: r["attempts"] for r in first.recommend("fix")}
+        assert attempts == {"edit_file": 1, "shell": 2}
+
+        first.close()
+        second.close()
+
+    def test_feedback_index_tolerates_concurrent_replay(self, tmp_path):
+        first = RLService(data_dir=str(tmp_path))
+        second = RLService(data_dir=str(tmp_path))
+        action_id = first.log_action("edit_file", {}, {})
+        first.record_feedback(action_id, True)
+        first.flush()
+        second.record_feedback(action_id, False)
+
+        assert second.get_stats()["rejected"] == 1
+        assert first.get_stats() == second.get_stats()
+        first.close()
+        second.close()
+
+
+class TestThreads:
+    def test_concurrent_callers_in_one_process(self, tmp_path):
+        service = RLService(data_dir=str(tmp_path))
+        for n in range(300):
+            action_id = service.log_action("edit_file", {"task_type": "fix"}, {})
+            service.record_feedback(action_id, n % 2 == 0)
+
+        errors: list[BaseException] = []
+        start = threading.Barrier(8)
+
+        def call(method) -> None:
+            start.wait()
+            try:
+                for _ in range(5):
+                    method()
+            except BaseException as exc:
+                errors.append(exc)
+
+        methods = [service.get_stats] * 6 + [service.optimize, service.checkpoint]
+        threads = [threading.Thread(target=call, args=(m,)) for m in methods]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        stats = service.get_stats()
+        assert stats["total_actions"] == 300
+        assert stats["total_feedback"] == 300
+        assert stats["accepted"] == 150
+        service.close()
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config import get_settings
+from src.main import create_app
+from src.services.rl_service import RLService
+from src.services.scheduler import (
+    BULK,
+    INTERACTIVE,
+    AdmissionScheduler,
+    QueueFullError,
+)
+from src.services.vector_store import VectorStore
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+class GatedEmbeddingService:
+    """Records encoded texts; blocks on ``"block"`` until the gate opens."""
+
+    def __init__(self) -> None:
+        self.gate = threading.Event()
+        self.blocked = threading.Event()
+        self.encoded: list[str] = []
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        if "block" in texts:
+            self.blocked.set()
+            self.gate.wait(5)
+        self.encoded.extend(texts)
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+
+class Blocker:
+    """A job that holds the worker until ``release``."""
+
+    def __init__(self) -> None:
+        self.running = threading.Event()
+        self.gate = threading.Event()
+
+    def __call__(self) -> bool:
+        self.running.set()
+        return self.gate.wait(5)
+
+    async def started(self) -> None:
+        assert await asyncio.to_thread(self.running.wait, 2)
+
+    def release(self) -> None:
+        self.gate.set()
+
+
+class TestAdmissionScheduler:
+    def test_interactive_jobs_run_before_queued_bulk_jobs(self):
+        scheduler = AdmissionScheduler({INTERACTIVE: 4, BULK: 4})
+        scheduler.start()
+        blocker = Blocker()
+        order: list[str] = []
+
+        async def main() -> None:
+            blocked = asyncio.ensure_future(scheduler.run(BULK, blocker))
+            await blocker.started()
+            jobs = [
+                asyncio.ensure_future(scheduler.run(BULK, order.append, "bulk-1")),
+                asyncio.ensure_future(scheduler.run(BULK, order.append, "bulk-2")),
+                asyncio.ensure_future(scheduler.run(INTERACTIVE, order.append, "interactive")),
+            ]
+            await asyncio.sleep(0.05)
+            blocker.release()
+            await asyncio.gather(blocked, *jobs)
+
+        try:
+            asyncio.run(main())
+        finally:
+            scheduler.close()
+        assert order == ["interactive", "bulk-1", "bulk-2"]
+
+    def test_full_queue_is_rejected_with_a_retry_hint(self):
+        scheduler = AdmissionScheduler({INTERACTIVE: 1, BULK: 1})
+        scheduler.start()
+        blocker = Blocker()
+
+        async def main() -> None:
+            blocked = asyncio.ensure_future(scheduler.run(BULK, blocker))
+            await blocker.started()
+            queued = asyncio.ensure_future(scheduler.run(BULK, lambda: "done"))
+            await asyncio.sleep(0.01)
+            with pytest.raises(QueueFullError) as info:
+                await scheduler.run(BULK, lambda: None)
+            assert info.value.priority == BULK
+            assert info.value.retry_after >= 1
+            # the other class has its own queue
+            interactive = asyncio.ensure_future(scheduler.run(INTERACTIVE, lambda: "fast"))
+            blocker.release()
+            assert await asyncio.gather(blocked, queued, interactive) == [True, "done", "fast"]
+
+        try:
+            asyncio.run(main())
+        finally:
+            scheduler.close()
+
+    def test_errors_propagate_and_close_fails_queued_jobs(self):
+        scheduler = AdmissionScheduler({INTERACTIVE: 4, BULK: 4})
+        scheduler.start()
+        blocker = Blocker()
+
+        def fail() -> None:
+            raise KeyError("missing")
+
+        async def main() -> None:
+            with pytest.raises(KeyError):
+                await scheduler.run(INTERACTIVE, fail)
+            blocked = asyncio.ensure_future(scheduler.run(BULK, blocker))
+            await blocker.started()
+            queued = asyncio.ensure_future(scheduler.run(BULK, lambda: None))
+            await asyncio.sleep(0.01)
+            closing = asyncio.ensure_future(asyncio.to_thread(scheduler.close))
+            await asyncio.sleep(0.01)
+            blocker.release()
+            await closing
+            assert await blocked is True
+            with pytest.raises(RuntimeError):
+                await queued
+
+        asyncio.run(main())
+
+
+@pytest.fixture
+def small_queues(monkeypatch):
+    monkeypatch.setenv("ADMISSION_BULK_QUEUE_SIZE", "1")
+    monkeypatch.setenv("ADMISSION_INTERACTIVE_QUEUE_SIZE", "4")
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
+
+
+class TestRoutes:
+    def test_bulk_overflow_gets_429_and_queries_jump_the_queue(self, tmp_path, small_queues):
+        service = GatedEmbeddingService()
+        app = create_app(
+            service, VectorStore(8, str(tmp_path / "index")), RLService(str(tmp_path / "rl"))
+        )
+        with TestClient(app) as client:
+            scheduler = app.state.scheduler
+            responses: dict[str, int] = {}
+
+            def send(name: str, method: str, path: str, **kwargs) -> threading.Thread:
+                def call() -> None:
+                    responses[name] = client.request(method, path, **kwargs).status_code
+
+                thread = threading.Thread(target=call)
+                thread.start()
+                return thread
+
+            threads = [
+                send("block", "POST", "/embeddings/upsert", json={"id": "a", "text": "block"})
+            ]
+            assert service.blocked.wait(2)
+            threads.append(
+                send("queued", "POST", "/embeddings/upsert", json={"id": "b", "text": "queued"})
+            )
+            _wait_for(lambda: scheduler.depth(BULK) == 1)
+
+            response = client.post("/embeddings/upsert", json={"id": "c", "text": "rejected"})
+            assert response.status_code == 429
+            assert int(response.headers["Retry-After"]) >= 1
+
+            threads.append(send("query", "POST", "/embeddings/query", json={"text": "query"}))
+            threads.append(
+                send(
+                    "urgent",
+                    "POST",
+                    "/embeddings/encode",
+                    json={"texts": ["urgent"]},
+                    headers={"X-Kado-Priority": "interactive"},
+                )
+            )
+            _wait_for(lambda: scheduler.depth(INTERACTIVE) == 2)
+
+            service.gate.set()
+            for thread in threads:
+                thread.join(5)
+
+            assert responses == {"block": 200, "queued": 200, "query": 200, "urgent": 200}
+            assert service.encoded.index("queued") > service.encoded.index("query")
+            assert service.encoded.index("queued") > service.encoded.index("urgent")
+            assert "rejected" not in service.encoded
+
+            response = client.post(
+                "/embeddings/query", json={"text": "x"}, headers={"X-Kado-Priority": "later"}
+            )
+            assert response.status_code == 400
+
+    def test_bulk_encode_is_split_into_batches(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("ADMISSION_BATCH_SIZE", "2")
+        get_settings.cache_clear()
+        calls: list[int] = []
+
+        class CountingService:
+            def encode(self, texts: list[str]) -> np.ndarray:
+                calls.append(len(texts))
+                return np.ones((len(texts), 8), dtype=np.float32)
+
+        app = create_app(
+            CountingService(),
+            VectorStore(8, str(tmp_path / "index")),
+            RLService(str(tmp_path / "rl")),
+        )
+        try:
+            with TestClient(app) as client:
+                response = client.post("/embeddings/encode", json={"texts": list("abcde")})
+                assert len(response.json()["embeddings"]) == 5
+                assert calls == [2, 2, 1]
+                client.post(
+                    "/embeddings/encode",
+                    json={"texts": list("abcde")},
+                    headers={"X-Kado-Priority": "interactive"},
+                )
+                assert calls[-1] == 5
+        finally:
+            get_settings.cache_clear()
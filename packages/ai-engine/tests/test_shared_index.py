@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.shared_index import SharedVectorStore, current_generation
+from src.services.vector_store import VectorStore
+
+
+def _vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random(8, dtype=np.float32)
+
+
+@pytest.fixture
+def pair(tmp_path):
+    writer = SharedVectorStore(8, str(tmp_path / "index"))
+    writer.load()
+    reader = SharedVectorStore(8, str(tmp_path / "index"))
+    reader.load()
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+class TestSharedVectorStore:
+    def test_roles(self, pair):
+        writer, reader = pair
+        assert writer.role == "writer"
+        assert reader.role == "reader"
+        assert reader.generation == writer.generation == 1
+
+    def test_reader_writes_are_forwarded_and_visible_after_save(self, pair):
+        writer, reader = pair
+        reader.upsert("a", _vector(1), {"path": "a.py"})
+        assert writer.query(_vector(1), 1)[0][0] == "a"
+        reader.save()
+        results = reader.query(_vector(1), 1)
+        assert results[0][0] == "a"
+        assert results[0][2] == {"path": "a.py"}
+        assert reader.delete("a") is True
+        assert reader.delete("a") is False
+
+    def test_readers_are_notified_of_new_generations(self, pair):
+        writer, reader = pair
+        writer.upsert("b", _vector(2), {})
+        writer.save()
+
+        def attached():
+            reader.load()
+            return reader.generation == writer.generation
+
+        _wait_for(attached)
+        assert reader.size == 1
+        assert reader.query(_vector(2), 5)[0][0] == "b"
+
+    def test_reader_maps_vectors_without_copying(self, pair):
+        writer, reader = pair
+        for i in range(10):
+            writer.upsert(f"d{i}", _vector(i), {})
+        writer.save()
+        reader.save()
+        assert isinstance(reader._generation.vectors, np.memmap)
+
+    def test_scores_match_the_writer(self, pair):
+        writer, reader = pair
+        for i in range(50):
+            writer.upsert(f"d{i}", _vector(i), {"i": i})
+        writer.delete("d3")
+        writer.save()
+        reader.save()
+        query = _vector(99)
+        expected = writer.query(query, 5)
+        actual = reader.query(query, 5)
+        assert [r[0] for r in actual] == [r[0] for r in expected]
+        np.testing.assert_allclose([r[1] for r in actual], [r[1] for r in expected], rtol=1e-5)
+
+    def test_old_generations_are_pruned(self, pair, tmp_path):
+        writer, _ = pair
+        for i in range(5):
+            writer.upsert(f"d{i}", _vector(i), {})
+            writer.save()
+        names = sorted(p.name for p in (tmp_path / "index" / "generations").iterdir())
+        assert names == ["000000000005", "000000000006", "CURRENT"]
+        assert current_generation(tmp_path / "index") == 6
+
+    def test_reader_takes_over_when_writer_exits(self, pair):
+        writer, reader = pair
+        writer.upsert("kept", _vector(5), {})
+        writer.close()  # publishes pending changes
+        reader.upsert("new", _vector(6), {})
+        assert reader.role == "writer"
+        assert {r[0] for r in reader.query(_vector(5), 5)} == {"kept", "new"}
+
+    def test_writer_imports_single_process_index(self, tmp_path):
+        legacy = VectorStore(8, str(tmp_path / "index"))
+        legacy.upsert("old", _vector(7), {"n": 1})
+        legacy.save()
+        store = SharedVectorStore(8, str(tmp_path / "index"))
+        store.load()
+        assert store.query(_vector(7), 1)[0][:1] == ("old",)
+        store.close()
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from src.main import create_app
+from src.services.rl_service import RLService
+from src.services.vector_store import VectorStore
+
+# pytest puts this on sys.path, as tests/ is a package, so src imports resolve
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+class SlowEmbeddingService:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+
+    def load(self) -> None:
+        time.sleep(self.delay)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+
+class GatedVectorStore(VectorStore):
+    """Blocks ``load`` until the test opens the gate."""
+
+    def __init__(self, path: str, delay: float = 0.0) -> None:
+        super().__init__(8, path)
+        self.gate = threading.Event()
+        self.delay = delay
+
+    def load(self) -> bool:
+        time.sleep(self.delay)
+        self.gate.wait(5)
+        return super().load()
+
+
+class TestImport:
+    def test_import_does_not_load_heavy_modules_or_build_app(self):
+        script = (
+            "import sys, src.main as m;"
+            "print('faiss' in sys.modules, 'numpy' in sys.modules, 'app' in vars(m));"
+            "m.app;"
+            "print('app' in vars(m))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.split()
+        assert output == ["False", "False", "False", "True"]
+
+
+class TestBackgroundStartup:
+    def test_health_answers_before_services_are_ready(self, tmp_path):
+        store = GatedVectorStore(str(tmp_path / "index"))
+        app = create_app(SlowEmbeddingService(), store, RLService(str(tmp_path / "rl")))
+        with TestClient(app) as client:
+            assert client.get("/health").status_code == 200
+            assert client.get("/health/ready").json()["ready"] is False
+
+            store.gate.set()
+            # waits for startup instead of failing
+            response = client.post("/embeddings/query", json={"text": "x"})
+            assert response.status_code == 200
+
+            ready = client.get("/health/ready").json()
+            assert ready["ready"] is True
+            assert set(ready["startup_ms"]) == {"index", "model", "rl", "total"}
+
+    def test_phases_run_concurrently(self, tmp_path):
+        store = GatedVectorStore(str(tmp_path / "index"), delay=0.3)
+        store.gate.set()
+        app = create_app(
+            SlowEmbeddingService(delay=0.3), store, RLService(str(tmp_path / "rl"))
+        )
+        with TestClient(app) as client:
+            assert client.get("/rl/stats").status_code == 200
+            phases = client.get("/health/ready").json()["startup_ms"]
+        assert phases["index"] >= 300
+        assert phases["model"] >= 300
+        assert phases["total"] < 550
+
+    def test_failed_startup_returns_503(self, tmp_path):
+        class BrokenStore(VectorStore):
+            def load(self) -> bool:
+                raise OSError("corrupt index")
+
+        rl_service = RLService(str(tmp_path / "rl"))
+        app = create_app(SlowEmbeddingService(), BrokenStore(8, str(tmp_path)), rl_service)
+        with TestClient(app) as client:
+            response = client.post("/embeddings/query", json={"text": "x"})
+            assert response.status_code == 503
+            assert client.get("/health").status_code == 200
+            assert client.get("/health/ready").json()["ready"] is False
+        # shutdown still closed the services that did start
+        assert app.state.rl_service is rl_service
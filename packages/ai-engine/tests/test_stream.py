@@ -0,0 +1,103 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.toon.compression import compress
+from src.toon.protocol import HEADER_SIZE, MessageType, decode, encode, encode_header
+from src.toon.stream import FrameTooLargeError, StreamDecoder
+
+
+def _frames(count: int) -> list[bytes]:
+    return [
+        encode(MessageType.STATUS, {"status": "working", "step": i}, sequence_id=i)
+        for i in range(count)
+    ]
+
+
+class TestStreamDecoder:
+    def test_single_frame(self):
+        decoder = StreamDecoder()
+        decoder.feed(encode(MessageType.HEARTBEAT, {}, sequence_id=7))
+        messages = list(decoder)
+        assert len(messages) == 1
+        assert messages[0]["header"]["sequence_id"] == 7
+        assert messages[0]["payload"] == {}
+        assert decoder.buffered == 0
+
+    def test_multiple_frames_in_one_chunk(self):
+        decoder = StreamDecoder()
+        decoder.feed(b"".join(_frames(5)))
+        assert [m["payload"]["step"] for m in decoder] == [0, 1, 2, 3, 4]
+
+    def test_arbitrary_chunk_boundaries(self):
+        frames = _frames(40)
+        stream = b"".join(frames)
+        rng = random.Random(3)
+        decoder = StreamDecoder()
+        received = []
+        i = 0
+        while i < len(stream):
+            size = rng.choice([1, 2, HEADER_SIZE - 1, HEADER_SIZE, 50, 300])
+            decoder.feed(stream[i : i + size])
+            received.extend(decoder.messages())
+            i += size
+        assert received == [decode(frame) for frame in frames]
+        assert decoder.buffered == 0
+
+    def test_partial_frame_waits_for_rest(self):
+        frame = _frames(1)[0]
+        decoder = StreamDecoder()
+        decoder.feed(frame[: HEADER_SIZE + 3])
+        assert list(decoder) == []
+        assert decoder.buffered == HEADER_SIZE + 3
+        decoder.feed(frame[HEADER_SIZE + 3 :])
+        assert [m["payload"]["step"] for m in decoder] == [0]
+
+    def test_payload_views_survive_later_feeds(self):
+        decoder = StreamDecoder()
+        frames = _frames(3)
+        decoder.feed(frames[0] + frames[1][:5])
+        (header, payload), = list(decoder.frames())
+        assert isinstance(payload, memoryview)
+        decoder.feed(frames[1][5:] + frames[2])
+        assert bytes(payload) == frames[0][HEADER_SIZE:]
+        assert [h["sequence_id"] for h, _ in decoder.frames()] == [1, 2]
+
+    def test_feed_while_iterating(self):
+        frames = _frames(4)
+        decoder = StreamDecoder()
+        decoder.feed(frames[0] + frames[1])
+        seen = []
+        for message in decoder:
+            seen.append(message["header"]["sequence_id"])
+            if len(seen) == 1:
+                decoder.feed(frames[2] + frames[3])
+        seen.extend(m["header"]["sequence_id"] for m in decoder)
+        assert seen == [0, 1, 2, 3]
+
+    def test_compressed_payload(self):
+        data = {"text": " " * 4000}
+        payload = compress(json.dumps(data).encode("utf-8"))
+        assert payload[0] == 0x5A
+        frame = encode_header(MessageType.TOOL_RESULT, len(payload), 9) + payload
+        decoder = StreamDecoder()
+        decoder.feed(frame)
+        assert next(iter(decoder))["payload"] == data
+        assert decode(frame)["payload"] == data
+
+    def test_max_frame_size(self):
+        decoder = StreamDecoder(max_frame_size=1024)
+        decoder.feed(encode_header(MessageType.TOOL_RESULT, 1025, 1))
+        with pytest.raises(FrameTooLargeError):
+            list(decoder.frames())
+
+    def test_frame_at_limit_is_accepted(self):
+        payload = b'"' + b"a" * 1022 + b'"'
+        decoder = StreamDecoder(max_frame_size=1024)
+        decoder.feed(encode_header(MessageType.TOOL_RESULT, len(payload), 1) + payload)
+        assert next(iter(decoder))["payload"] == "a" * 1022
@@ -0,0 +1,385 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.rl_service import RLService
+from src.services.scheduler import BULK, INTERACTIVE, AdmissionScheduler
+from src.services.vector_store import VectorStore
+from src.toon.client import TOONClient
+from src.toon.protocol import (
+    HEADER_SIZE,
+    MessageType,
+    PayloadFormat,
+    decode,
+    encode,
+    encode_header,
+)
+from src.toon.compression import MAGIC_CODEC, MAGIC_COMPRESSED, CompressionPolicy, compress
+from src.toon.server import Connection, RequestError, TOONServer, encode_frame
+from tests.helpers import embedding_service, make_app
+
+
+@pytest.fixture
+def server(tmp_path):
+    rl_service = RLService(data_dir=str(tmp_path / "rl"))
+    yield TOONServer(
+        embedding_service(),
+        VectorStore(8, str(tmp_path / "index")),
+        rl_service,
+    )
+    rl_service.close()
+
+
+def _run(server: TOONServer, socket_path: str, scenario, **client_options) -> None:
+    async def main() -> None:
+        await server.start_unix(socket_path)
+        client = await TOONClient.connect_unix(socket_path, **client_options)
+        try:
+            await scenario(client)
+        finally:
+            await client.close()
+            await server.close()
+
+    asyncio.run(main())
+
+
+class TestDispatch:
+    def test_context_request(self, server):
+        msg_type, data = server.handle(
+            MessageType.CONTEXT_REQUEST,
+            encode(MessageType.CONTEXT_REQUEST, {"type": "encode", "texts": ["a"]}, 1)[
+                HEADER_SIZE:
+            ],
+        )
+        assert msg_type == MessageType.CONTEXT_RESPONSE
+        assert len(data["embeddings"][0]) == 8
+
+    def test_tool_call(self, server):
+        payload = encode(
+            MessageType.TOOL_CALL,
+            {"toolName": "rl.log_action", "args": {"action": "edit_file"}},
+            1,
+        )[HEADER_SIZE:]
+        msg_type, data = server.handle(MessageType.TOOL_CALL, payload)
+        assert msg_type == MessageType.TOOL_RESULT
+        assert data["success"] is True
+        assert "action_id" in data["data"]
+
+    def test_errors(self, server):
+        def request(body):
+            payload = encode(MessageType.CONTEXT_REQUEST, body, 1)[HEADER_SIZE:]
+            return server.handle(MessageType.CONTEXT_REQUEST, payload)
+
+        assert request({"type": "nope"}) == (
+            MessageType.ERROR,
+            {"code": "UNKNOWN_METHOD", "message": "Unknown method 'nope'"},
+        )
+        assert request({"type": "rl.log_action"})[1]["code"] == "BAD_REQUEST"
+        assert request({"type": "delete", "id": "missing"})[1]["code"] == "NOT_FOUND"
+        assert server.handle(MessageType.CONTEXT_REQUEST, b"{not json")[1]["code"] == (
+            "BAD_PAYLOAD"
+        )
+        assert server.handle(MessageType.STATUS, b"{}")[1]["code"] == "UNSUPPORTED_TYPE"
+
+
+    def test_frame_that_expands_past_the_limit(self, server):
+        server.max_frame_size = 4096
+        body = json.dumps({"type": "encode", "texts": [" " * 100_000]}).encode()
+        payload = compress(body, "zlib")
+        assert len(payload) < server.max_frame_size
+        msg_type, data = server.handle(MessageType.CONTEXT_REQUEST, payload)
+        assert msg_type == MessageType.ERROR
+        assert data["code"] == "BAD_PAYLOAD"
+        assert "limit" in data["message"]
+
+class TestCodecNegotiation:
+    def test_heartbeat_with_codecs_updates_connection(self, server):
+        connection = Connection()
+        assert connection.accepted_codecs == ("rle",)
+        payload = encode(MessageType.HEARTBEAT, {"codecs": ["zlib", "snappy"]}, 1)
+        msg_type, data = server.handle(
+            MessageType.HEARTBEAT, payload[HEADER_SIZE:], connection=connection
+        )
+        assert msg_type == MessageType.HEARTBEAT
+        assert "zlib" in data["codecs"]
+        assert connection.accepted_codecs == ("zlib",)
+
+    def test_encode_frame_uses_accepted_codec(self):
+        policy = CompressionPolicy(codec="zlib")
+        data = {"content": "def f(x):\n    return x\n" * 200}
+        _, legacy = encode_frame(MessageType.CONTEXT_RESPONSE, data, 1, compression=policy)
+        _, negotiated = encode_frame(
+            MessageType.CONTEXT_RESPONSE, data, 1, compression=policy, accepted=("zlib",)
+        )
+        assert legacy[0] == MAGIC_COMPRESSED
+        assert negotiated[0] == MAGIC_CODEC
+        assert len(negotiated) < len(legacy)
+
+    def test_negotiated_connection_round_trip(self, tmp_path):
+        rl_service = RLService(data_dir=str(tmp_path / "rl"))
+        server = TOONServer(
+            embedding_service(),
+            VectorStore(8, str(tmp_path / "idx")),
+            rl_service,
+            compression=CompressionPolicy(codec="zlib"),
+        )
+
+        async def scenario(client: TOONClient) -> None:
+            assert "zlib" in await client.negotiate()
+            texts = [f"text {i}" for i in range(100)]
+            result = await client.request("encode", texts=texts)
+            assert len(result["embeddings"]) == 100
+
+        _run(server, str(tmp_path / "toon.sock"), scenario)
+        rl_service.close()
+
+
+class TestSocketTransport:
+    def test_round_trip(self, server, tmp_path):
+        async def scenario(client: TOONClient) -> None:
+            assert await client.request("upsert", id="doc1", text="hello") == {"ok": True}
+            result = await client.request("query", text="hello", top_k=1)
+            assert result["results"][0]["id"] == "doc1"
+            assert await client.send(MessageType.HEARTBEAT, {}) == {}
+            with pytest.raises(RequestError) as exc:
+                await client.request("delete", id="missing")
+            assert exc.value.code == "NOT_FOUND"
+
+        _run(server, str(tmp_path / "toon.sock"), scenario)
+
+    def test_unencodable_result_is_answered_with_an_error(self, server, tmp_path):
+        server._methods["opaque"] = lambda params: {"value": object()}
+
+        async def scenario(client: TOONClient) -> None:
+            with pytest.raises(RequestError) as exc:
+                await asyncio.wait_for(client.request("opaque"), 2)
+            assert exc.value.code == "INTERNAL"
+            # the connection still serves later requests
+            assert await client.send(MessageType.HEARTBEAT, {}) == {}
+
+        _run(server, str(tmp_path / "toon.sock"), scenario)
+
+    def test_pipelined_requests_resolve_by_sequence_id(self, server, tmp_path):
+        async def scenario(client: TOONClient) -> None:
+            texts = [f"text {i}" for i in range(50)]
+            results = await asyncio.gather(
+                *(client.request("encode", texts=[text]) for text in texts)
+            )
+            expected = embedding_service().encode(texts)
+            for result, row in zip(results, expected):
+                assert result["embeddings"][0] == row.tolist()
+
+        _run(server, str(tmp_path / "toon.sock"), scenario)
+
+    def test_binary_payloads(self, server, tmp_path):
+        async def scenario(client: TOONClient) -> None:
+            result = await client.request("encode", texts=["a", "b"])
+            assert isinstance(result["embeddings"], np.ndarray)
+            assert result["embeddings"].dtype == np.float32
+            np.testing.assert_array_equal(
+                result["embeddings"], embedding_service().encode(["a", "b"])
+            )
+
+        _run(
+            server,
+            str(tmp_path / "toon.sock"),
+            scenario,
+            payload_format=PayloadFormat.BINARY,
+        )
+
+    def test_slow_request_does_not_block_later_ones(self, tmp_path):
+        service = embedding_service()
+        encode_texts = service.encode
+
+        def slow_first(texts):
+            if texts == ["slow"]:
+                threading.Event().wait(0.3)
+            return encode_texts(texts)
+
+        service.encode = slow_first
+        rl_service = RLService(data_dir=str(tmp_path / "rl"))
+        server = TOONServer(service, VectorStore(8, str(tmp_path / "idx")), rl_service)
+        order = []
+
+        async def scenario(client: TOONClient) -> None:
+            async def call(text):
+                await client.request("encode", texts=[text])
+                order.append(text)
+
+            await asyncio.gather(call("slow"), call("fast"))
+
+        _run(server, str(tmp_path / "toon.sock"), scenario)
+        rl_service.close()
+        assert order == ["fast", "slow"]
+
+    def test_oversized_frame_closes_connection(self, server, tmp_path):
+        server.max_frame_size = 1024
+        socket_path = str(tmp_path / "toon.sock")
+
+        async def main() -> None:
+            await server.start_unix(socket_path)
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            writer.write(encode_header(MessageType.CONTEXT_REQUEST, 4096, 3))
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            await server.close()
+            message = decode(response)
+            assert message["header"]["type"] == MessageType.ERROR
+            assert message["payload"]["code"] == "BAD_FRAME"
+
+        asyncio.run(main())
+
+
+class TestSharedWithHTTP:
+    def test_concurrent_toon_and_http_upserts_are_all_saved(self, tmp_path):
+        app = make_app(tmp_path)
+        with TestClient(app) as client:
+            response = client.post("/embeddings/upsert", json={"id": "first", "text": "x"})
+            assert response.status_code == 200
+            toon = TOONServer(
+                app.state.embedding_service, app.state.vector_store, app.state.rl_service
+            )
+
+            def via_toon(worker: int) -> None:
+                for n in range(50):
+                    params = {"id": f"toon-{worker}-{n}", "text": f"t{worker}{n}"}
+                    asyncio.run(toon.call("upsert", params))
+
+            def via_http(worker: int) -> None:
+                for n in range(50):
+                    client.post(
+                        "/embeddings/upsert",
+                        json={"id": f"http-{worker}-{n}", "text": f"h{worker}{n}"},
+                    )
+
+            threads = [
+                threading.Thread(target=target, args=(worker,))
+                for target in (via_toon, via_http)
+                for worker in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        saved = VectorStore(8, str(tmp_path / "index"))
+        saved.load()
+        assert saved.size == 201
+
+
+class TestAdmission:
+    def test_methods_are_queued_on_the_scheduler(self, tmp_path):
+        service = embedding_service()
+        encode_texts = service.encode
+        encoded: list[str] = []
+
+        def recording(texts):
+            encoded.extend(texts)
+            return encode_texts(texts)
+
+        service.encode = recording
+
+        scheduler = AdmissionScheduler({INTERACTIVE: 4, BULK: 1})
+        scheduler.start()
+        rl_service = RLService(data_dir=str(tmp_path / "rl"))
+        server = TOONServer(
+            service, VectorStore(8, str(tmp_path / "index")), rl_service, scheduler=scheduler
+        )
+        running, gate = threading.Event(), threading.Event()
+
+        def block() -> None:
+            running.set()
+            gate.wait(5)
+
+        def request(body):
+            payload = encode(MessageType.CONTEXT_REQUEST, body, 1)[HEADER_SIZE:]
+            return server.handle(MessageType.CONTEXT_REQUEST, payload)
+
+        responses = {}
+
+        def send(name, body) -> threading.Thread:
+            thread = threading.Thread(target=lambda: responses.update({name: request(body)}))
+            thread.start()
+            return thread
+
+        try:
+            scheduler.submit(BULK, block)
+            assert running.wait(2)
+            threads = [send("upsert", {"type": "upsert", "id": "a", "text": "queued"})]
+            while scheduler.depth(BULK) < 1:
+                threading.Event().wait(0.01)
+
+            msg_type, data = request({"type": "upsert", "id": "b", "text": "rejected"})
+            assert msg_type == MessageType.ERROR
+            assert data["code"] == "OVERLOADED"
+            assert data["retry_after"] >= 1
+            assert request({"type": "query", "text": "x", "priority": "later"})[1]["code"] == (
+                "BAD_REQUEST"
+            )
+
+            threads.append(send("query", {"type": "query", "text": "query"}))
+            while scheduler.depth(INTERACTIVE) < 1:
+                threading.Event().wait(0.01)
+            gate.set()
+            for thread in threads:
+                thread.join(5)
+
+            assert responses["upsert"][0] == MessageType.CONTEXT_RESPONSE
+            assert responses["query"][0] == MessageType.CONTEXT_RESPONSE
+            assert encoded == ["query", "queued"]
+        finally:
+            gate.set()
+            scheduler.close()
+            rl_service.close()
+
+    def test_queued_requests_hold_no_executor_threads(self, tmp_path):
+        scheduler = AdmissionScheduler({INTERACTIVE: 4, BULK: 100})
+        scheduler.start()
+        rl_service = RLService(data_dir=str(tmp_path / "rl"))
+        server = TOONServer(
+            embedding_service(),
+            VectorStore(8, str(tmp_path / "index")),
+            rl_service,
+            scheduler=scheduler,
+        )
+        running, gate = threading.Event(), threading.Event()
+
+        def block() -> None:
+            running.set()
+            gate.wait(5)
+
+        async def scenario(client: TOONClient) -> None:
+            scheduler.submit(BULK, block)
+            assert await asyncio.to_thread(running.wait, 2)
+            # more queued requests than the default executor has threads
+            upserts = [
+                asyncio.ensure_future(client.request("upsert", id=f"doc{n}", text=f"t{n}"))
+                for n in range(40)
+            ]
+            try:
+                for _ in range(200):
+                    if scheduler.depth(BULK) == 40:
+                        break
+                    await asyncio.sleep(0.01)
+                assert scheduler.depth(BULK) == 40
+                stats = await asyncio.wait_for(client.request("rl.stats"), 2)
+                assert stats["total_actions"] == 0
+            finally:
+                gate.set()
+            assert all(result == {"ok": True} for result in await asyncio.gather(*upserts))
+
+        try:
+            _run(server, str(tmp_path / "toon.sock"), scenario)
+        finally:
+            gate.set()
+            scheduler.close()
+            rl_service.close()
@@ -0,0 +1,299 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config import get_settings
+from src.services.shared_index import SharedVectorStore
+from src.services.vector_collections import (
+    OVERLAY_FILE,
+    Collection,
+    CollectionExistsError,
+    CollectionManager,
+    CollectionNotFoundError,
+    ForkUnavailableError,
+)
+from src.services.vector_store import VectorStore
+from tests.helpers import make_app
+
+
+def _vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random(8, dtype=np.float32)
+
+
+@pytest.fixture
+def default(tmp_path):
+    store = VectorStore(8, str(tmp_path / "index"))
+    store.initialize()
+    for i in range(20):
+        store.upsert(f"doc{i}", _vector(i), {"n": i})
+    return Collection(store, persistent=True)
+
+
+def _ids(collection: Collection, seed: int, top_k: int = 5) -> list[str]:
+    return [doc_id for doc_id, _, _ in collection.query(_vector(seed), top_k)]
+
+
+class TestCollection:
+    def test_fork_shares_the_base_without_copying(self, default):
+        base_store = default._top.store
+        child = default.fork("default")
+        assert child._base[0].store is base_store
+        assert default._base[0].store is base_store
+        assert child.size == default.size == 20
+        assert _ids(child, 3) == _ids(default, 3)
+
+    def test_overlays_are_isolated(self, default):
+        child = default.fork("default")
+        child.upsert("new", _vector(100), {})
+        child.upsert("doc3", _vector(101), {"n": "edited"})
+        assert child.delete("doc4") is True
+        default.upsert("parent-only", _vector(102), {})
+
+        assert _ids(child, 100, 1) == ["new"]
+        # the base version of doc3 is hidden by the edit
+        assert [hit[2] for hit in child.query(_vector(3), 21) if hit[0] == "doc3"] == [
+            {"n": "edited"}
+        ]
+        assert child.query(_vector(101), 1)[0][2] == {"n": "edited"}
+        assert "doc4" not in _ids(child, 4, 20)
+        assert "parent-only" not in _ids(child, 102, 20)
+        assert child.size == 20
+
+        assert _ids(default, 3, 1) == ["doc3"]
+        assert _ids(default, 4, 1) == ["doc4"]
+        assert "new" not in _ids(default, 100, 20)
+        assert child.overlay == {"upserts": 2, "deletes": 1}
+
+    def test_query_fills_top_k_around_hidden_ids(self, default):
+        child = default.fork("default")
+        expected = _ids(default, 7, 10)
+        for doc_id in expected[:5]:
+            child.delete(doc_id)
+        assert _ids(child, 7, 5) == expected[5:]
+
+    def test_upsert_after_delete_and_delete_of_missing(self, default):
+        child = default.fork("default")
+        assert child.delete("missing") is False
+        child.delete("doc1")
+        assert child.delete("doc1") is False
+        child.upsert("doc1", _vector(1), {"n": "back"})
+        assert child.query(_vector(1), 1)[0][2] == {"n": "back"}
+
+    def test_nested_forks(self, default):
+        child = default.fork("default")
+        child.upsert("child-doc", _vector(200), {})
+        child.delete("doc0")
+        grandchild = child.fork("child")
+        grandchild.upsert("grand-doc", _vector(201), {})
+        child.upsert("later", _vector(202), {})
+
+        assert grandchild.depth == 2
+        assert _ids(grandchild, 200, 1) == ["child-doc"]
+        assert "doc0" not in _ids(grandchild, 0, 25)
+        assert "later" not in _ids(grandchild, 202, 25)
+        assert grandchild.size == 21
+
+    def test_save_after_a_fork_writes_a_diff(self, default, tmp_path):
+        child = default.fork("default")
+        default.upsert("doc5", _vector(300), {"n": "moved"})
+        default.delete("doc6")
+        default.save()
+        assert default.depth == 1
+        assert (tmp_path / "index" / OVERLAY_FILE).exists()
+
+        reloaded = Collection(VectorStore(8, str(tmp_path / "index")), persistent=True)
+        reloaded.load()
+        assert reloaded.size == 19
+        assert reloaded.query(_vector(300), 1)[0][2] == {"n": "moved"}
+
+        assert child.query(_vector(5), 1)[0][:1] == ("doc5",)
+        assert "doc6" in _ids(child, 6, 1)
+
+    def test_save_folds_the_layers_once_no_fork_shares_them(self, default, tmp_path):
+        bottom = default._top.store
+        child = default.fork("default")
+        grandchild = child.fork("child")
+        default.upsert("doc5", _vector(300), {"n": "moved"})
+        default.delete("doc6")
+        child.release()
+        default.save()
+        assert default.depth == 1  # the grandchild still shares the bottom layer
+
+        grandchild.release()
+        default.save()
+        assert default.depth == 0
+        assert default._top.store is bottom
+        assert not (tmp_path / "index" / OVERLAY_FILE).exists()
+        reloaded = VectorStore(8, str(tmp_path / "index"))
+        reloaded.load()
+        assert reloaded.size == 19
+        assert reloaded.query(_vector(300), 1)[0][2] == {"n": "moved"}
+
+    def test_fork_then_upsert_does_not_copy_or_rewrite_the_index(
+        self, tmp_path, monkeypatch
+    ):
+        store = VectorStore(8, str(tmp_path / "index"))
+        store.initialize()
+        rng = np.random.default_rng(0)
+        for i in range(5000):
+            store.upsert(f"doc{i}", rng.random(8, dtype=np.float32), {})
+        default = Collection(store, persistent=True)
+        default.save()
+        full = store.nbytes
+
+        saves: list[int] = []
+        exports: list[int] = []
+        save, export = VectorStore.save, VectorStore.export
+        monkeypatch.setattr(
+            VectorStore, "save", lambda self: (saves.append(self.size), save(self))[1]
+        )
+        monkeypatch.setattr(
+            VectorStore, "export", lambda self: (exports.append(self.size), export(self))[1]
+        )
+        children = []
+        for n in range(5):
+            children.append(default.fork("default"))
+            default.upsert(f"new{n}", _vector(n), {})
+            default.save()
+
+        # the bottom layer is written once, after the first fork, and never
+        # exported or rebuilt; each save only handles the small overlays
+        assert saves == [5000]
+        assert max(exports) <= 1
+        stores = {
+            id(layer.store): layer.store
+            for collection in (default, *children)
+            for layer in collection._layers()
+        }
+        assert sum(store.nbytes for store in stores.values()) < full * 1.1
+        assert default.size == 5005
+
+    def test_forks_are_not_persisted(self, default, tmp_path):
+        default.save()
+        child = default.fork("default")
+        child.upsert("fork-only", _vector(400), {})
+        child.save()
+        reloaded = VectorStore(8, str(tmp_path / "index"))
+        assert reloaded.load() is True
+        assert "fork-only" not in reloaded
+        assert reloaded.size == 20
+
+    def test_fork_of_a_shared_index_pins_a_generation(self, tmp_path):
+        store = SharedVectorStore(8, str(tmp_path / "shared"))
+        store.load()
+        try:
+            store.upsert("a", _vector(1), {})
+            default = Collection(store, persistent=True)
+            child = default.fork("default")
+            store.upsert("b", _vector(2), {})
+            store.save()
+
+            assert default.depth == 0
+            assert _ids(child, 1, 5) == ["a"]
+            child.upsert("c", _vector(3), {})
+            assert sorted(_ids(child, 3, 5)) == ["a", "c"]
+            assert "c" not in _ids(default, 3, 5)
+        finally:
+            store.close()
+
+
+class TestCollectionManager:
+    def test_fork_and_drop(self, default):
+        manager = CollectionManager(default)
+        manager.fork("default", "wt-1")
+        manager.fork("wt-1", "wt-2")
+        assert [name for name, _ in manager.items()] == ["default", "wt-1", "wt-2"]
+        assert manager.get("wt-2").parent == "wt-1"
+
+        with pytest.raises(CollectionExistsError):
+            manager.fork("default", "wt-1")
+        with pytest.raises(CollectionNotFoundError):
+            manager.fork("missing", "wt-3")
+        with pytest.raises(ValueError):
+            manager.drop("default")
+
+        manager.drop("wt-1")
+        with pytest.raises(CollectionNotFoundError):
+            manager.get("wt-1")
+        # an existing child keeps working after its parent is dropped
+        assert manager.get("wt-2").size == 20
+
+    def test_fork_error_refuses_forks(self, default):
+        manager = CollectionManager(default, fork_error="one worker only")
+        with pytest.raises(ForkUnavailableError, match="one worker only"):
+            manager.fork("default", "wt")
+
+
+class TestRoutes:
+    def test_fork_query_and_delete_through_the_api(self, tmp_path):
+        app = make_app(tmp_path)
+        with TestClient(app) as client:
+            for name in ("a.py", "b.py", "c.py"):
+                client.post("/embeddings/upsert", json={"id": name, "text": name})
+
+            response = client.post("/embeddings/collections/default/fork", json={"name": "wt"})
+            assert response.status_code == 201
+            assert client.post(
+                "/embeddings/collections/default/fork", json={"name": "wt"}
+            ).status_code == 409
+            assert client.post(
+                "/embeddings/collections/missing/fork", json={"name": "x"}
+            ).status_code == 404
+
+            client.post(
+                "/embeddings/upsert", json={"id": "d.py", "text": "d.py", "collection": "wt"}
+            )
+            assert client.delete("/embeddings/a.py", params={"collection": "wt"}).status_code == 200
+
+            def ids(collection: str) -> list[str]:
+                response = client.post(
+                    "/embeddings/query",
+                    json={"text": "d.py", "top_k": 10, "collection": collection},
+                )
+                return sorted(result["id"] for result in response.json()["results"])
+
+            assert ids("wt") == ["b.py", "c.py", "d.py"]
+            assert ids("default") == ["a.py", "b.py", "c.py"]
+            assert client.post(
+                "/embeddings/query", json={"text": "x", "collection": "missing"}
+            ).status_code == 404
+
+            response = client.get("/embeddings/collections")
+            listing = {c["name"]: c for c in response.json()["collections"]}
+            assert listing["wt"] == {
+                "name": "wt",
+                "parent": "default",
+                "size": 3,
+                "depth": 1,
+                "overlay": {"upserts": 1, "deletes": 1},
+            }
+            metrics = client.get("/metrics").text
+            assert 'kado_index_vectors{collection="wt"} 3' in metrics
+
+            assert client.delete("/embeddings/collections/wt").status_code == 200
+            assert client.delete("/embeddings/collections/default").status_code == 400
+            assert client.delete("/embeddings/collections/wt").status_code == 404
+
+    @pytest.mark.parametrize(
+        "env", [{"WORKERS": "2"}, {"WEB_CONCURRENCY": "4"}, {"VECTOR_INDEX_MODE": "shared"}]
+    )
+    def test_fork_is_refused_across_workers(self, tmp_path, monkeypatch, env):
+        for name, value in env.items():
+            monkeypatch.setenv(name, value)
+        get_settings.cache_clear()
+        app = make_app(tmp_path)
+        try:
+            with TestClient(app) as client:
+                response = client.post(
+                    "/embeddings/collections/default/fork", json={"name": "wt"}
+                )
+                assert response.status_code == 501
+                listing = client.get("/embeddings/collections").json()["collections"]
+                assert [c["name"] for c in listing] == ["default"]
+        finally:
+            get_settings.cache_clear()
@@ -0,0 +1,104 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.toon.compression import CompressionPolicy
+from src.toon.protocol import HEADER_SIZE, MessageType, PayloadFormat, decode, encode
+from src.toon.stream import StreamDecoder
+from src.toon.writer import FrameWriter, encode_many
+
+
+def _messages(count: int) -> list[tuple[MessageType, dict, int]]:
+    return [(MessageType.TOOL_RESULT, {"success": True, "data": i}, i) for i in range(count)]
+
+
+def _decode_all(data: bytes) -> list[dict]:
+    decoder = StreamDecoder()
+    decoder.feed(data)
+    return list(decoder)
+
+
+class TestFrameWriter:
+    def test_encode_many_matches_encode(self):
+        messages = _messages(200)
+        buffer = encode_many(messages)
+        assert isinstance(buffer, memoryview)
+        decoded = _decode_all(bytes(buffer))
+        assert [m["payload"] for m in decoded] == [data for _, data, _ in messages]
+        assert [m["header"]["sequence_id"] for m in decoded] == list(range(200))
+        # one timestamp per batch
+        assert len({m["header"]["timestamp"] for m in decoded}) == 1
+        expected = b"".join(encode(t, d, s)[HEADER_SIZE:] for t, d, s in messages)
+        payloads = b"".join(
+            bytes(buffer[o + HEADER_SIZE : o + HEADER_SIZE + n])
+            for o, n in _frame_offsets(bytes(buffer))
+        )
+        assert payloads == expected
+
+    def test_buffers_reference_payloads(self):
+        writer = FrameWriter()
+        payload = b'{"a": 1}'
+        writer.add_payload(MessageType.STATUS, payload, 5, timestamp=123)
+        header, body = writer.buffers()
+        assert body is payload
+        assert len(header) == HEADER_SIZE
+        assert decode(bytes(header) + body)["header"]["timestamp"] == 123
+
+    def test_buffers_and_getbuffer_agree(self):
+        writer = FrameWriter(capacity=16)
+        for msg_type, data, seq in _messages(50):
+            writer.add(msg_type, data, seq, timestamp=1)
+        assert len(writer) == 50
+        assert b"".join(bytes(b) for b in writer.buffers()) == bytes(writer.getbuffer())
+        assert writer.nbytes == len(writer.getbuffer())
+
+    def test_views_survive_clear_and_reuse(self):
+        writer = FrameWriter()
+        writer.add(MessageType.STATUS, {"n": 1}, 1, timestamp=1)
+        first = writer.getbuffer()
+        snapshot = bytes(first)
+        writer.clear()
+        writer.add(MessageType.STATUS, {"n": 2}, 2, timestamp=1)
+        second = writer.getbuffer()
+        assert bytes(first) == snapshot
+        assert _decode_all(bytes(second))[0]["payload"] == {"n": 2}
+
+    def test_reuses_memory_when_no_views_held(self):
+        writer = FrameWriter()
+        writer.add(MessageType.STATUS, {"n": 1}, 1)
+        writer.getbuffer().release()
+        frame = writer._frame
+        writer.clear()
+        writer.add(MessageType.STATUS, {"n": 2}, 2)
+        writer.getbuffer()
+        assert writer._frame is frame
+
+    def test_compression_and_binary_formats(self):
+        data = {"content": "x" * 5000}
+        buffer = encode_many(
+            [(MessageType.CONTEXT_RESPONSE, data, 1)],
+            compression=CompressionPolicy(codec="zlib"),
+            accepted=("zlib",),
+        )
+        assert len(buffer) < 200
+        assert _decode_all(bytes(buffer))[0]["payload"] == data
+
+        vectors = np.ones((3, 4), dtype=np.float32)
+        buffer = encode_many(
+            [(MessageType.CONTEXT_RESPONSE, {"v": vectors}, 2)],
+            payload_format=PayloadFormat.BINARY,
+        )
+        np.testing.assert_array_equal(_decode_all(bytes(buffer))[0]["payload"]["v"], vectors)
+
+
+def _frame_offsets(data: bytes) -> list[tuple[int, int]]:
+    offsets = []
+    position = 0
+    while position < len(data):
+        length = int.from_bytes(data[position + 2 : position + 6], "little")
+        offsets.append((position, length))
+        position += HEADER_SIZE + length
+    return offsets
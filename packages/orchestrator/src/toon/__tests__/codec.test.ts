@@ -1,5 +1,16 @@
 import { describe, it, expect } from 'vitest';
-import { TOONEncoder, TOONDecoder, MessageType, HEADER_SIZE, TOON_VERSION } from '../index.js';
+import {
+  TOONEncoder,
+  TOONDecoder,
+  MessageType,
+  HEADER_SIZE,
+  TOON_VERSION,
+  compress,
+  decompress,
+  negotiateCodecs,
+  MAX_PAYLOAD_SIZE,
+  PayloadTooLargeError,
+} from '../index.js';
 
 describe('TOON Codec', () => {
   const encoder = new TOONEncoder();
@@ -64,6 +75,33 @@ describe('TOON Codec', () => {
       const decoded = decoder.decode(encoded);
       expect(decoded.payload).toEqual(largePayload);
     });
+
+    it('frames zlib output with the codec magic and id', () => {
+      const data = new TextEncoder().encode('{"content": "return x;"}'.repeat(100));
+      const compressed = compress(data, 'zlib', 6);
+      expect(compressed[0]).toBe(0xc0);
+      expect(compressed[1]).toBe(2);
+      expect(decompress(compressed)).toEqual(data);
+    });
+
+    it('uses the preferred codec only after negotiation', () => {
+      const zlibEncoder = new TOONEncoder({ codec: 'zlib' });
+      const payload = { data: 'abc'.repeat(1000) };
+      const legacy = zlibEncoder.encode(MessageType.CONTEXT_RESPONSE, payload, 1);
+      expect(legacy[HEADER_SIZE]).toBe(0x5a);
+
+      zlibEncoder.acceptedCodecs = negotiateCodecs(['rle', 'zlib', 'lzma']);
+      const negotiated = zlibEncoder.encode(MessageType.CONTEXT_RESPONSE, payload, 2);
+      expect(negotiated[HEADER_SIZE]).toBe(0xc0);
+      expect(negotiated.length).toBeLessThan(legacy.length);
+      expect(decoder.decode(negotiated).payload).toEqual(payload);
+    });
+
+    it('rejects zlib payloads that expand past the size limit', () => {
+      const bomb = compress(new Uint8Array(MAX_PAYLOAD_SIZE + 1), 'zlib', 9);
+      expect(bomb.length).toBeLessThan(64 * 1024);
+      expect(() => decompress(bomb)).toThrow(PayloadTooLargeError);
+    });
   });
 
   describe('invalid buffer validation', () => {
@@ -1,8 +1,35 @@
+import { deflateSync, inflateSync } from 'node:zlib';
+
 export const COMPRESSION_THRESHOLD = 1024;
+/** Largest payload `decompress` will produce, matching the ai-engine's frame limit. */
+export const MAX_PAYLOAD_SIZE = 16 * 1024 * 1024;
 const MAGIC_COMPRESSED = 0x5a;
+const MAGIC_CODEC = 0xc0;
+
+export type CodecName = 'rle' | 'zlib';
+
+/** A compressed payload would expand past `MAX_PAYLOAD_SIZE`. */
+export class PayloadTooLargeError extends Error {
+  constructor(maxSize: number = MAX_PAYLOAD_SIZE) {
+    super(`Decompressed payload exceeds the ${maxSize} byte limit`);
+    this.name = 'PayloadTooLargeError';
+  }
+}
+
+interface Codec {
+  id: number;
+  compress(data: Uint8Array, level?: number): Uint8Array;
+  decompress(data: Uint8Array): Uint8Array;
+}
+
+/** Codecs a peer is assumed to understand before it advertises any. */
+export const LEGACY_CODECS: readonly CodecName[] = ['rle'];
 
 export function isCompressed(buffer: Uint8Array): boolean {
-  return buffer.length > 0 && buffer[0] === MAGIC_COMPRESSED;
+  return (
+    buffer.length > 0 &&
+    (buffer[0] === MAGIC_COMPRESSED || buffer[0] === MAGIC_CODEC)
+  );
 }
 
 function simpleRLEEncode(data: Uint8Array): Uint8Array {
@@ -31,9 +58,11 @@ function simpleRLEDecode(data: Uint8Array): Uint8Array {
     if (data[i] === 0xff && i + 2 < data.length) {
       const byte = data[i + 1] ?? 0;
       const count = data[i + 2] ?? 0;
+      if (result.length + count > MAX_PAYLOAD_SIZE) throw new PayloadTooLargeError();
       for (let j = 0; j < count; j++) result.push(byte);
       i += 3;
     } else {
+      if (result.length >= MAX_PAYLOAD_SIZE) throw new PayloadTooLargeError();
       result.push(data[i] ?? 0);
       i++;
     }
@@ -41,17 +70,71 @@ function simpleRLEDecode(data: Uint8Array): Uint8Array {
   return new Uint8Array(result);
 }
 
-export function compress(data: Uint8Array): Uint8Array {
+function zlibDecode(data: Uint8Array): Uint8Array {
+  try {
+    return new Uint8Array(inflateSync(data, { maxOutputLength: MAX_PAYLOAD_SIZE }));
+  } catch (error) {
+    // zlib reports an output past maxOutputLength as ERR_BUFFER_TOO_LARGE
+    if (error instanceof RangeError) throw new PayloadTooLargeError();
+    throw error;
+  }
+}
+
+// ids must match the registry in packages/ai-engine/src/toon/compression.py
+const CODECS: Record<CodecName, Codec> = {
+  rle: { id: 1, compress: simpleRLEEncode, decompress: simpleRLEDecode },
+  zlib: {
+    id: 2,
+    compress: (data, level) => new Uint8Array(deflateSync(data, { level: level ?? -1 })),
+    decompress: zlibDecode,
+  },
+};
+
+const CODECS_BY_ID = new Map<number, Codec>(
+  Object.values(CODECS).map((codec) => [codec.id, codec])
+);
+
+export const SUPPORTED_CODECS = Object.keys(CODECS) as CodecName[];
+
+/** Codecs from a peer's advertised list that this side supports. */
+export function negotiateCodecs(offered: unknown): CodecName[] {
+  if (!Array.isArray(offered)) return [...LEGACY_CODECS];
+  return SUPPORTED_CODECS.filter((name) => offered.includes(name));
+}
+
+/**
+ * Compress with `codec`, returning `data` unchanged if it is below the
+ * threshold or would not shrink. `rle` keeps the original `0x5A` framing;
+ * other codecs are framed as `0xC0 <codec id>`.
+ */
+export function compress(
+  data: Uint8Array,
+  codec: CodecName = 'rle',
+  level?: number
+): Uint8Array {
   if (data.length < COMPRESSION_THRESHOLD) return data;
-  const encoded = simpleRLEEncode(data);
-  if (encoded.length >= data.length) return data;
-  const result = new Uint8Array(1 + encoded.length);
-  result[0] = MAGIC_COMPRESSED;
-  result.set(encoded, 1);
+  if (codec === 'rle') {
+    const encoded = simpleRLEEncode(data);
+    if (encoded.length >= data.length) return data;
+    const result = new Uint8Array(1 + encoded.length);
+    result[0] = MAGIC_COMPRESSED;
+    result.set(encoded, 1);
+    return result;
+  }
+  const selected = CODECS[codec];
+  const encoded = selected.compress(data, level);
+  if (encoded.length + 2 >= data.length) return data;
+  const result = new Uint8Array(2 + encoded.length);
+  result[0] = MAGIC_CODEC;
+  result[1] = selected.id;
+  result.set(encoded, 2);
   return result;
 }
 
 export function decompress(data: Uint8Array): Uint8Array {
   if (!isCompressed(data)) return data;
-  return simpleRLEDecode(data.subarray(1));
+  if (data[0] === MAGIC_COMPRESSED) return simpleRLEDecode(data.subarray(1));
+  const codec = CODECS_BY_ID.get(data[1] ?? -1);
+  if (!codec) throw new Error(`Unknown compression codec id ${data[1]}`);
+  return codec.decompress(data.subarray(2));
 }
@@ -4,15 +4,39 @@ import {
   HEADER_SIZE,
   type TOONHeader,
 } from './protocol.js';
-import { compress, COMPRESSION_THRESHOLD } from './compression.js';
+import {
+  compress,
+  COMPRESSION_THRESHOLD,
+  LEGACY_CODECS,
+  type CodecName,
+} from './compression.js';
 
 const encoder = new TextEncoder();
 
+export interface TOONEncoderOptions {
+  /** Preferred codec for payloads above the compression threshold. */
+  codec?: CodecName;
+  level?: number;
+}
+
 export class TOONEncoder {
+  /**
+   * Codecs the peer has agreed to, e.g. from `negotiateCodecs` applied to
+   * its heartbeat reply. The preferred codec is only used once it appears
+   * here; until then payloads are RLE-compressed as before.
+   */
+  acceptedCodecs: CodecName[] = [...LEGACY_CODECS];
+
+  constructor(private readonly options: TOONEncoderOptions = {}) {}
+
   encode(type: MessageType, data: unknown, sequenceId: number): Uint8Array {
     const payload = this.encodePayload(data);
+    const preferred = this.options.codec ?? 'rle';
+    const codec = this.acceptedCodecs.includes(preferred) ? preferred : 'rle';
     const compressed =
-      payload.length > COMPRESSION_THRESHOLD ? compress(payload) : payload;
+      payload.length > COMPRESSION_THRESHOLD
+        ? compress(payload, codec, this.options.level)
+        : payload;
     const header: TOONHeader = {
       version: TOON_VERSION,
       type,
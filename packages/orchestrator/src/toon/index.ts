@@ -5,11 +5,17 @@ export {
   type TOONHeader,
   type TOONMessage,
 } from './protocol.js';
-export { TOONEncoder } from './encoder.js';
+export { TOONEncoder, type TOONEncoderOptions } from './encoder.js';
 export { TOONDecoder } from './decoder.js';
 export {
   compress,
   decompress,
   isCompressed,
+  negotiateCodecs,
   COMPRESSION_THRESHOLD,
+  MAX_PAYLOAD_SIZE,
+  PayloadTooLargeError,
+  LEGACY_CODECS,
+  SUPPORTED_CODECS,
+  type CodecName,
 } from './compression.js';